@@ -0,0 +1,159 @@
+"""
+ASGI entry point: uvicorn app.asgi:application --workers 2
+
+POST /api/query/stream is served natively here: retrieval runs in a worker
+thread, Gemini is awaited and its tokens are sent as server-sent events, so
+one worker holds many LLM calls in flight. Every other path is handed to the
+Flask app through asgiref's WSGI adapter.
+"""
+import asyncio
+import json
+import time
+
+from app import create_app
+from app.routes import answer_cache
+from app.streaming import format_sse
+from utils.filters import SearchFilter
+from utils.gemini_llm import astream_response
+from utils.metrics import log_request
+from utils.registry import lease_retriever
+
+STREAM_PATH = "/api/query/stream"
+ALLOWED_ORIGINS = {"http://localhost:5173", "https://rbi-chatbot-frontend.vercel.app"}
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+    flask_app = WsgiToAsgi(create_app())
+except ImportError:
+    flask_app = None
+
+
+def _cors_headers(scope) -> list:
+    headers = dict(scope.get("headers") or [])
+    origin = headers.get(b"origin", b"").decode("latin-1")
+    if origin in ALLOWED_ORIGINS:
+        return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    return []
+
+
+async def _read_json(receive) -> dict:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+
+async def _send_json(send, status: int, payload: dict, headers: list):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json")] + headers,
+    })
+    await send({"type": "http.response.body", "body": json.dumps(payload).encode("utf-8")})
+
+
+def _retrieve(question: str, filters=None, timings=None):
+    with lease_retriever() as retriever:
+        return retriever.retrieve(question, filters=filters, timings=timings, return_vector=True)
+
+
+async def stream_query(scope, receive, send):
+    cors = _cors_headers(scope)
+    try:
+        data = await _read_json(receive)
+    except ValueError:
+        await _send_json(send, 400, {"error": "Invalid JSON body"}, cors)
+        return
+    question = data.get("question") if isinstance(data, dict) else None
+    if not question:
+        await _send_json(send, 400, {"error": "Question is required"}, cors)
+        return
+    try:
+        filters = SearchFilter.from_dict(data.get("filters"))
+    except ValueError as e:
+        await _send_json(send, 400, {"error": f"Invalid filters: {e}"}, cors)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + cors,
+    })
+
+    async def emit(data: dict, event: str):
+        await send({"type": "http.response.body", "body": format_sse(data, event).encode("utf-8"), "more_body": True})
+
+    start = time.perf_counter()
+    timings = {}
+    fields = {"question": question[:200], "timings": timings}
+    status = 200
+    try:
+        # Encoding and FAISS search are blocking; keep them off the event loop
+        top_chunks, query_vector = await asyncio.to_thread(_retrieve, question, filters, timings)
+        chunk_ids = [chunk["id"] for chunk in top_chunks]
+        fields["chunks"] = chunk_ids
+
+        answer = answer_cache.get(query_vector, chunk_ids)
+        fields["cached"] = answer is not None
+        if answer is not None:
+            await emit({"text": answer, "cached": True}, "token")
+        else:
+            parts = []
+            async for text in astream_response(question, top_chunks, timings):
+                parts.append(text)
+                await emit({"text": text}, "token")
+            answer = "".join(parts)
+            answer_cache.put(query_vector, chunk_ids, answer)
+        fields["answer_chars"] = len(answer)
+        await emit({}, "done")
+    except Exception as e:
+        # Headers are already sent; the status only labels the metric and log line
+        status = 500
+        fields["error"] = str(e)
+        await emit({"error": str(e)}, "error")
+    await send({"type": "http.response.body", "body": b""})
+    log_request(STREAM_PATH, status, time.perf_counter() - start, **fields)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+
+    if scope["type"] == "http" and scope["path"] == STREAM_PATH:
+        if scope["method"] == "POST":
+            await stream_query(scope, receive, send)
+            return
+        if scope["method"] == "OPTIONS":
+            await send({
+                "type": "http.response.start",
+                "status": 204,
+                "headers": [
+                    (b"access-control-allow-methods", b"POST, OPTIONS"),
+                    (b"access-control-allow-headers", b"content-type"),
+                ] + _cors_headers(scope),
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+    if flask_app is not None:
+        await flask_app(scope, receive, send)
+        return
+    await _send_json(send, 404, {"error": "Not found"}, [])
@@ -1,7 +1,8 @@
+from utils.context import pack_context
 from utils.gemini_llm import GeminiWrapper
 
 gemini = GeminiWrapper()
 
 def generate_answer(query, chunks):
-    context = "\n\n".join([chunk["content"] for chunk in chunks])
+    context = pack_context(chunks).text
     return gemini.ask_with_context(query, context)
@@ -1,7 +1,6 @@
-from utils.retriever import VectorRetriever
+from utils.registry import lease_retriever
 
-retrieve_relevant_chunks = VectorRetriever()
-
-def get_top_chunks(query, k=4):
-    chunks = retrieve_relevant_chunks.retrieve(query)
+def get_top_chunks(query, k=4, filters=None):
+    with lease_retriever() as retriever:
+        chunks = retriever.retrieve(query, top_k=k, filters=filters)
     return chunks
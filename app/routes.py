@@ -1,27 +1,121 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
+import time
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context
 from app.retriever import get_top_chunks
-from utils.gemini_llm import generate_response as generate_answer
-from utils.retriever import VectorRetriever
+from app.streaming import format_sse
+from utils.gemini_llm import client as llm_client, generate_response as generate_answer, stream_response
+from utils.llm_client import LLMError, LLMTimeout
+from utils.answer_cache import SemanticAnswerCache
+from utils.filters import SearchFilter
+from utils.metrics import log_request, register_collector, render as render_metrics
+from utils.batch import answer_questions
+from utils.registry import get_index_handle, get_retriever, lease_retriever, memory_report
 from flask_cors import CORS, cross_origin
 
 
-retriever = VectorRetriever()
+# Reuses an answer when a near-identical question retrieved the same chunks
+answer_cache = SemanticAnswerCache(
+    maxsize=int(os.getenv("RBI_ANSWER_CACHE_SIZE", "512")),
+    threshold=float(os.getenv("RBI_ANSWER_CACHE_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("RBI_ANSWER_CACHE_TTL", "21600")),
+    version_check_seconds=float(os.getenv("RBI_ANSWER_CACHE_VERSION_CHECK", "2")),
+)
 
+BATCH_MAX_QUESTIONS = int(os.getenv("RBI_BATCH_MAX_QUESTIONS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("RBI_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_TOP_K = int(os.getenv("RBI_BATCH_MAX_TOP_K", "20"))
+# Unset disables the admin endpoints
+ADMIN_TOKEN = os.getenv("RBI_ADMIN_TOKEN")
 
 
 api = Blueprint("api", __name__)
 
+
+def _collect():
+    llm = llm_client.stats()
+    cache = answer_cache.stats()
+    return [
+        ("rbi_llm_events_total", "counter", "LLM client calls, retries, hedges, timeouts, rejections, failures.",
+         [({"event": name}, llm[name]) for name in ("calls", "retries", "hedges", "hedge_wins", "timeouts",
+                                                    "rejected", "failures")]),
+        ("rbi_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open or half-open.",
+         [({}, int(llm["circuit"] != "closed"))]),
+        ("rbi_answer_cache_lookups_total", "counter", "Semantic answer cache lookups.",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        ("rbi_answer_cache_entries", "gauge", "Answers held in the semantic answer cache.", [({}, cache["size"])]),
+    ]
+
+
+register_collector(_collect)
+
+
+@api.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@api.after_request
+def _record_request(response):
+    # Streaming routes are timed to their first byte; their stages are in rbi_stage_seconds
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    log_request(rule, response.status_code, time.perf_counter() - g.request_start, **g.get("log_fields", {}))
+    return response
+
+
 @api.route("/", methods=["GET"])
 @cross_origin(origins=['http://localhost:5173',"https://rbi-chatbot-frontend.vercel.app"]) 
 def check_server():
     try:
         return jsonify({
-            "res":"Got your request, yaar"
+            "res":"Got your request, yaar",
+            "index": get_index_handle().status()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
+@api.route("/stats", methods=["GET"])
+@cross_origin(origins=['http://localhost:5173',"https://rbi-chatbot-frontend.vercel.app"]) 
+def cache_stats():
+    try:
+        return jsonify({
+            "query_embedding_cache": get_retriever().query_cache.stats(),
+            "embedding_batcher": get_retriever().embedder.batcher.stats(),
+            "answer_cache": answer_cache.stats(),
+            "llm": llm_client.stats()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api.route("/memory", methods=["GET"])
+@cross_origin(origins=['http://localhost:5173',"https://rbi-chatbot-frontend.vercel.app"]) 
+def memory_usage():
+    try:
+        return jsonify(memory_report())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    """Prometheus text format: stage and request latency histograms, LLM and cache counters"""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@api.route("/admin/reload", methods=["POST"])
+def reload_index():
+    """Reload the index in the background; every worker follows via the reload trigger file."""
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        handle = get_index_handle()
+        started = handle.request_reload()
+        return jsonify({"reloading": True, "started": started, "index": handle.status()}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
 @api.route("/query", methods=["POST"])
@@ -31,13 +125,104 @@ def query_rbi():
     question = data.get("question")
     if not question:
         return jsonify({"error": "Question is required"}), 400
+    try:
+        filters = SearchFilter.from_dict(data.get("filters"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filters: {e}"}), 400
 
     try:
-        top_chunks = retriever.retrieve(question)
-        answer = generate_answer(question, top_chunks)
-        print(answer)
+        # The lease keeps this request on one index version across a hot reload
+        timings = {}
+        with lease_retriever() as retriever:
+            top_chunks, query_vector = retriever.retrieve(question, filters=filters, timings=timings,
+                                                          return_vector=True)
+        chunk_ids = [chunk["id"] for chunk in top_chunks]
+
+        answer = answer_cache.get(query_vector, chunk_ids)
+        cached = answer is not None
+        if not cached:
+            answer = generate_answer(question, top_chunks, timings=timings)
+            answer_cache.put(query_vector, chunk_ids, answer)
+        g.log_fields = {"question": question[:200], "chunks": chunk_ids, "cached": cached,
+                        "answer_chars": len(answer), "timings": timings}
         return jsonify({
-            "answer": answer
+            "answer": answer,
+            "cached": cached,
+            "timings": timings
         })
+    except LLMError as e:
+        # Upstream slow or down: tell the client to retry rather than report a server error
+        g.log_fields = {"question": question[:200], "error": str(e), "timings": timings}
+        status = 504 if isinstance(e, LLMTimeout) else 503
+        return jsonify({"error": str(e), "retryable": True}), status, {"Retry-After": "5"}
     except Exception as e:
+        g.log_fields = {"question": question[:200], "error": str(e)}
         return jsonify({"error": str(e)}), 500
+
+
+
+@api.route("/query/stream", methods=["POST"])
+@cross_origin(origins=['http://localhost:5173',"https://rbi-chatbot-frontend.vercel.app"]) 
+def query_rbi_stream():
+    """
+    Server-sent events version of /query for WSGI deployments. Under ASGI
+    (app.asgi) the same path is served without holding a worker thread.
+    """
+    data = request.get_json()
+    question = data.get("question")
+    if not question:
+        return jsonify({"error": "Question is required"}), 400
+    try:
+        filters = SearchFilter.from_dict(data.get("filters"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid filters: {e}"}), 400
+
+    def events():
+        try:
+            with lease_retriever() as retriever:
+                top_chunks, query_vector = retriever.retrieve(question, filters=filters, return_vector=True)
+            chunk_ids = [chunk["id"] for chunk in top_chunks]
+
+            answer = answer_cache.get(query_vector, chunk_ids)
+            if answer is not None:
+                yield format_sse({"text": answer, "cached": True}, event="token")
+            else:
+                parts = []
+                for text in stream_response(question, top_chunks):
+                    parts.append(text)
+                    yield format_sse({"text": text}, event="token")
+                answer_cache.put(query_vector, chunk_ids, "".join(parts))
+            yield format_sse({}, event="done")
+        except Exception as e:
+            yield format_sse({"error": str(e)}, event="error")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+
+@api.route("/query/batch", methods=["POST"])
+@cross_origin(origins=['http://localhost:5173',"https://rbi-chatbot-frontend.vercel.app"]) 
+def query_rbi_batch():
+    """Answer a list of questions; results are streamed back as JSONL in completion order."""
+    data = request.get_json()
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not questions or not isinstance(questions, list):
+        return jsonify({"error": "questions must be a non-empty list"}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}), 400
+    top_k = data.get("top_k", 4)
+    # bool is an int subclass; floats and numeric strings are not silently truncated
+    if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= BATCH_MAX_TOP_K:
+        return jsonify({"error": f"top_k must be an integer from 1 to {BATCH_MAX_TOP_K}"}), 400
+
+    def lines():
+        try:
+            with lease_retriever() as retriever:
+                for result in answer_questions(questions, retriever, generate_answer,
+                                               concurrency=BATCH_CONCURRENCY, top_k=top_k):
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype="application/x-ndjson")
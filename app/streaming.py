@@ -0,0 +1,7 @@
+import json
+
+
+def format_sse(data: dict, event: str = None) -> str:
+    """Encode one server-sent event."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -20,7 +20,7 @@ def save_processed_ids(ids, path="data/faiss_index/processed_ids.json"):
 
 def run_update():
     print("🔄 Running RBI auto update...")
-    all_docs = scrape_rbi_documents(limit=50)  # get latest
+    all_docs = scrape_rbi_documents()  # every new or changed page since the last run
 
     processed_ids = get_existing_ids()
     new_docs = []
@@ -0,0 +1,36 @@
+import argparse
+import json
+import time
+from utils.batch import answer_questions, read_jsonl
+from utils.gemini_llm import generate_response
+from utils.registry import get_retriever
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of RBI questions in bulk")
+    parser.add_argument("input", help='JSONL with one {"question": ..., "id": ...} (or a bare string) per line')
+    parser.add_argument("output", help="JSONL file the answers are written to")
+    parser.add_argument("--batch-size", type=int, default=64, help="questions embedded and searched together")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight at once")
+    parser.add_argument("--top-k", type=int, default=4)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    answered = failed = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        results = answer_questions(read_jsonl(args.input), get_retriever(), generate_response,
+                                   batch_size=args.batch_size, concurrency=args.concurrency, top_k=args.top_k)
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+            else:
+                answered += 1
+            if (answered + failed) % 50 == 0:
+                print(f"[+] {answered + failed} questions done")
+
+    elapsed = time.perf_counter() - start
+    print(f"[✓] Answered {answered} questions ({failed} failed) in {elapsed:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
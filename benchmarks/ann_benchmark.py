@@ -0,0 +1,125 @@
+"""
+Recall-vs-latency benchmark for the index types in utils.ann.
+
+    python -m benchmarks.ann_benchmark --synthetic 100000
+    python -m benchmarks.ann_benchmark --store data/faiss_index/store --json ann.json
+
+Recall@k is measured against exact flat search over the same vectors.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from utils.ann import INDEX_TYPES, build_index, describe_index, search_parameters
+
+
+def synthetic_vectors(n: int, dim: int = 384, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Clustered, L2-normalised vectors that look more like sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def store_vectors(store_dir: str) -> np.ndarray:
+    from utils.index_store import IndexStore
+    return np.asarray(IndexStore(store_dir).vectors)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of random corpus vectors, so each query has a real neighbourhood."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(vectors), count)
+    queries = vectors[rows] + 0.05 * rng.standard_normal((count, vectors.shape[1])).astype(np.float32)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    return float(np.percentile(samples, pct) * 1000)
+
+
+def run_case(index, queries, truth, k, params=None) -> dict:
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    return {
+        "recall_at_k": round(float(recall), 4),
+        "p50_ms": round(percentile_ms(latencies, 50), 4),
+        "p99_ms": round(percentile_ms(latencies, 99), 4),
+    }
+
+
+def benchmark(vectors, queries, k=4, index_types=INDEX_TYPES, nprobes=(1, 8, 32), ef_searches=(16, 64, 128)) -> list[dict]:
+    _, truth = faiss.knn(queries, vectors, k)
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type)
+        build_s = time.perf_counter() - start
+        base = {
+            "index_type": index_type,
+            "index": describe_index(index),
+            "vectors": int(index.ntotal),
+            "build_s": round(build_s, 3),
+            "memory_bytes": int(faiss.serialize_index(index).nbytes),
+        }
+        if isinstance(index, faiss.IndexIVF):
+            cases = [({"nprobe": n}, search_parameters(index, nprobe=n)) for n in nprobes]
+        elif isinstance(index, faiss.IndexHNSW):
+            cases = [({"ef_search": ef}, search_parameters(index, ef_search=ef)) for ef in ef_searches]
+        else:
+            cases = [({}, None)]
+        for knobs, params in cases:
+            results.append({**base, **knobs, **run_case(index, queries, truth, k, params)})
+    return results
+
+
+def print_table(title: str, results: list[dict]):
+    print(f"\n{title}")
+    print(f"{'index':<28}{'knob':<14}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'MB':>10}{'build s':>10}")
+    for r in results:
+        knob = f"nprobe={r['nprobe']}" if "nprobe" in r else f"ef={r['ef_search']}" if "ef_search" in r else "-"
+        print(f"{r['index']:<28}{knob:<14}{r['recall_at_k']:>10.3f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['memory_bytes'] / 2**20:>10.1f}{r['build_s']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=50000, help="synthetic corpus size (0 to skip)")
+    parser.add_argument("--store", help="index store directory with real chunk vectors")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    index_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    report = {}
+    datasets = []
+    if args.synthetic:
+        datasets.append((f"synthetic-{args.synthetic}", synthetic_vectors(args.synthetic)))
+    if args.store:
+        datasets.append((f"store:{args.store}", store_vectors(args.store)))
+
+    for name, vectors in datasets:
+        queries = make_queries(vectors, args.queries)
+        report[name] = benchmark(vectors, queries, args.k, index_types)
+        print_table(f"{name} ({len(vectors)} vectors, {args.queries} queries, k={args.k})", report[name])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[✓] Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
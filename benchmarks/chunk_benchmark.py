@@ -0,0 +1,107 @@
+"""
+Compare the legacy clean_text/chunk_text pair with the one-pass cleaner and
+token-aware chunker on large documents.
+
+    python -m benchmarks.chunk_benchmark --documents 200 --words 8000
+    python -m benchmarks.chunk_benchmark --csv rbi_complete_data.csv
+
+Reports documents/sec, MB/sec, peak traced memory, chunk counts and how many
+chunks exceed the encoder's token limit (and so are silently truncated).
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fixture_site import WORDS
+from utils.chunker import TokenChunker, clean, get_tokenizer
+from utils.preprocess import chunk_text, clean_text
+
+# Model max_seq_length, including [CLS] and [SEP]
+ENCODER_LIMIT = 256
+
+
+def synthetic_documents(count, words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = WORDS + ["RBI/2023-24/45", "Rs. 5,00,000", "NBFC’s", "₹", "31.03.2024;", "\n\n", "\t"]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count)]
+
+
+def csv_documents(path, limit):
+    csv.field_size_limit(sys.maxsize)
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        documents = [(row.get("Content") or "") for row in csv.DictReader(f)]
+    return [document for document in documents if document][:limit]
+
+
+def legacy(documents):
+    return [chunk_text(clean_text(document)) for document in documents]
+
+
+def token_aware(documents, chunker, batch=64):
+    chunks = []
+    for i in range(0, len(documents), batch):
+        cleaned = [clean(document) for document in documents[i:i + batch]]
+        for text, spans in zip(cleaned, chunker.spans_batch(cleaned)):
+            chunks.append([text[span.start:span.end] for span in spans])
+    return chunks
+
+
+def measure(name, run, documents, tokenizer):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = run(documents)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    flat = [chunk for document_chunks in chunks for chunk in document_chunks]
+    lengths = [len(encoding) + 2 for encoding in tokenizer.encode_batch(flat, add_special_tokens=False)]
+    size_mb = sum(len(document) for document in documents) / 1e6
+    return {
+        "chunker": name,
+        "documents_per_second": round(len(documents) / elapsed, 1),
+        "mb_per_second": round(size_mb / elapsed, 2),
+        "peak_memory_kb": round(peak / 1024),
+        "chunks": len(flat),
+        "mean_chunk_tokens": round(sum(lengths) / len(lengths), 1) if lengths else 0,
+        "max_chunk_tokens": max(lengths, default=0),
+        "truncated_chunks": sum(length > ENCODER_LIMIT for length in lengths),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="scraped CSV to take documents from")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--words", type=int, default=8000, help="words per synthetic document")
+    parser.add_argument("--max-tokens", type=int, default=ENCODER_LIMIT - 2)
+    parser.add_argument("--overlap", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.csv:
+        documents = csv_documents(args.csv, args.documents)
+    else:
+        documents = synthetic_documents(args.documents, args.words)
+    if not documents:
+        parser.error("no documents found")
+
+    chunker = TokenChunker(max_tokens=args.max_tokens, overlap=args.overlap)
+    tokenizer = get_tokenizer(chunker.model_name)
+    tokenizer.encode_batch(["warm up"], add_special_tokens=False)
+    results = [
+        measure("legacy (3 re.sub + word lists)", legacy, documents, tokenizer),
+        measure("token-aware spans", lambda docs: token_aware(docs, chunker), documents, tokenizer),
+    ]
+    print(json.dumps({
+        "documents": len(documents),
+        "tokenizer": type(tokenizer).__name__,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
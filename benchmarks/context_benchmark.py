@@ -0,0 +1,92 @@
+"""
+Prompt context size before and after the context packer.
+
+    python -m benchmarks.context_benchmark --chunks data/chunks.jsonl --queries 200
+    python -m benchmarks.context_benchmark --questions questions.txt --top-k 4,8 --json context.json
+
+For each query the retrieved chunks are turned into context: joined as-is
+(the previous build_prompt, which had no titles or URLs), joined with each
+chunk's title and URL (what citing them per chunk would cost), and through
+utils.context.pack_context. Savings are against the second. Tokens are
+counted with the same tokenizer throughout.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.quantization_benchmark import load_texts, make_queries
+from utils.context import CONTEXT_TOKENS, count_tokens, pack_context
+from utils.registry import DEFAULT_INDEX_PATH, get_retriever
+
+
+def benchmark(queries, top_ks=(4, 8), budget=CONTEXT_TOKENS, index_path=DEFAULT_INDEX_PATH) -> list[dict]:
+    retriever = get_retriever(index_path)
+    results = []
+    for top_k in top_ks:
+        raw, cited, packed, merged, duplicates, truncated, pack_ms = [], [], [], [], [], 0, []
+        for query in queries:
+            chunks = retriever.retrieve(query, top_k=top_k)
+            raw.append(count_tokens(" ".join("\n\n".join(chunk["content"] for chunk in chunks).split())))
+            cited.append(raw[-1] + sum(count_tokens(" ".join(f"{chunk.get('title', '')} URL: {chunk.get('url', '')}".split()))
+                                       for chunk in chunks))
+            start = time.perf_counter()
+            context = pack_context(chunks, budget)
+            pack_ms.append((time.perf_counter() - start) * 1000)
+            packed.append(context.tokens)
+            merged.append(context.merged)
+            duplicates.append(context.duplicates)
+            truncated += context.truncated
+        results.append({
+            "top_k": top_k,
+            "queries": len(queries),
+            "raw_tokens_mean": round(float(np.mean(raw)), 1),
+            "cited_tokens_mean": round(float(np.mean(cited)), 1),
+            "packed_tokens_mean": round(float(np.mean(packed)), 1),
+            "reduction": round(1 - float(np.sum(packed)) / max(float(np.sum(cited)), 1), 4),
+            "merged_mean": round(float(np.mean(merged)), 2),
+            "duplicates_mean": round(float(np.mean(duplicates)), 2),
+            "truncated_share": round(truncated / len(queries), 4),
+            "pack_p50_ms": round(float(np.percentile(pack_ms, 50)), 3),
+            "pack_p99_ms": round(float(np.percentile(pack_ms, 99)), 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH)
+    parser.add_argument("--chunks", help="chunks file to cut synthetic queries from")
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", default="4,8")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKENS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()][:args.queries]
+    elif args.chunks:
+        queries = make_queries(load_texts(args.chunks, 20000), args.queries)
+    else:
+        parser.error("one of --questions or --chunks is required")
+
+    top_ks = [int(k) for k in args.top_k.split(",") if k.strip()]
+    results = benchmark(queries, top_ks, args.budget, args.index)
+    print(f"\n{'top_k':>6}{'raw tok':>10}{'cited tok':>11}{'packed tok':>12}{'saved':>8}{'merged':>8}{'dupes':>8}"
+          f"{'trunc':>8}{'p50 ms':>8}")
+    for r in results:
+        print(f"{r['top_k']:>6}{r['raw_tokens_mean']:>10.0f}{r['cited_tokens_mean']:>11.0f}{r['packed_tokens_mean']:>12.0f}"
+              f"{r['reduction']:>8.1%}"
+              f"{r['merged_mean']:>8.2f}{r['duplicates_mean']:>8.2f}{r['truncated_share']:>8.1%}{r['pack_p50_ms']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[✓] Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Crawl a local fixture site with the serial scraper and the concurrent engine
+and report pages/sec.
+
+    python -m benchmarks.crawl_benchmark --sections 4 --pages 50 --latency-ms 50
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.fixture_site import FixtureSite
+from scraper.fetcher import ConcurrentCrawler
+from scraper.rbi_scraper import RBICSVScraper
+
+
+def run_serial(site: FixtureSite, csv_path: str) -> dict:
+    scraper = RBICSVScraper(csv_path)
+    start = time.perf_counter()
+    for section in range(site.sections):
+        scraper.crawler1(f"{site.home_url}Scripts/Section{section}.aspx")
+    elapsed = time.perf_counter() - start
+    pages = len(scraper.scraped_urls)
+    return {"pages": pages, "rows_written": scraper.processed_count, "elapsed_s": round(elapsed, 2),
+            "pages_per_second": round(pages / elapsed, 2)}
+
+
+def run_concurrent(site: FixtureSite, csv_path: str, state_path: str = None, **options) -> dict:
+    scraper = RBICSVScraper(csv_path, state_path=state_path)
+    crawler = ConcurrentCrawler(scraper, home_url=site.home_url, **options)
+    stats = crawler.crawl_site()
+    # Content pages only, like the serial run; the crawler's own rate also counts listings
+    pages = len(scraper.scraped_urls)
+    return {"pages": pages, "rows_written": scraper.processed_count, "elapsed_s": stats["elapsed_seconds"],
+            "pages_per_second": round(pages / stats["elapsed_seconds"], 2), "errors": stats["errors"],
+            "unchanged": scraper.unchanged_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50, help="content pages per section")
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated server latency")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=50.0, help="requests/sec per host")
+    parser.add_argument("--skip-serial", action="store_true", help="the serial crawler sleeps 0.5s per page")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp, \
+            FixtureSite(args.sections, args.pages, args.latency_ms) as site:
+        if not args.skip_serial:
+            report["serial"] = run_serial(site, os.path.join(tmp, "serial.csv"))
+        options = dict(fetch_workers=args.fetch_workers, requests_per_second=args.rate, burst=args.fetch_workers)
+        report["concurrent"] = run_concurrent(site, os.path.join(tmp, "concurrent.csv"), **options)
+
+        # Incremental: a first crawl records validators, the recrawl should mostly see 304s
+        csv_path, state_path = os.path.join(tmp, "incremental.csv"), os.path.join(tmp, "state.sqlite")
+        report["incremental_first"] = run_concurrent(site, csv_path, state_path, **options)
+        report["incremental_recrawl"] = run_concurrent(site, csv_path, state_path, **options)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
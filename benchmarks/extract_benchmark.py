@@ -0,0 +1,121 @@
+"""
+Compare the legacy four-pass BeautifulSoup extraction with the single-pass
+extractor backends on saved HTML pages.
+
+    python -m benchmarks.extract_benchmark --fixtures path/to/saved_rbi_pages
+    python -m benchmarks.extract_benchmark --synthetic 200 --nesting 40
+
+Reports pages/sec, output size and memory per extractor. Each extractor
+runs in its own process: peak_rss_delta_kb is how far its peak RSS rose
+above the RSS after loading the pages, which includes the C allocations of
+lxml and selectolax. python_heap_peak_kb comes from tracemalloc on a
+separate, untimed pass and only sees Python-level allocations.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup as bs
+
+from benchmarks.fixture_site import content_page
+from scraper.extract import available_backends, extract_page
+from scraper.rbi_scraper import extract_content, extract_topic
+
+
+def legacy_extract(url, html):
+    soup = bs(html, 'html.parser')
+    return extract_topic(url, soup), extract_content(soup)
+
+
+def load_pages(fixtures_dir, synthetic, nesting):
+    if fixtures_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.htm*"))):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                pages.append((path, f.read()))
+        return pages
+    # Deeply nested divs are where repeated get_text() calls go quadratic
+    return [(f"synthetic/{i}.html", content_page(i, paragraphs=30, nesting=nesting)) for i in range(synthetic)]
+
+
+def peak_rss_kb() -> int:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+LEGACY = "legacy bs4 (4 passes)"
+
+
+def extractor(name):
+    if name == LEGACY:
+        return legacy_extract
+    return lambda url, html: extract_page(url, html, name)
+
+
+def measure(name, extract, pages, repeat):
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    chars = 0
+    for _ in range(repeat):
+        for url, html in pages:
+            _, content = extract(url, html)
+            chars += len(content)
+    elapsed = time.perf_counter() - start
+    rss_after = peak_rss_kb()
+
+    tracemalloc.start()
+    for url, html in pages:
+        extract(url, html)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(pages) * repeat
+    return {
+        "extractor": name,
+        "pages_per_second": round(count / elapsed, 1),
+        "mean_content_chars": round(chars / count),
+        "peak_rss_delta_kb": rss_after - rss_before if rss_before is not None else None,
+        "python_heap_peak_kb": round(heap_peak / 1024),
+    }
+
+
+def measure_in_child(name, argv):
+    """Run one extractor in a fresh interpreter so earlier runs do not inflate its RSS"""
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.extract_benchmark", *argv, "--run-extractor", name],
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of saved .html pages")
+    parser.add_argument("--synthetic", type=int, default=100, help="synthetic pages when no fixtures are given")
+    parser.add_argument("--nesting", type=int, default=25, help="div nesting depth of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--run-extractor", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pages = load_pages(args.fixtures, args.synthetic, args.nesting)
+    if not pages:
+        parser.error("no pages found")
+    if args.run_extractor:
+        print(json.dumps(measure(args.run_extractor, extractor(args.run_extractor), pages, args.repeat)))
+        return
+    argv = ["--synthetic", str(args.synthetic), "--nesting", str(args.nesting), "--repeat", str(args.repeat)]
+    if args.fixtures:
+        argv += ["--fixtures", args.fixtures]
+    results = [measure_in_child(name, argv) for name in [LEGACY, *available_backends()]]
+    print(json.dumps({"pages": len(pages), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
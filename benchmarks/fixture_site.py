@@ -0,0 +1,110 @@
+"""
+Synthetic RBI-like website served from a local HTTP server, used to
+exercise the crawler offline.
+
+    home page  ->  ../Scripts/Section{s}.aspx     (listing pages)
+    listings   ->  <a class="link2"> content pages Scripts/Display.aspx?Id={n}
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = ("reserve bank india circular banks regulated entities payment systems repo rate "
+         "liquidity adjustment facility monetary policy committee kyc norms upi nbfc "
+         "priority sector lending basel capital adequacy foreign exchange management act "
+         "master direction notification press release deposit interest rate scheduled "
+         "commercial cooperative inspection supervision compliance risk").split()
+
+
+def _sentence(rng, words=18):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def content_page(page_id: int, paragraphs: int = 12, nesting: int = 4) -> str:
+    """A circular-style page: title, bold headings, nested divs, paragraphs and a table."""
+    rng = random.Random(page_id)
+    body = [f"<b>RBI/2024-25/{page_id} DOR.CRE.REC.{page_id}/21.04.048/2024-25</b>"]
+    for p in range(paragraphs):
+        body.append(f"<p>{_sentence(rng)} {_sentence(rng)}</p>")
+        if p % 4 == 0:
+            body.append(f"<b>{_sentence(rng, 6)}</b>")
+    nested = "<div>" * nesting + " ".join(_sentence(rng) for _ in range(6)) + "</div>" * nesting
+    rows = "".join(f"<tr><td>{i}</td><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 999)}</td></tr>" for i in range(8))
+    return (f"<html><head><title>Circular {page_id}: {_sentence(rng, 6)}</title></head><body>"
+            f"<div class='content'>{''.join(body)}{nested}<table><tr><th>No</th><th>Item</th><th>Value</th></tr>{rows}</table></div>"
+            f"</body></html>")
+
+
+class FixtureSite:
+    """Serve `sections` listing pages with `pages_per_section` content pages each."""
+
+    def __init__(self, sections: int = 4, pages_per_section: int = 50, latency_ms: float = 20, port: int = 0,
+                 validators: bool = True):
+        self.sections = sections
+        self.pages_per_section = pages_per_section
+        self.latency = latency_ms / 1000
+        # Send ETags and answer matching If-None-Match with 304
+        self.validators = validators
+        self.requests = 0
+        self.not_modified = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.requests += 1
+                time.sleep(site.latency)
+                body = site.render(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                data = body.encode("utf-8")
+                etag = '"%s"' % hashlib.md5(data).hexdigest()
+                if site.validators and self.headers.get("If-None-Match") == etag:
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if site.validators:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def home_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def render(self, path: str):
+        parsed = urlparse(path)
+        if parsed.path == "/":
+            links = "".join(f'<a href="../Scripts/Section{s}.aspx">Section {s}</a>' for s in range(self.sections))
+            return f"<html><head><title>Reserve Bank of India</title></head><body>{links}</body></html>"
+        if parsed.path.startswith("/Scripts/Section"):
+            section = int(parsed.path[len("/Scripts/Section"):-len(".aspx")])
+            first = section * self.pages_per_section
+            links = "".join(f'<a class="link2" href="{self.home_url}Scripts/Display.aspx?Id={n}">Circular {n}</a>'
+                            for n in range(first, first + self.pages_per_section))
+            return f"<html><body>{links}</body></html>"
+        if parsed.path == "/Scripts/Display.aspx":
+            return content_page(int(parse_qs(parsed.query)["Id"][0]))
+        return None
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,468 @@
+"""
+Offline benchmark of the whole RAG pipeline on a synthetic RBI-like corpus.
+
+    python -m benchmarks.pipeline_benchmark --chunks 10000 --json pipeline.json
+    python -m benchmarks.pipeline_benchmark --chunks 1000000 --stages corpus,preprocess --work-dir /data/bench
+    python -m benchmarks.pipeline_benchmark --work-dir /data/bench --stages retrieve,api --json after.json
+    python -m benchmarks.pipeline_benchmark --compare before.json after.json
+
+Stages, each run in a fresh process so that peak RSS and startup are its own:
+
+    corpus      CSV of dated, titled documents with circular numbers, sized to about --chunks chunks
+    preprocess  clean_text/chunk_text, then the streaming token-aware preprocessor -> data/chunks.jsonl
+    embed       BulkEmbeddingJob over the chunks, starting from an empty embedding store
+    index       utils.ann.build_index for each --index-types; the first one is written as the served segment
+    retrieve    VectorRetriever.retrieve at each --top-k, with per-stage timings
+    api         POST /api/query through the Flask test client, answered by the stub LLM
+
+Nothing touches the network: the LLM is utils.llm_stub and the Hugging Face
+hub is put in offline mode, so the embedding model has to be in the local
+cache already. Everything is written under --work-dir, whose later stages
+can be rerun on their own. The JSON report records the machine, commit and
+arguments next to each stage's throughput, latency percentiles, peak RSS
+and startup time; --compare prints how every number moved between two.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Heavy modules are imported inside the stages, where their import time is part of what is measured
+
+STAGES = ("corpus", "preprocess", "embed", "index", "retrieve", "api")
+CORPUS_FILE = "corpus.csv"
+CHUNKS_FILE = "data/chunks.jsonl"
+QUERIES_FILE = "queries.txt"
+OPTIONS_FILE = "options.json"
+EMBED_DIR = "data/faiss_index/embed_job"
+EMBEDDING_STORE_DIR = "data/faiss_index/embedding_store"
+SEGMENTS_DIR = "data/faiss_index/segments"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (section, URL of a document in it, title prefix); URLs match utils.filters.SECTION_PATTERNS
+SECTIONS = [
+    ("press_release", "https://www.rbi.org.in/Scripts/BS_PressReleaseDisplay.aspx?prid={id}", "Press Release"),
+    ("notification", "https://www.rbi.org.in/Scripts/NotificationUser.aspx?Id={id}", "Notification"),
+    ("master_direction", "https://www.rbi.org.in/Scripts/BS_ViewMasDirections.aspx?id={id}", "Master Direction"),
+    ("circular", "https://www.rbi.org.in/Scripts/BS_CircularIndexDisplay.aspx?Id={id}", "Circular"),
+    ("speech", "https://www.rbi.org.in/Scripts/BS_SpeechesView.aspx?Id={id}", "Speech"),
+    ("publication", "https://www.rbi.org.in/Scripts/PublicationsView.aspx?Id={id}", "Publication"),
+]
+FIRST_DATE = date(2015, 1, 1)
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    import numpy as np
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(seconds),
+        "qps": round(len(seconds) / float(np.sum(seconds)), 2) if len(seconds) else 0.0,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def synthetic_document(doc_id: int, words: int, seed: int = 0) -> dict:
+    """One RBI-like document: section URL, numbered title, a date line and paragraphs of policy words"""
+    from benchmarks.fixture_site import WORDS
+    rng = random.Random(seed * 1_000_003 + doc_id)
+    section, url, prefix = SECTIONS[doc_id % len(SECTIONS)]
+    day = FIRST_DATE + timedelta(days=rng.randrange(3650))
+    year = f"{day.year}-{(day.year + 1) % 100:02d}"
+    number = f"RBI/{year}/{doc_id % 250 + 1}"
+    reference = f"DOR.CRE.REC.{doc_id % 97 + 1}/21.04.048/{year}"
+    topic = " ".join(rng.choices(WORDS, k=5))
+    lines = [f"{number} {reference}", f"{day.strftime('%B')} {day.day}, {day.year}",
+             f"{prefix}: {topic.capitalize()}"]
+    written = 0
+    while written < words:
+        sentences = []
+        for _ in range(rng.randint(3, 6)):
+            sentence = rng.choices(WORDS, k=rng.randint(10, 24))
+            if rng.random() < 0.15:
+                sentence.append(rng.choice([number, reference, f"Rs. {rng.randint(1, 99)},00,000",
+                                            f"₹{rng.randint(1, 500)} crore", f"{rng.randint(1, 12)}.5 per cent"]))
+            sentences.append(" ".join(sentence).capitalize() + ".")
+            written += len(sentence)
+        lines.append(" ".join(sentences))
+    return {"Topic": f"{prefix} {doc_id}: {topic}", "URL": url.format(id=doc_id), "Content": "\n\n".join(lines),
+            "section": section}
+
+
+def stage_corpus(options: dict) -> dict:
+    from utils.chunker import TokenChunker, clean
+    start = time.perf_counter()
+    sample = [synthetic_document(i, options["doc_words"], options["seed"]) for i in range(32)]
+    # Chunks per document as the token-aware chunker will cut them
+    per_doc = sum(len(TokenChunker().chunk(clean(doc["Content"]))) for doc in sample) / len(sample)
+    documents = max(math.ceil(options["chunks"] / per_doc), 1)
+
+    size = 0
+    with open(CORPUS_FILE, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Topic", "URL", "Content"], extrasaction="ignore")
+        writer.writeheader()
+        for doc_id in range(documents):
+            document = synthetic_document(doc_id, options["doc_words"], options["seed"])
+            size += len(document["Content"].encode("utf-8"))
+            writer.writerow(document)
+            if doc_id and doc_id % 10000 == 0:
+                print(f"[+] Wrote {doc_id}/{documents} documents")
+    elapsed = time.perf_counter() - start
+    print(f"[✓] Corpus: {documents} documents, {size / 2**20:.1f} MB, ~{documents * per_doc:.0f} chunks")
+    return {"documents": documents, "chunks_per_document": round(per_doc, 2), "expected_chunks": round(documents * per_doc),
+            "content_mb": round(size / 2**20, 2), "seconds": round(elapsed, 2),
+            "documents_per_second": round(documents / elapsed, 1)}
+
+
+def stage_preprocess(options: dict) -> dict:
+    import numpy as np
+    from benchmarks.quantization_benchmark import load_texts, make_queries
+    from preprocess_and_save_chunks import StreamingCSVPreprocessor
+    from utils.preprocess import chunk_text, clean_text
+
+    # The original cleaner and word chunker, single-threaded
+    documents = legacy_chunks = size = 0
+    start = time.perf_counter()
+    with open(CORPUS_FILE, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            legacy_chunks += len(chunk_text(clean_text(row["Content"])))
+            documents += 1
+            size += len(row["Content"])
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary = StreamingCSVPreprocessor(CORPUS_FILE, CHUNKS_FILE, workers=options["workers"]).run()
+    streaming = time.perf_counter() - start
+
+    texts = load_texts(CHUNKS_FILE, 50000)
+    queries = make_queries(texts, options["queries"], seed=options["seed"] + 1)
+    with open(QUERIES_FILE, "w", encoding="utf-8") as f:
+        f.write("\n".join(queries) + "\n")
+    return {
+        "legacy": {"documents": documents, "chunks": legacy_chunks, "seconds": round(legacy, 2),
+                   "documents_per_second": round(documents / legacy, 1),
+                   "mb_per_second": round(size / 2**20 / legacy, 2)},
+        "streaming": {"workers": options["workers"], "chunks": summary.get("total_chunks", 0),
+                      "duplicates": summary.get("duplicate_chunks", 0), "seconds": round(streaming, 2),
+                      "documents_per_second": round(documents / streaming, 1),
+                      "chunks_per_second": round(summary.get("total_chunks", 0) / streaming, 1),
+                      "mean_chunk_chars": round(float(np.mean([len(text) for text in texts])), 1)},
+    }
+
+
+def stage_embed(options: dict) -> dict:
+    from utils.bulk_embed import BulkEmbeddingJob
+    from utils.registry import get_sentence_transformer
+
+    start = time.perf_counter()
+    get_sentence_transformer()
+    model_load = time.perf_counter() - start
+    # Cold: nothing reused from an earlier run's content-hash store
+    shutil.rmtree(EMBEDDING_STORE_DIR, ignore_errors=True)
+    start = time.perf_counter()
+    vectors = BulkEmbeddingJob(CHUNKS_FILE, work_dir=EMBED_DIR, batch_size=options["embed_batch"],
+                               processes=options["embed_processes"],
+                               embedding_store_dir=EMBEDDING_STORE_DIR).run(resume=False)
+    elapsed = time.perf_counter() - start
+    return {"chunks": len(vectors), "dim": int(vectors.shape[1]), "processes": options["embed_processes"],
+            "batch_size": options["embed_batch"], "model_load_seconds": round(model_load, 2),
+            "seconds": round(elapsed, 2), "chunks_per_second": round(len(vectors) / elapsed, 1)}
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def stage_index(options: dict) -> dict:
+    import numpy as np
+    from utils.ann import build_index, describe_index
+    from utils.chunk_io import load_chunks
+    from utils.segments import SegmentWriter
+
+    with open(os.path.join(EMBED_DIR, "checkpoint.json"), "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    vectors = np.memmap(os.path.join(EMBED_DIR, "vectors.f32"), dtype=np.float32, mode="r",
+                        shape=(max(checkpoint["total"], 1), checkpoint["dim"]))[:checkpoint["total"]]
+    chunks = load_chunks(CHUNKS_FILE)
+
+    results = {"vectors": len(vectors), "types": {}}
+    for position, index_type in enumerate(options["index_types"]):
+        start = time.perf_counter()
+        index = build_index(vectors, index_type)
+        built = time.perf_counter() - start
+        result = {"index": describe_index(index), "build_seconds": round(built, 2),
+                  "vectors_per_second": round(len(vectors) / built, 1)}
+        if position == 0:
+            # The served segment: index, vectors, metadata, BM25 and filter columns
+            shutil.rmtree(SEGMENTS_DIR, ignore_errors=True)
+            start = time.perf_counter()
+            SegmentWriter(SEGMENTS_DIR).replace(index, chunks, vectors)
+            result["write_seconds"] = round(time.perf_counter() - start, 2)
+            result["disk_mb"] = round(_directory_bytes(SEGMENTS_DIR) / 2**20, 1)
+        results["types"][index_type] = result
+        print(f"[✓] {index_type}: built in {built:.2f}s")
+    return results
+
+
+def _load_queries(count: int) -> list[str]:
+    with open(QUERIES_FILE, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()][:count]
+
+
+def _stage_percentiles(timings: list[dict]) -> dict:
+    import numpy as np
+    keys = sorted({key for timing in timings for key in timing if key.endswith("_ms")})
+    return {key.replace("_ms", "_p50_ms"): round(float(np.percentile([t[key] for t in timings if key in t], 50)), 3)
+            for key in keys}
+
+
+def stage_retrieve(options: dict) -> dict:
+    start = time.perf_counter()
+    from utils.registry import get_retriever
+    imported = time.perf_counter()
+    retriever = get_retriever(SEGMENTS_DIR)
+    opened = time.perf_counter()
+    queries = _load_queries(options["queries"])
+    retriever.retrieve(queries[0], top_k=max(options["top_k"]))
+    first = time.perf_counter()
+    results = {"import_seconds": round(imported - start, 3), "open_seconds": round(opened - imported, 3),
+               "first_query_ms": round((first - opened) * 1000, 3), "startup_seconds": round(first - start, 3),
+               "top_k": {}}
+
+    for top_k in options["top_k"]:
+        # Every k pays for encoding its queries, as new questions would
+        retriever.query_cache.clear()
+        latencies, timings = [], []
+        for query in queries:
+            timing = {}
+            begin = time.perf_counter()
+            retriever.retrieve(query, top_k=top_k, timings=timing)
+            latencies.append(time.perf_counter() - begin)
+            timings.append(timing)
+        results["top_k"][str(top_k)] = {**latency_summary(latencies), **_stage_percentiles(timings)}
+        print(f"[✓] retrieve k={top_k}: p50 {results['top_k'][str(top_k)]['p50_ms']:.2f} ms")
+    return results
+
+
+def stage_api(options: dict) -> dict:
+    start = time.perf_counter()
+    from app import create_app
+    from utils.registry import get_retriever
+    app = create_app()
+    imported = time.perf_counter()
+    client = app.test_client()
+    queries = _load_queries(options["requests"] + 1)
+    response = client.post("/api/query", json={"question": queries[0]})
+    first = time.perf_counter()
+    results = {"import_seconds": round(imported - start, 3), "first_request_ms": round((first - imported) * 1000, 3),
+               "startup_seconds": round(first - start, 3), "llm_stub_ms": options["llm_ms"]}
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/query answered {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    get_retriever().query_cache.clear()
+    latencies, timings, statuses = [], [], {}
+    for query in queries[1:]:
+        begin = time.perf_counter()
+        response = client.post("/api/query", json={"question": query})
+        latencies.append(time.perf_counter() - begin)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        if response.status_code == 200:
+            timings.append(response.get_json().get("timings", {}))
+    results.update({**latency_summary(latencies), **_stage_percentiles(timings), "status": statuses})
+    print(f"[✓] /api/query: p50 {results['p50_ms']:.2f} ms over {len(latencies)} requests")
+    return results
+
+
+STAGE_FUNCTIONS = {
+    "corpus": stage_corpus,
+    "preprocess": stage_preprocess,
+    "embed": stage_embed,
+    "index": stage_index,
+    "retrieve": stage_retrieve,
+    "api": stage_api,
+}
+
+
+def run_stage(name: str):
+    """Child process entry point: run one stage in the work dir (the cwd) and save its result"""
+    with open(OPTIONS_FILE, "r", encoding="utf-8") as f:
+        options = json.load(f)
+    start = time.perf_counter()
+    result = STAGE_FUNCTIONS[name](options)
+    result["stage_seconds"] = round(time.perf_counter() - start, 2)
+    result["peak_rss_mb"] = peak_rss_mb()
+    with open(f"stage-{name}.json", "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+
+def _stage_environment(options: dict) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    env.update({"HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1", "RBI_LLM_BACKEND": "stub",
+                # The stub spends llm_ms before its first token and nothing per token
+                "RBI_STUB_FIRST_TOKEN_MS": str(options["llm_ms"]), "RBI_STUB_TOKEN_MS": "0",
+                # Every request is a new question; no answer may come from the cache
+                "RBI_ANSWER_CACHE_SIZE": "0", "RBI_LOG_SAMPLE_RATE": "0"})
+    return env
+
+
+def _git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def run_benchmark(stages, options: dict, work_dir: str) -> dict:
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(work_dir, OPTIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump(options, f, indent=2)
+    report = {
+        "meta": {**_git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "options": options},
+        "stages": {},
+    }
+    env = _stage_environment(options)
+    for name in stages:
+        print(f"\n[+] Stage {name}")
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-m", "benchmarks.pipeline_benchmark", "--run-stage", name],
+                                   cwd=work_dir, env=env)
+        process_seconds = round(time.perf_counter() - start, 2)
+        if completed.returncode != 0:
+            print(f"[!] Stage {name} failed with exit code {completed.returncode}; later stages skipped")
+            report["stages"][name] = {"error": f"exit code {completed.returncode}", "process_seconds": process_seconds}
+            break
+        with open(os.path.join(work_dir, f"stage-{name}.json"), "r", encoding="utf-8") as f:
+            report["stages"][name] = {**json.load(f), "process_seconds": process_seconds}
+    return report
+
+
+def _flatten(data, prefix=""):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(before: dict, after: dict):
+    """Print every numeric result of two reports side by side with its relative change"""
+    old = dict(_flatten(before.get("stages", {})))
+    new = dict(_flatten(after.get("stages", {})))
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}\n")
+    print(f"{'metric':<52}{'before':>14}{'after':>14}{'change':>10}")
+    # Only what both runs measured, so a rerun of some stages compares cleanly
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        change = f"{(b - a) / a:+.1%}" if a else ""
+        print(f"{key:<52}{a:>14,.3f}{b:>14,.3f}{change:>10}")
+
+
+def print_report(report: dict):
+    print(f"\n{'stage':<12}{'seconds':>10}{'peak RSS MB':>13}  throughput / latency")
+    for name, result in report["stages"].items():
+        if "error" in result:
+            print(f"{name:<12}{'failed':>10}")
+            continue
+        if name == "corpus":
+            detail = f"{result['documents_per_second']} docs/s, {result['expected_chunks']} chunks expected"
+        elif name == "preprocess":
+            detail = (f"legacy {result['legacy']['documents_per_second']} docs/s, "
+                      f"streaming {result['streaming']['chunks_per_second']} chunks/s")
+        elif name == "embed":
+            detail = f"{result['chunks_per_second']} chunks/s"
+        elif name == "index":
+            detail = ", ".join(f"{t} {r['build_seconds']}s" for t, r in result["types"].items())
+        elif name == "retrieve":
+            detail = ", ".join(f"k={k} p50 {r['p50_ms']:.2f} p99 {r['p99_ms']:.2f} ms" for k, r in result["top_k"].items())
+            detail += f"; startup {result['startup_seconds']}s"
+        else:
+            detail = f"p50 {result['p50_ms']:.2f} p99 {result['p99_ms']:.2f} ms; startup {result['startup_seconds']}s"
+        print(f"{name:<12}{result['stage_seconds']:>10}{result['peak_rss_mb'] or 0:>13}  {detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000, help="approximate corpus size in chunks")
+    parser.add_argument("--doc-words", type=int, default=1500)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--work-dir", help="kept after the run; default is a temporary directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="preprocessing processes")
+    parser.add_argument("--embed-processes", type=int, default=1)
+    parser.add_argument("--embed-batch", type=int, default=64)
+    parser.add_argument("--index-types", default="flat,ivfflat,hnsw")
+    parser.add_argument("--top-k", default="1,4,10")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="stub LLM latency per request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two reports and exit")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage)
+        return
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        compare(*reports)
+        return
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s) {unknown}; expected any of {list(STAGES)}")
+    options = {
+        "chunks": args.chunks, "doc_words": args.doc_words, "workers": args.workers,
+        "embed_processes": args.embed_processes, "embed_batch": args.embed_batch,
+        "index_types": [t.strip() for t in args.index_types.split(",") if t.strip()],
+        "top_k": [int(k) for k in args.top_k.split(",") if k.strip()],
+        "queries": args.queries, "requests": args.requests, "llm_ms": args.llm_ms, "seed": args.seed,
+    }
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="rbi-pipeline-")
+    try:
+        report = run_benchmark(stages, options, work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[✓] Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
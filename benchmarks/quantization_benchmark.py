@@ -0,0 +1,164 @@
+"""
+Accuracy / latency / memory of the compact retrieval modes against fp32.
+
+    python -m benchmarks.quantization_benchmark --chunks data/chunks.jsonl --limit 20000
+    python -m benchmarks.quantization_benchmark --chunks data/chunks.jsonl --modes fp32,qint8 --json quant.json
+
+Documents are always embedded with the fp32 model. Each query encoder mode
+(RBI_QUERY_ENCODER) is then paired with each index type, and recall@k is
+measured against the fp32 encoder over an exact flat index, i.e. the
+pipeline the compact configuration replaces.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.ann_benchmark import percentile_ms
+from utils.ann import build_index, describe_index
+from utils.chunk_io import iter_chunks
+from utils.registry import DEFAULT_MODEL_NAME, ENCODER_MODES, get_sentence_transformer, index_nbytes, model_nbytes
+
+
+def load_texts(chunks_path: str, limit: int) -> list[str]:
+    texts = []
+    for chunk in iter_chunks(chunks_path):
+        texts.append(chunk["content"])
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def make_queries(texts: list[str], count: int, words: int = 12, seed: int = 1) -> list[str]:
+    """Short word windows cut from random chunks, standing in for user questions."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for row in rng.integers(0, len(texts), count):
+        tokens = texts[row].split()
+        start = int(rng.integers(0, max(len(tokens) - words, 0) + 1))
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
+
+
+def encode(model, texts, batch_size=64) -> np.ndarray:
+    vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def time_queries(model, queries) -> tuple[np.ndarray, list[float]]:
+    """Encode queries one at a time, as the request path does"""
+    latencies = []
+    vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        vectors.append(encode(model, [query]))
+        latencies.append(time.perf_counter() - start)
+    return np.vstack(vectors), latencies
+
+
+def search_case(index, query_vectors, truth, k) -> dict:
+    latencies = []
+    found = np.empty((len(query_vectors), k), dtype=np.int64)
+    for i, vector in enumerate(query_vectors):
+        start = time.perf_counter()
+        _, ids = index.search(vector[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(query_vectors))])
+    return {
+        "recall_at_k": round(float(recall), 4),
+        "search_p50_ms": round(percentile_ms(latencies, 50), 4),
+        "search_p99_ms": round(percentile_ms(latencies, 99), 4),
+    }
+
+
+def benchmark(texts, queries, model_name=DEFAULT_MODEL_NAME, modes=ENCODER_MODES, index_types=("flat", "sq8", "fp16"),
+              k=4) -> dict:
+    reference = get_sentence_transformer(model_name)
+    start = time.perf_counter()
+    doc_vectors = encode(reference, texts)
+    print(f"[+] Embedded {len(texts)} chunks in fp32 ({time.perf_counter() - start:.1f}s)")
+    reference_queries = encode(reference, queries)
+    _, truth = faiss.knn(reference_queries, doc_vectors, k)
+
+    indexes = {}
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(doc_vectors, index_type)
+        indexes[index_type] = (index, time.perf_counter() - start)
+
+    encoders = []
+    results = []
+    for mode in modes:
+        try:
+            start = time.perf_counter()
+            model = get_sentence_transformer(model_name, mode)
+            load_s = time.perf_counter() - start
+        except Exception as e:
+            print(f"[!] Skipping encoder mode {mode}: {e}")
+            continue
+        query_vectors, latencies = time_queries(model, queries)
+        similarity = np.sum(query_vectors * reference_queries, axis=1) / (
+            np.linalg.norm(query_vectors, axis=1) * np.linalg.norm(reference_queries, axis=1))
+        encoder = {
+            "mode": mode,
+            "load_s": round(load_s, 3),
+            "model_bytes": model_nbytes(model),
+            "encode_p50_ms": round(percentile_ms(latencies, 50), 3),
+            "encode_p99_ms": round(percentile_ms(latencies, 99), 3),
+            "cosine_to_fp32": round(float(np.mean(similarity)), 5),
+        }
+        encoders.append(encoder)
+        for index_type, (index, build_s) in indexes.items():
+            results.append({
+                "mode": mode,
+                "index_type": index_type,
+                "index": describe_index(index),
+                "index_bytes": index_nbytes(index),
+                "build_s": round(build_s, 3),
+                **search_case(index, query_vectors, truth, k),
+            })
+    return {"vectors": len(texts), "queries": len(queries), "k": k, "encoders": encoders, "results": results}
+
+
+def print_report(report: dict):
+    print(f"\n{report['vectors']} chunks, {report['queries']} queries, k={report['k']}")
+    print(f"{'encoder':<10}{'model MB':>10}{'enc p50 ms':>12}{'enc p99 ms':>12}{'cos fp32':>10}{'load s':>8}")
+    for e in report["encoders"]:
+        print(f"{e['mode']:<10}{e['model_bytes'] / 2**20:>10.1f}{e['encode_p50_ms']:>12.2f}"
+              f"{e['encode_p99_ms']:>12.2f}{e['cosine_to_fp32']:>10.4f}{e['load_s']:>8.1f}")
+    print(f"\n{'encoder':<10}{'index':<34}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}{'index MB':>10}")
+    for r in report["results"]:
+        print(f"{r['mode']:<10}{r['index']:<34}{r['recall_at_k']:>10.3f}{r['search_p50_ms']:>10.3f}"
+              f"{r['search_p99_ms']:>10.3f}{r['index_bytes'] / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", required=True, help="chunks file (.jsonl or .json)")
+    parser.add_argument("--limit", type=int, default=20000, help="number of chunks to index")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--modes", default=",".join(ENCODER_MODES))
+    parser.add_argument("--types", default="flat,sq8,fp16")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    texts = load_texts(args.chunks, args.limit)
+    queries = make_queries(texts, args.queries)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    index_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    report = benchmark(texts, queries, args.model, modes, index_types, args.k)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[✓] Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
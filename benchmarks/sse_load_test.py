@@ -0,0 +1,84 @@
+"""
+Offline load test for the streaming endpoint, driven in-process through the
+ASGI app with the stub LLM (no server, network or API key needed).
+
+    python -m benchmarks.sse_load_test --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("RBI_LLM_BACKEND", "stub")
+
+QUESTIONS = ["What is the repo rate?", "KYC norms for banks", "UPI transaction limits",
+             "Priority sector lending targets", "Basel III capital requirements"]
+
+
+async def one_request(application, question: str) -> dict:
+    body = json.dumps({"question": question}).encode("utf-8")
+    scope = {"type": "http", "method": "POST", "path": "/api/query/stream", "headers": [], "query_string": b""}
+    sent = False
+    first_byte = None
+    events = 0
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal first_byte, events
+        if message["type"] == "http.response.body" and message.get("body"):
+            if b"event: token" in message["body"] and first_byte is None:
+                first_byte = time.perf_counter() - start
+            events += 1
+
+    await application(scope, receive, send)
+    return {"ttfb": first_byte or 0.0, "total": time.perf_counter() - start, "events": events}
+
+
+async def run(requests: int, concurrency: int, unique: bool) -> dict:
+    from app.asgi import application
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(i):
+        question = QUESTIONS[i % len(QUESTIONS)] + (f" #{i}" if unique else "")
+        async with semaphore:
+            return await one_request(application, question)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    ttfb = [r["ttfb"] * 1000 for r in results]
+    total = [r["total"] * 1000 for r in results]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 2),
+        "ttfb_p50_ms": round(float(np.percentile(ttfb, 50)), 1),
+        "ttfb_p99_ms": round(float(np.percentile(ttfb, 99)), 1),
+        "total_p50_ms": round(float(np.percentile(total, 50)), 1),
+        "total_p99_ms": round(float(np.percentile(total, 99)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat-questions", action="store_true", help="allow answer-cache hits")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.requests, args.concurrency, unique=not args.repeat_questions))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,34 @@
 import json
 import faiss
 import os
+import sys
 import numpy as np
-from utils.embeddings import EmbeddingModel
+from utils.ann import DEFAULT_INDEX_TYPE, build_index, describe_index
+from utils.chunk_io import default_chunks_path, load_chunks
+from utils.bulk_embed import BulkEmbeddingJob
+from utils.embedding_store import EmbeddingStore, content_digest
+from utils.segments import SegmentWriter
 
-CHUNKS_PATH = "data/chunks.json"
+CHUNKS_PATH = default_chunks_path()
 INDEX_DIR = "data/faiss_index"
+SEGMENTS_DIR = os.path.join(INDEX_DIR, "segments")
 
-def build_faiss_index():
-    # Load preprocessed chunks
-    with open(CHUNKS_PATH, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
+def evict_orphaned_embeddings(chunks):
+    """Drop cached embeddings of text no longer in the corpus"""
+    store = EmbeddingStore()
+    evicted = store.compact(content_digest(chunk["content"]) for chunk in chunks)
+    print(f"[✓] Evicted {evicted} orphaned embeddings; {len(store)} remain")
 
-    texts = [chunk["content"] for chunk in chunks]
+def build_faiss_index(index_type=DEFAULT_INDEX_TYPE, resume=True, evict_orphans=False):
+    # Generate embeddings: streamed, length-sorted, multi-process and
+    # checkpointed, so an interrupted run picks up where it stopped
+    vectors = BulkEmbeddingJob(CHUNKS_PATH).run(resume=resume)
 
-    # Generate embeddings
-    model = EmbeddingModel()
-    vectors = model.encode(texts)
-    
-    # Create FAISS index
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(vectors)
+    # Load preprocessed chunks for the metadata
+    chunks = load_chunks(CHUNKS_PATH)
+
+    # Create FAISS index of the configured type (flat, ivfflat, ivfpq, hnsw)
+    index = build_index(vectors, index_type)
 
     # Save index
     os.makedirs(INDEX_DIR, exist_ok=True)
@@ -31,7 +38,14 @@ def build_faiss_index():
     with open(os.path.join(INDEX_DIR, "metadata.json"), "w", encoding="utf-8") as f:
         json.dump(chunks, f, indent=2)
 
-    print(f"[✓] Stored {len(texts)} vectors in FAISS index at {INDEX_DIR}")
+    # Memory-mapped base segment read by the server; replaces any earlier
+    # segments, since a full rebuild already contains their documents
+    SegmentWriter(SEGMENTS_DIR).replace(index, chunks, vectors)
+
+    print(f"[✓] Stored {len(chunks)} vectors in {describe_index(index)} at {INDEX_DIR}")
+
+    if evict_orphans:
+        evict_orphaned_embeddings(chunks)
 
 if __name__ == "__main__":
-    build_faiss_index()
+    build_faiss_index(resume="--restart" not in sys.argv, evict_orphans="--evict-orphans" in sys.argv)
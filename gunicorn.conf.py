@@ -0,0 +1,11 @@
+# gunicorn -c gunicorn.conf.py main:application
+bind = "0.0.0.0:5000"
+workers = 2
+# Load the app (and the retriever, see on_starting) once in the master so
+# forked workers share the index and model pages copy-on-write.
+preload_app = True
+
+
+def on_starting(server):
+    from utils.registry import preload
+    preload()
@@ -1,7 +1,7 @@
 # from scraper.rbi_scraper import scrape_rbi_documents
 
 # if __name__ == "__main__":
-#     scrape_rbi_documents(limit=200)
+#     scrape_rbi_documents()
 
 from app import create_app
 
@@ -3,8 +3,13 @@ import json
 import csv
 import hashlib
 import sys
-from typing import List, Dict, Any
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Any, Tuple
 from utils.preprocess import clean_text, chunk_text
+from utils.chunker import TokenChunker, clean
+from utils.filters import document_date, section_for_url
 
 # Increase CSV field size limit
 csv.field_size_limit(sys.maxsize)
@@ -168,6 +173,168 @@ class CSVPreprocessor:
             print("[!] No chunks were created")
             return []
 
+_token_chunker = None
+
+def _get_token_chunker() -> TokenChunker:
+    # One chunker per worker process so its word -> token count cache persists across batches
+    global _token_chunker
+    if _token_chunker is None:
+        _token_chunker = TokenChunker()
+    return _token_chunker
+
+def _process_rows(rows: List[Tuple[int, str, str, str]], min_content_length: int,
+                  token_chunks: bool = True) -> List[Tuple[Dict[str, Any], bytes]]:
+    """Clean and chunk a batch of CSV rows (runs in a worker process)"""
+    documents = []
+    for row_idx, topic, url, content in rows:
+        if not content or len(content) < min_content_length:
+            continue
+        if len(content) > 50000:  # 50KB limit per document
+            content = content[:50000] + "... [Content truncated]"
+        # As in CSVPreprocessor: the raw length after truncation
+        original_length = len(content)
+        cleaned_content = clean(content) if token_chunks else clean_text(content)
+        if len(cleaned_content) < min_content_length:
+            continue
+        documents.append((row_idx, topic, url, cleaned_content, original_length))
+
+    if token_chunks:
+        # One tokenizer call for the whole batch; chunks are offset spans
+        all_spans = _get_token_chunker().spans_batch([document[3] for document in documents])
+    else:
+        all_spans = [None] * len(documents)
+
+    results = []
+    for (row_idx, topic, url, cleaned_content, original_length), spans in zip(documents, all_spans):
+        # Document-level fields for filtered search (see utils.filters)
+        section = section_for_url(url)
+        published = document_date(cleaned_content)
+        if spans is None:
+            pieces = [(chunk, None) for chunk in chunk_text(cleaned_content)]
+        else:
+            pieces = [(cleaned_content[span.start:span.end], span) for span in spans]
+        for chunk_idx, (chunk, span) in enumerate(pieces):
+            chunk = chunk.strip()
+            if len(chunk) < 20:
+                continue
+            chunk_data = {
+                "id": f"doc_{row_idx}_chunk_{chunk_idx}",
+                "title": topic or f"RBI Document {row_idx}",
+                "url": url,
+                "section": section,
+                "date": published,
+                "chunk_index": chunk_idx,
+                "content": chunk,
+                "source_row": row_idx,
+                "content_length": len(chunk),
+                "original_content_length": original_length
+            }
+            if span is not None:
+                # Offsets into the cleaned document, for merging overlapping chunks later
+                chunk_data.update({"start": span.start, "end": span.end, "tokens": span.tokens})
+            results.append((chunk_data, hashlib.md5(chunk.encode('utf-8')).digest()))
+    return results
+
+class StreamingCSVPreprocessor:
+    """
+    Streaming version of CSVPreprocessor: rows are read lazily, cleaned and
+    chunked across a process pool in ordered batches, de-duplicated in the
+    parent with one shared hash set, and written to JSONL as they arrive.
+    Only a bounded number of batches is in flight, so memory stays flat
+    however large the CSV is, and the output matches a serial run.
+
+    Chunks are sized in embedding-model tokens by utils.chunker and carry
+    their start/end offsets; token_chunks=False keeps the legacy word chunks.
+    """
+
+    def __init__(self, input_csv: str, output_path: str = "data/chunks.jsonl",
+                 workers: int = None, batch_rows: int = 64, max_pending: int = None,
+                 token_chunks: bool = True):
+        self.input_csv = input_csv
+        self.token_chunks = token_chunks
+        self.output_path = output_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_rows = batch_rows
+        self.max_pending = max_pending or self.workers * 2
+        self.content_hashes = set()  # 16-byte md5 digests
+
+    def iter_batches(self) -> Iterator[List[Tuple[int, str, str, str]]]:
+        with open(self.input_csv, "r", encoding="utf-8", errors='ignore') as csvfile:
+            reader = csv.DictReader(csvfile)
+            batch = []
+            for row_idx, row in enumerate(reader):
+                topic = (row.get('Topic') or row.get('title') or row.get('Title') or '').strip()
+                url = (row.get('URL') or row.get('url') or row.get('Url') or '').strip()
+                content = (row.get('Content') or row.get('content') or row.get('text') or '').strip()
+                batch.append((row_idx, topic, url, content))
+                if len(batch) >= self.batch_rows:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def run(self, min_content_length: int = 50) -> Dict[str, Any]:
+        """Run the pipeline; returns the summary (also saved next to the output)"""
+        if not os.path.exists(self.input_csv):
+            print(f"[!] CSV file not found: {self.input_csv}")
+            return {}
+
+        print(f"[+] Streaming {self.input_csv} -> {self.output_path} with {self.workers} workers")
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        start = time.perf_counter()
+        stats = {"total_chunks": 0, "duplicate_chunks": 0, "rows_read": 0, "total_length": 0,
+                 "max_chunk_length": 0, "min_chunk_length": 0}
+        documents = set()
+
+        def write_batch(results, out):
+            for chunk, digest in results:
+                if digest in self.content_hashes:
+                    stats["duplicate_chunks"] += 1
+                    continue
+                self.content_hashes.add(digest)
+                out.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                length = chunk["content_length"]
+                stats["total_chunks"] += 1
+                stats["total_length"] += length
+                stats["max_chunk_length"] = max(stats["max_chunk_length"], length)
+                stats["min_chunk_length"] = min(stats["min_chunk_length"] or length, length)
+                documents.add(chunk["source_row"])
+
+        tmp_path = f"{self.output_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out, \
+                ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            for batch in self.iter_batches():
+                stats["rows_read"] += len(batch)
+                pending.append(pool.submit(_process_rows, batch, min_content_length, self.token_chunks))
+                # Oldest first keeps the output in CSV order
+                while len(pending) >= self.max_pending:
+                    write_batch(pending.popleft().result(), out)
+                if stats["rows_read"] % (self.batch_rows * 50) == 0:
+                    print(f"[+] Read {stats['rows_read']} rows, {stats['total_chunks']} chunks written")
+            while pending:
+                write_batch(pending.popleft().result(), out)
+        os.replace(tmp_path, self.output_path)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "total_chunks": stats["total_chunks"],
+            "unique_documents": len(documents),
+            "average_chunk_length": stats["total_length"] / stats["total_chunks"] if stats["total_chunks"] else 0,
+            "max_chunk_length": stats["max_chunk_length"],
+            "min_chunk_length": stats["min_chunk_length"],
+            "duplicate_chunks": stats["duplicate_chunks"],
+            "rows_read": stats["rows_read"],
+            "rows_per_second": round(stats["rows_read"] / elapsed, 1) if elapsed else 0,
+        }
+        summary_path = os.path.splitext(self.output_path)[0] + "_summary.json"
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        print(f"[✓] Wrote {summary['total_chunks']} chunks from {summary['rows_read']} rows "
+              f"in {elapsed:.1f}s ({summary['rows_per_second']} rows/s) to {self.output_path}")
+        return summary
+
 # Simple function version (exactly matching your original structure)
 def preprocess_csv():
     chunks = []
@@ -273,8 +440,13 @@ if __name__ == "__main__":
     if test_chunk_function():
         print("\n[+] Starting CSV processing...")
         
-        # Option 1: Simple function (recommended)
-        preprocess_csv()
+        if "--legacy" in sys.argv:
+            # Option 1: Simple function, whole corpus in memory, single JSON file
+            preprocess_csv()
+        else:
+            # Streaming, multi-process pipeline writing data/chunks.jsonl
+            StreamingCSVPreprocessor("rbi_complete_data.csv", "data/chunks.jsonl",
+                                     token_chunks="--word-chunks" not in sys.argv).run(min_content_length=50)
         
         # Option 2: Class-based approach
         # INPUT_CSV = "rbi_data.csv"
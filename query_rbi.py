@@ -1,9 +1,8 @@
-from utils.retriever import VectorRetriever
+from utils.registry import get_retriever
 from utils.gemini_llm import generate_response
 
-retriever = VectorRetriever()
-
 def main():
+    retriever = get_retriever()
     while True:
         query = input("\n🔍 Enter your query (or type 'exit'): ")
         if query.lower() == "exit":
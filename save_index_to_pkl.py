@@ -1,11 +1,14 @@
 import json
 import os
 import pickle
+import sys
 import faiss
+from utils.segments import SegmentWriter
 
 INDEX_DIR = "data/faiss_index"
+SEGMENTS_DIR = os.path.join(INDEX_DIR, "segments")
 
-def save_faiss_index_as_pkl():
+def load_index_and_metadata():
     # Load FAISS index
     index_path = os.path.join(INDEX_DIR, "rbi_index.faiss")
     index = faiss.read_index(index_path)
@@ -14,6 +17,15 @@ def save_faiss_index_as_pkl():
     metadata_path = os.path.join(INDEX_DIR, "metadata.json")
     with open(metadata_path, "r", encoding="utf-8") as f:
         metadata = json.load(f)
+    return index, metadata
+
+def save_index_store():
+    index, metadata = load_index_and_metadata()
+    manifest = SegmentWriter(SEGMENTS_DIR).replace(index, metadata)
+    print(f"[✓] Index store (generation {manifest['generation']}, {manifest['count']} vectors) saved at {SEGMENTS_DIR}")
+
+def save_faiss_index_as_pkl():
+    index, metadata = load_index_and_metadata()
 
     # Save as pickle
     with open(os.path.join(INDEX_DIR, "faiss_index.pkl"), "wb") as f:
@@ -22,4 +34,7 @@ def save_faiss_index_as_pkl():
     print(f"[✓] Pickle file saved at {INDEX_DIR}/faiss_index.pkl")
 
 if __name__ == "__main__":
-    save_faiss_index_as_pkl()
+    save_index_store()
+    # The pickle is only needed by deployments that have not moved to the store yet
+    if "--legacy-pkl" in sys.argv:
+        save_faiss_index_as_pkl()
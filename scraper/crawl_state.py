@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+
+CRAWL_STATE_PATH = "data/crawl_state.sqlite"
+
+
+class CrawlState:
+    """
+    Persistent per-URL crawl state (SQLite): the ETag / Last-Modified
+    validators and content hash seen on the last successful fetch.
+    Safe to share between the crawler's threads.
+    """
+
+    def __init__(self, db_path=CRAWL_STATE_PATH):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                last_fetched REAL,
+                last_changed REAL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, content_hash, last_fetched, last_changed FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_hash", "last_fetched", "last_changed"), row))
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a recrawl of url"""
+        state = self.get(url)
+        headers = {}
+        if state:
+            if state["etag"]:
+                headers["If-None-Match"] = state["etag"]
+            if state["last_modified"]:
+                headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def record(self, url, etag=None, last_modified=None, content_hash=None, changed=True):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO pages (url, etag, last_modified, content_hash, last_fetched, last_changed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = excluded.content_hash,
+                    last_fetched = excluded.last_fetched,
+                    last_changed = CASE WHEN ? THEN excluded.last_changed ELSE pages.last_changed END
+            """, (url, etag, last_modified, content_hash, now, now, changed))
+            self.conn.commit()
+
+    def touch(self, url):
+        """Note a fetch that found the page unchanged (e.g. 304 Not Modified)"""
+        with self.lock:
+            self.conn.execute("UPDATE pages SET last_fetched = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+    def content_hashes(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT content_hash FROM pages WHERE content_hash IS NOT NULL").fetchall()
+        return {row[0] for row in rows}
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,245 @@
+"""
+Single-pass HTML text extraction for scraped pages.
+
+Every backend turns the page into one stream of start/text/end events that
+_TextCollector consumes once, so each text node is emitted exactly once and
+the cost is linear in the page size. Table rows become "cell | cell" lines;
+script/style content is dropped. The topic is picked up in the same pass
+with the same precedence as extract_topic(): <title>, then h1/h2/h3, then
+the first reasonably sized <b>, then the URL.
+
+Backends, fastest first: lxml (its parser drives the collector as a target,
+no tree is built), selectolax, and the stdlib html.parser.
+RBI_HTML_BACKEND forces one; by default the fastest installed one is used.
+"""
+import os
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template', 'svg'])
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'footer',
+    'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol',
+    'p', 'pre', 'section', 'table', 'tbody', 'thead', 'tfoot', 'ul',
+])
+HEADING_TAGS = ('h1', 'h2', 'h3')
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'])
+
+
+class _TextCollector:
+    """Consumes start/data/end events once and builds (topic, content)."""
+
+    def __init__(self):
+        self.parts = []
+        self.skip_depth = 0
+        self.rows = []    # stack of open <tr>: list of finished cell strings
+        self.cells = []   # stack of open <td>/<th>: list of text pieces
+        self.captures = {}  # tag -> [depth, pieces] while a title/heading/bold is open
+        self.title = None
+        self.headings = {}
+        self.bold = None
+
+    def start(self, tag, attrs=None):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+            return
+        if tag == 'title' and self.title is None:
+            self._capture(tag)
+        elif tag in HEADING_TAGS and tag not in self.headings:
+            self._capture(tag)
+        elif tag == 'b' and self.bold is None:
+            self._capture(tag)
+        elif tag == 'tr':
+            self.rows.append([])
+        elif tag in ('td', 'th') and self.rows:
+            self.cells.append([])
+        elif tag in BLOCK_TAGS:
+            self._separate()
+
+    def _separate(self):
+        # Inside a table cell the text goes to the cell, so its separators must too
+        (self.cells[-1] if self.cells else self.parts).append(' ')
+
+    def _capture(self, tag):
+        capture = self.captures.get(tag)
+        if capture is None:
+            self.captures[tag] = [1, []]
+        else:
+            capture[0] += 1
+
+    def data(self, text):
+        if self.skip_depth:
+            return
+        for capture in self.captures.values():
+            capture[1].append(text)
+        if 'title' in self.captures:
+            return  # the title is metadata, not body text
+        if self.cells:
+            self.cells[-1].append(text)
+        else:
+            self.parts.append(text)
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+            return
+        capture = self.captures.get(tag)
+        if capture is not None:
+            capture[0] -= 1
+            if capture[0] == 0:
+                self._finish_capture(tag, ''.join(capture[1]).strip())
+                del self.captures[tag]
+        if tag in ('td', 'th') and self.cells:
+            self.rows[-1].append(''.join(self.cells.pop()).strip())
+        elif tag == 'tr' and self.rows:
+            row_text = ' | '.join(self.rows.pop())
+            if row_text.strip():
+                target = self.cells[-1] if self.cells else self.parts
+                target.append(' ' + row_text + ' ')
+        elif tag in BLOCK_TAGS:
+            self._separate()
+
+    def _finish_capture(self, tag, text):
+        if tag == 'title':
+            self.title = text
+        elif tag in HEADING_TAGS:
+            if text:
+                self.headings[tag] = text
+        elif tag == 'b' and 10 < len(text) < 200:
+            self.bold = text
+
+    def close(self):
+        while self.cells:
+            self.end('td')
+        while self.rows:
+            self.end('tr')
+        return self
+
+    def topic(self, url):
+        if self.title and self.title != "RBI" and len(self.title) > 5:
+            return self.title
+        for tag in HEADING_TAGS:
+            if tag in self.headings:
+                return self.headings[tag]
+        if self.bold:
+            return self.bold
+        path = urlparse(url).path
+        if path:
+            topic = path.split('/')[-1]
+            topic = re.sub(r'\.[^.]*$', '', topic)
+            topic = topic.replace('_', ' ').replace('-', ' ')
+            if len(topic) > 3:
+                return topic.title()
+        return "RBI Document"
+
+    def content(self):
+        return ''.join(self.parts)
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag)
+        if tag in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.collector.start(tag)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in VOID_TAGS:
+            self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def _collect_stdlib(html):
+    collector = _TextCollector()
+    parser = _StdlibParser(collector)
+    parser.feed(html)
+    parser.close()
+    return collector.close()
+
+
+def _collect_lxml(html):
+    # lxml drives the collector directly as a parser target: no tree is built
+    collector = _TextCollector()
+    parser = etree.HTMLParser(target=collector)
+    parser.feed(html)
+    return parser.close()
+
+
+def _collect_selectolax(html):
+    collector = _TextCollector()
+    root = LexborHTMLParser(html).root
+    if root is None:
+        return collector.close()
+    # Iterative DFS with explicit end events
+    stack = [(root, False)]
+    while stack:
+        node, closing = stack.pop()
+        tag = node.tag
+        if closing:
+            collector.end(tag)
+            continue
+        if tag == '-text':
+            collector.data(node.text_content or '')
+            continue
+        if tag.startswith('-') or tag == '_comment':
+            continue
+        collector.start(tag)
+        stack.append((node, True))
+        children = []
+        child = node.child
+        while child is not None:
+            children.append(child)
+            child = child.next
+        for child in reversed(children):
+            stack.append((child, False))
+    return collector.close()
+
+
+BACKENDS = {
+    'lxml': _collect_lxml if etree is not None else None,
+    'selectolax': _collect_selectolax if LexborHTMLParser is not None else None,
+    'html.parser': _collect_stdlib,
+}
+
+
+def available_backends():
+    return [name for name, collect in BACKENDS.items() if collect is not None]
+
+
+def default_backend():
+    backend = os.getenv("RBI_HTML_BACKEND", "auto")
+    if backend != "auto":
+        return backend
+    return available_backends()[0]
+
+
+def extract_page(url, html, backend=None):
+    """Extract (topic, content) from a page in one traversal"""
+    backend = backend or default_backend()
+    collect = BACKENDS.get(backend)
+    if collect is None:
+        raise ValueError(f"HTML backend '{backend}' is not available; installed: {available_backends()}")
+    collector = collect(html)
+    return collector.topic(url), collector.content()
@@ -0,0 +1,213 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from scraper.rbi_scraper import HOME_URL, extract_home_links, extract_link2_links, parse_page
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_STOP = object()
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """One token bucket per host, so every site gets its own politeness budget."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+def make_session(pool_size=16, retries=3, backoff=0.5):
+    """requests Session with a shared connection pool and retry with exponential backoff"""
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ConcurrentCrawler:
+    """
+    Concurrent fetch engine for RBICSVScraper.
+
+    Listing pages (home page, sections) are expanded by a small pool of
+    producer threads that push content-page URLs into a bounded frontier
+    queue; fetch workers drain it. Every request passes the per-host token
+    bucket, HTML is parsed in a process pool, and rows are written through
+    the scraper's own duplicate checks under a lock.
+    """
+
+    def __init__(self, scraper, fetch_workers=8, parse_workers=None, listing_workers=2,
+                 requests_per_second=2.0, burst=2, max_frontier=1000, timeout=30,
+                 retries=3, backoff=0.5, home_url=HOME_URL):
+        self.scraper = scraper
+        self.fetch_workers = fetch_workers
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.listing_workers = listing_workers
+        self.timeout = timeout
+        self.home_url = home_url
+        self.limiter = HostRateLimiter(requests_per_second, burst)
+        self.session = make_session(fetch_workers + listing_workers, retries, backoff)
+        self.frontier = queue.Queue(maxsize=max_frontier)
+        self.seen_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.pages_fetched = 0
+        self.bytes_fetched = 0
+        self.errors = 0
+
+    def fetch(self, url, headers=None):
+        """Rate-limited GET; returns the response, or None on errors and non-200/304 statuses"""
+        self.limiter.acquire(url)
+        try:
+            response = self.session.get(url, timeout=self.timeout, headers=headers)
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {url}: {e}")
+            with self.stats_lock:
+                self.errors += 1
+            return None
+        with self.stats_lock:
+            self.pages_fetched += 1
+            self.bytes_fetched += len(response.content)
+        if response.status_code not in (200, 304):
+            logger.warning(f"Failed to access {url}: Status {response.status_code}")
+            return None
+        return response
+
+    def enqueue(self, url):
+        """Add a content page to the frontier once; blocks while the frontier is full"""
+        with self.seen_lock:
+            if url in self.scraper.scraped_urls:
+                return
+            self.scraper.scraped_urls.add(url)
+        self.frontier.put(url)
+
+    def expand_listing(self, url):
+        # Listing pages are always refetched: they are how new pages are discovered
+        response = self.fetch(url)
+        if response is None or response.status_code != 200:
+            return
+        links = extract_link2_links(url, response.text, self.home_url)
+        logger.info(f"Found {len(links)} unique links from {url}")
+        for link in links:
+            self.enqueue(link)
+
+    def fetch_worker(self, parse_pool):
+        while True:
+            url = self.frontier.get()
+            if url is _STOP:
+                return
+            try:
+                self.process_page(url, parse_pool)
+            except Exception as e:
+                # A dead worker would stop draining the frontier, so never let one die
+                logger.error(f"Error scraping {url}: {e}")
+                with self.stats_lock:
+                    self.errors += 1
+
+    def process_page(self, url, parse_pool):
+        response = self.fetch(url, headers=self.scraper.conditional_headers(url))
+        if response is None:
+            return
+        if response.status_code == 304:
+            with self.write_lock:
+                self.scraper.mark_unchanged(url)
+            return
+        topic, content = parse_pool.submit(parse_page, url, response.text).result()
+        final_content = self.scraper.clean_text(content)
+        if final_content:
+            with self.write_lock:
+                self.scraper.save_page(url, topic, final_content, response.headers)
+
+    def crawl(self, listing_urls=(), page_urls=()):
+        """Crawl the given listing pages and content pages; returns run statistics"""
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+            workers = [threading.Thread(target=self.fetch_worker, args=(parse_pool,), daemon=True)
+                       for _ in range(self.fetch_workers)]
+            for worker in workers:
+                worker.start()
+
+            for url in page_urls:
+                self.enqueue(url)
+            with ThreadPoolExecutor(max_workers=self.listing_workers) as listing_pool:
+                list(listing_pool.map(self.expand_listing, listing_urls))
+
+            for _ in workers:
+                self.frontier.put(_STOP)
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'pages_fetched': self.pages_fetched,
+            'bytes_fetched': self.bytes_fetched,
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 2),
+            'pages_per_second': round(self.pages_fetched / elapsed, 2) if elapsed else 0.0,
+        }
+        logger.info(f"Fetched {stats['pages_fetched']} pages in {stats['elapsed_seconds']}s "
+                    f"({stats['pages_per_second']} pages/sec)")
+        return stats
+
+    def crawl_site(self, section_urls=()):
+        """Concurrent equivalent of run_complete_scrape: home page links, then sections"""
+        response = self.fetch(self.home_url)
+        if response is None or response.status_code != 200:
+            logger.error(f"Failed to access home page: {self.home_url}")
+            return self.crawl(section_urls)
+        direct_data_links, other_links = extract_home_links(response.text)
+        logger.info(f"Found {len(direct_data_links)} direct links and {len(other_links)} other links")
+        listing_urls = [self.home_url + href[3:] for href in other_links] + list(section_urls)
+        return self.crawl(listing_urls, direct_data_links)
@@ -6,6 +6,9 @@ import time
 import re
 from urllib.parse import urljoin, urlparse
 import logging
+import os
+from scraper.crawl_state import CRAWL_STATE_PATH, CrawlState
+from scraper.extract import extract_page
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -13,16 +16,168 @@ logger = logging.getLogger(__name__)
 
 HOME_URL = "https://www.rbi.org.in/"
 
+SECTION_URLS = [
+    "https://www.rbi.org.in/Scripts/BS_PressReleaseDisplay.aspx",
+    "https://www.rbi.org.in/Scripts/NotificationUser.aspx", 
+    "https://www.rbi.org.in/Scripts/BS_CircularIndexDisplay.aspx",
+    "https://www.rbi.org.in/Scripts/BS_SpeechesView.aspx",
+    "https://www.rbi.org.in/Scripts/AnnualPublications.aspx",
+    "https://www.rbi.org.in/Scripts/PublicationsView.aspx",
+]
+
+def extract_topic(url, soup):
+    """Extract topic from URL or page content"""
+    # Try to get title from page
+    title_tag = soup.find('title')
+    if title_tag:
+        title = title_tag.get_text().strip()
+        if title and title != "RBI" and len(title) > 5:
+            return title
+    
+    # Try to get from h1, h2, h3 tags
+    for heading_tag in ['h1', 'h2', 'h3']:
+        heading = soup.find(heading_tag)
+        if heading and heading.get_text().strip():
+            return heading.get_text().strip()
+    
+    # Try to get from bold tags (first meaningful one)
+    bold_tags = soup.find_all('b')
+    for bold in bold_tags:
+        text = bold.get_text().strip()
+        if len(text) > 10 and len(text) < 200:  # Reasonable title length
+            return text
+    
+    # Extract from URL as fallback
+    path = urlparse(url).path
+    if path:
+        # Remove file extensions and clean up
+        topic = path.split('/')[-1]
+        topic = re.sub(r'\.[^.]*$', '', topic)  # Remove extension
+        topic = topic.replace('_', ' ').replace('-', ' ')
+        if len(topic) > 3:
+            return topic.title()
+    
+    return "RBI Document"
+
+def extract_content(soup):
+    """Collect the text of headings, paragraphs, meaningful divs and tables (legacy, four passes)"""
+    # Extract content (following your working approach)
+    heading = soup.find_all('b')
+    paragraphs = soup.find_all('p')
+    
+    # Also try other content tags
+    divs = soup.find_all('div')
+    tables = soup.find_all('table')
+    
+    all_content = ""
+    
+    # Get headings
+    for content in heading:
+        text = content.get_text().strip()
+        if text:
+            all_content += text + " "
+    
+    # Get paragraphs
+    for content in paragraphs:
+        text = content.get_text().strip()
+        if text:
+            all_content += text + " "
+    
+    # Get meaningful div content
+    for div in divs:
+        text = div.get_text().strip()
+        if len(text) > 100 and len(text) < 5000:  # Filter meaningful content
+            all_content += text + " "
+    
+    # Get table content
+    for table in tables:
+        rows = table.find_all('tr')
+        for row in rows:
+            cells = row.find_all(['td', 'th'])
+            row_text = ' | '.join([cell.get_text().strip() for cell in cells])
+            if row_text.strip():
+                all_content += row_text + " "
+    
+    return all_content
+
+def parse_page(url, html):
+    """Parse a content page into (topic, raw content); picklable for process pools"""
+    return extract_page(url, html)
+
+def extract_link2_links(url, html, home_url=HOME_URL):
+    """Links with class 'link2' on a listing page, resolved against url/home_url"""
+    soup = bs(html, 'html.parser')
+    
+    # Find links with class 'link2'
+    available_links = soup.find_all('a', {'class': 'link2'})
+    all_links = []
+    
+    for link in available_links:
+        if not link.has_attr('href'):
+            continue
+            
+        href = link['href']
+        if '#' in href or 'image' in href.lower():
+            continue
+        
+        if 'http' in href:
+            all_links.append(href)
+        elif '..' in href:
+            full_url = home_url + href[3:]
+            all_links.append(full_url)
+        else:
+            if '?' in url and '?' in href:
+                i1 = url.index('?')
+                i2 = href.index('?')
+                full_url = url[:i1+1] + href[i2+1:]
+                all_links.append(full_url)
+    
+    # Remove duplicates while preserving order
+    return list(dict.fromkeys(all_links))
+
+def extract_home_links(html):
+    """Split home page links into (direct data links, relative section links)"""
+    soup = bs(html, 'html.parser')
+    
+    all_links = soup.find_all('a')
+    direct_data_links = []
+    other_links = []
+    
+    for link in all_links:
+        if not link.has_attr('href'):
+            continue
+            
+        href = link['href']
+        
+        if '..' in href and 'image' not in href.lower():
+            other_links.append(href)
+        
+        if (len(href) > 5 and 'https' in href and 'rbi' in href and 
+            'image' not in href.lower()):
+            direct_data_links.append(href)
+    
+    # Remove duplicates
+    return list(dict.fromkeys(direct_data_links)), list(dict.fromkeys(other_links))
+
 class RBICSVScraper:
-    def __init__(self, csv_filename='rbi_complete_data.csv'):
+    def __init__(self, csv_filename='rbi_complete_data.csv', state_path=None, collect_documents=False):
         self.csv_filename = csv_filename
         self.scraped_urls = set()
         self.content_hashes = set()
         self.processed_count = 0
         self.duplicate_count = 0
+        self.unchanged_count = 0
+        # New/changed pages of this run, as dicts (see scrape_rbi_documents)
+        self.collect_documents = collect_documents
+        self.new_documents = []
+        
+        # Incremental mode: remember validators/hashes across runs and append to the CSV
+        self.crawl_state = CrawlState(state_path) if state_path else None
+        if self.crawl_state is not None:
+            self.content_hashes = self.crawl_state.content_hashes()
         
         # Initialize CSV file
-        self.init_csv()
+        self.init_csv(append=self.crawl_state is not None)
         
         # Session for better performance
         self.session = requests.Session()
@@ -30,8 +185,11 @@ class RBICSVScraper:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
     
-    def init_csv(self):
+    def init_csv(self, append=False):
         """Initialize CSV file with headers"""
+        if append and os.path.exists(self.csv_filename) and os.path.getsize(self.csv_filename) > 0:
+            logger.info(f"Appending to existing CSV file: {self.csv_filename}")
+            return
         with open(self.csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = ['Topic', 'URL', 'Content']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
@@ -90,39 +248,40 @@ class RBICSVScraper:
             logger.error(f"Failed to write to CSV for {url}: {e}")
             return False
     
+    def conditional_headers(self, url):
+        """Validators from the last crawl, so unchanged pages come back as 304"""
+        if self.crawl_state is None:
+            return {}
+        return self.crawl_state.conditional_headers(url)
+    
+    def mark_unchanged(self, url):
+        self.unchanged_count += 1
+        if self.crawl_state is not None:
+            self.crawl_state.touch(url)
+        logger.info(f"Not modified: {url}")
+    
+    def save_page(self, url, topic, content, headers=None):
+        """Write a fetched page unless it is unchanged since the last crawl, and record its validators"""
+        if self.crawl_state is None:
+            return self.write_to_csv(url, topic, content)
+        
+        headers = headers or {}
+        content_hash = hashlib.md5(self.clean_text(content).encode('utf-8')).hexdigest()
+        previous = self.crawl_state.get(url)
+        changed = previous is None or previous["content_hash"] != content_hash
+        saved = False
+        if changed:
+            saved = self.write_to_csv(url, topic, content)
+            if saved and self.collect_documents:
+                self.new_documents.append({"title": self.clean_text(topic), "url": url, "content": self.clean_text(content)})
+        else:
+            self.unchanged_count += 1
+        self.crawl_state.record(url, headers.get('ETag'), headers.get('Last-Modified'), content_hash, changed=changed)
+        return saved
+    
     def extract_topic_from_url_or_content(self, url, soup):
         """Extract topic from URL or page content"""
-        # Try to get title from page
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.get_text().strip()
-            if title and title != "RBI" and len(title) > 5:
-                return title
-        
-        # Try to get from h1, h2, h3 tags
-        for heading_tag in ['h1', 'h2', 'h3']:
-            heading = soup.find(heading_tag)
-            if heading and heading.get_text().strip():
-                return heading.get_text().strip()
-        
-        # Try to get from bold tags (first meaningful one)
-        bold_tags = soup.find_all('b')
-        for bold in bold_tags:
-            text = bold.get_text().strip()
-            if len(text) > 10 and len(text) < 200:  # Reasonable title length
-                return text
-        
-        # Extract from URL as fallback
-        path = urlparse(url).path
-        if path:
-            # Remove file extensions and clean up
-            topic = path.split('/')[-1]
-            topic = re.sub(r'\.[^.]*$', '', topic)  # Remove extension
-            topic = topic.replace('_', ' ').replace('-', ' ')
-            if len(topic) > 3:
-                return topic.title()
-        
-        return "RBI Document"
+        return extract_topic(url, soup)
     
     def scrape_data(self, url):
         """Scrape data from a single URL"""
@@ -132,57 +291,20 @@ class RBICSVScraper:
         self.scraped_urls.add(url)
         
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.session.get(url, timeout=30, headers=self.conditional_headers(url))
+            if response.status_code == 304:
+                self.mark_unchanged(url)
+                return False
             if response.status_code != 200:
                 logger.warning(f"Failed to access {url}: Status {response.status_code}")
                 return False
             
-            soup = bs(response.text, 'html.parser')
-            
-            # Extract topic
-            topic = self.extract_topic_from_url_or_content(url, soup)
-            
-            # Extract content (following your working approach)
-            heading = soup.find_all('b')
-            paragraphs = soup.find_all('p')
-            
-            # Also try other content tags
-            divs = soup.find_all('div')
-            tables = soup.find_all('table')
-            
-            all_content = ""
-            
-            # Get headings
-            for content in heading:
-                text = content.get_text().strip()
-                if text:
-                    all_content += text + " "
-            
-            # Get paragraphs
-            for content in paragraphs:
-                text = content.get_text().strip()
-                if text:
-                    all_content += text + " "
-            
-            # Get meaningful div content
-            for div in divs:
-                text = div.get_text().strip()
-                if len(text) > 100 and len(text) < 5000:  # Filter meaningful content
-                    all_content += text + " "
-            
-            # Get table content
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    row_text = ' | '.join([cell.get_text().strip() for cell in cells])
-                    if row_text.strip():
-                        all_content += row_text + " "
+            topic, all_content = parse_page(url, response.text)
             
             # Clean and save
             final_content = self.clean_text(all_content)
             if final_content:
-                return self.write_to_csv(url, topic, final_content)
+                return self.save_page(url, topic, final_content, response.headers)
             
             return False
             
@@ -197,34 +319,7 @@ class RBICSVScraper:
             if response.status_code != 200:
                 return
             
-            soup = bs(response.text, 'html.parser')
-            
-            # Find links with class 'link2'
-            available_links = soup.find_all('a', {'class': 'link2'})
-            all_links = []
-            
-            for link in available_links:
-                if not link.has_attr('href'):
-                    continue
-                    
-                href = link['href']
-                if '#' in href or 'image' in href.lower():
-                    continue
-                
-                if 'http' in href:
-                    all_links.append(href)
-                elif '..' in href:
-                    full_url = HOME_URL + href[3:]
-                    all_links.append(full_url)
-                else:
-                    if '?' in url and '?' in href:
-                        i1 = url.index('?')
-                        i2 = href.index('?')
-                        full_url = url[:i1+1] + href[i2+1:]
-                        all_links.append(full_url)
-            
-            # Remove duplicates while preserving order
-            unique_links = list(dict.fromkeys(all_links))
+            unique_links = extract_link2_links(url, response.text)
             logger.info(f"Found {len(unique_links)} unique links from {url}")
             
             # Scrape each link
@@ -243,28 +338,7 @@ class RBICSVScraper:
                 logger.error(f"Failed to access home page: {url}")
                 return
             
-            soup = bs(response.text, 'html.parser')
-            
-            all_links = soup.find_all('a')
-            direct_data_links = []
-            other_links = []
-            
-            for link in all_links:
-                if not link.has_attr('href'):
-                    continue
-                    
-                href = link['href']
-                
-                if '..' in href and 'image' not in href.lower():
-                    other_links.append(href)
-                
-                if (len(href) > 5 and 'https' in href and 'rbi' in href and 
-                    'image' not in href.lower()):
-                    direct_data_links.append(href)
-            
-            # Remove duplicates
-            direct_data_links = list(dict.fromkeys(direct_data_links))
-            other_links = list(dict.fromkeys(other_links))
+            direct_data_links, other_links = extract_home_links(response.text)
             
             logger.info(f"Found {len(direct_data_links)} direct links and {len(other_links)} other links")
             
@@ -284,16 +358,7 @@ class RBICSVScraper:
     
     def scrape_specific_sections(self):
         """Scrape specific RBI sections for comprehensive coverage"""
-        sections = [
-            "https://www.rbi.org.in/Scripts/BS_PressReleaseDisplay.aspx",
-            "https://www.rbi.org.in/Scripts/NotificationUser.aspx", 
-            "https://www.rbi.org.in/Scripts/BS_CircularIndexDisplay.aspx",
-            "https://www.rbi.org.in/Scripts/BS_SpeechesView.aspx",
-            "https://www.rbi.org.in/Scripts/AnnualPublications.aspx",
-            "https://www.rbi.org.in/Scripts/PublicationsView.aspx",
-        ]
-        
-        for section_url in sections:
+        for section_url in SECTION_URLS:
             logger.info(f"Scraping section: {section_url}")
             self.crawler1(section_url)
             time.sleep(2)
@@ -311,21 +376,68 @@ class RBICSVScraper:
         logger.info(f"Scraping completed!")
         logger.info(f"Total processed: {self.processed_count}")
         logger.info(f"Duplicates skipped: {self.duplicate_count}")
+        logger.info(f"Unchanged since last crawl: {self.unchanged_count}")
         logger.info(f"Total URLs visited: {len(self.scraped_urls)}")
         
         return {
             'processed': self.processed_count,
             'duplicates': self.duplicate_count,
+            'unchanged': self.unchanged_count,
             'total_urls': len(self.scraped_urls)
         }
 
+    def run_concurrent_scrape(self, **crawler_options):
+        """Concurrent, rate-limited version of run_complete_scrape (see scraper.fetcher)"""
+        from scraper.fetcher import ConcurrentCrawler
+        
+        logger.info("Starting concurrent RBI website scraping...")
+        crawler = ConcurrentCrawler(self, **crawler_options)
+        stats = crawler.crawl_site(SECTION_URLS)
+        
+        logger.info(f"Scraping completed!")
+        logger.info(f"Total processed: {self.processed_count}")
+        logger.info(f"Duplicates skipped: {self.duplicate_count}")
+        logger.info(f"Unchanged since last crawl: {self.unchanged_count}")
+        logger.info(f"Total URLs visited: {len(self.scraped_urls)}")
+        
+        return {
+            'processed': self.processed_count,
+            'duplicates': self.duplicate_count,
+            'unchanged': self.unchanged_count,
+            'total_urls': len(self.scraped_urls),
+            'pages_per_second': stats['pages_per_second']
+        }
+
+def scrape_rbi_documents(csv_filename='rbi_complete_data.csv', state_path=CRAWL_STATE_PATH):
+    """
+    Incremental crawl for scheduled refreshes: pages are fetched with
+    conditional GETs against the persistent crawl state, only new or changed
+    pages are appended to the CSV, and all of those pages are returned as
+    {"title", "url", "content"} dicts. Every page recorded in the crawl state
+    is returned, since the next run skips it as unchanged.
+
+    The CSV is append-only: a changed page adds a new row and its earlier
+    version stays, so a full rebuild from the CSV sees both.
+    """
+    scraper = RBICSVScraper(csv_filename, state_path=state_path, collect_documents=True)
+    scraper.run_concurrent_scrape()
+    return scraper.new_documents
+
 # Usage
 if __name__ == "__main__":
-    scraper = RBICSVScraper('rbi_complete_data.csv')
-    results = scraper.run_complete_scrape()
+    import sys
+    
+    # --incremental keeps crawl state across runs and only appends changed pages
+    state_path = CRAWL_STATE_PATH if "--incremental" in sys.argv else None
+    scraper = RBICSVScraper('rbi_complete_data.csv', state_path=state_path)
+    if "--concurrent" in sys.argv:
+        results = scraper.run_concurrent_scrape()
+    else:
+        results = scraper.run_complete_scrape()
     
     print(f"\n🎉 Scraping Complete!")
     print(f"📄 Processed: {results['processed']} documents")
     print(f"🔄 Duplicates skipped: {results['duplicates']}")
+    print(f"⏸️ Unchanged since last crawl: {results['unchanged']}")
     print(f"🔗 Total URLs visited: {results['total_urls']}")
     print(f"💾 Output file: rbi_complete_data.csv")
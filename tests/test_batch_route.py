@@ -0,0 +1,18 @@
+import pytest
+from flask import Flask
+
+from app.routes import BATCH_MAX_TOP_K, api
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(api)
+    return app.test_client()
+
+
+@pytest.mark.parametrize("top_k", [2.7, "3", True, 0, BATCH_MAX_TOP_K + 1, 10 ** 7])
+def test_batch_rejects_invalid_top_k(client, top_k):
+    response = client.post("/query/batch", json={"questions": ["What is the repo rate?"], "top_k": top_k})
+    assert response.status_code == 400
+    assert "top_k" in response.get_json()["error"]
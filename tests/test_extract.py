@@ -0,0 +1,26 @@
+import pytest
+
+from scraper.extract import available_backends, extract_page
+
+CELL_WITH_BLOCKS = (
+    "<html><body><table><tr>"
+    "<td><p>First paragraph ends</p><p>Second paragraph</p>Line one<br>Line two</td>"
+    "<td><div>Other</div><div>cell</div></td>"
+    "</tr></table></body></html>"
+)
+
+
+def words(text):
+    return " ".join(text.split())
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_block_tags_inside_a_cell_separate_words(backend):
+    _, content = extract_page("https://www.rbi.org.in/page.aspx", CELL_WITH_BLOCKS, backend)
+    assert words(content) == "First paragraph ends Second paragraph Line one Line two | Other cell"
+
+
+def test_backends_agree_on_cell_content():
+    contents = {backend: words(extract_page("https://www.rbi.org.in/page.aspx", CELL_WITH_BLOCKS, backend)[1])
+                for backend in available_backends()}
+    assert len(set(contents.values())) == 1, contents
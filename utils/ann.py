@@ -0,0 +1,121 @@
+"""
+Index factory for the supported FAISS index types.
+
+The type is chosen with RBI_INDEX_TYPE (flat, ivfflat, ivfpq, hnsw, or the
+compact scalar-quantized sq8, fp16 and ivfsq8); the query-time knobs with
+RBI_NPROBE and RBI_EF_SEARCH.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivfflat", "ivfpq", "hnsw", "sq8", "fp16", "ivfsq8")
+# Scalar quantizers: 1 byte (sq8) or 2 bytes (fp16) per dimension instead of 4
+SCALAR_QUANTIZERS = {"sq8": faiss.ScalarQuantizer.QT_8bit, "fp16": faiss.ScalarQuantizer.QT_fp16,
+                     "ivfsq8": faiss.ScalarQuantizer.QT_8bit}
+
+DEFAULT_INDEX_TYPE = os.getenv("RBI_INDEX_TYPE", "flat").lower()
+DEFAULT_NPROBE = int(os.getenv("RBI_NPROBE", "16"))
+DEFAULT_EF_SEARCH = int(os.getenv("RBI_EF_SEARCH", "64"))
+
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAIN_POINTS_PER_CENTROID = 256
+
+
+def default_nlist(n: int) -> int:
+    """Rule-of-thumb IVF list count (~4*sqrt(n)), capped so every list can be trained."""
+    nlist = int(4 * math.sqrt(max(n, 1)))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+
+def training_sample(vectors: np.ndarray, size: int, seed: int = 0) -> np.ndarray:
+    if size >= len(vectors):
+        return vectors
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), size=size, replace=False))
+    return vectors[rows]
+
+
+def build_index(vectors, index_type: str = DEFAULT_INDEX_TYPE, nlist: int = None, pq_m: int = 16,
+                pq_bits: int = 8, hnsw_m: int = 32, ef_construction: int = 80, seed: int = 0):
+    """
+    Build and fill an index of the requested type. IVF quantizers are trained
+    on a random sample; too-small corpora fall back to a flat index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index_type = index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    n, dim = vectors.shape
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        index.add(vectors)
+        return index
+
+    if index_type in ("ivfflat", "ivfpq", "ivfsq8"):
+        nlist = nlist or default_nlist(n)
+        if n < nlist * MIN_POINTS_PER_CENTROID:
+            fallback = "sq8" if index_type == "ivfsq8" else "flat"
+            print(f"[!] {n} vectors is too few to train {index_type} with nlist={nlist}; using {fallback} index")
+            index_type = fallback
+        elif index_type == "ivfpq" and (dim % pq_m or n < (1 << pq_bits) * MIN_POINTS_PER_CENTROID):
+            print(f"[!] Cannot train PQ{pq_m}x{pq_bits} on {n} vectors of dim {dim}; using ivfflat")
+            index_type = "ivfflat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+        return index
+
+    if index_type in ("sq8", "fp16"):
+        index = faiss.IndexScalarQuantizer(dim, SCALAR_QUANTIZERS[index_type], faiss.METRIC_L2)
+        # Learns the per-dimension value ranges (a no-op for fp16)
+        index.train(training_sample(vectors, 65536, seed))
+        index.add(vectors)
+        return index
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivfflat":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        train_points = nlist * MAX_TRAIN_POINTS_PER_CENTROID
+    elif index_type == "ivfsq8":
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, SCALAR_QUANTIZERS[index_type], faiss.METRIC_L2)
+        train_points = nlist * MAX_TRAIN_POINTS_PER_CENTROID
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+        train_points = max(nlist, 1 << pq_bits) * MAX_TRAIN_POINTS_PER_CENTROID
+    index.train(training_sample(vectors, train_points, seed))
+    index.add(vectors)
+    return index
+
+
+def search_parameters(index, nprobe: int = None, ef_search: int = None, selector=None):
+    """
+    Per-call search parameters for index, or None when it has no knobs.
+    Passing them to index.search() is thread-safe, unlike mutating index.nprobe.
+    selector (a faiss.IDSelector) restricts the search to the ids it accepts.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=min(nprobe or DEFAULT_NPROBE, index.nlist), sel=selector)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def describe_index(index) -> str:
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = {faiss.ScalarQuantizer.QT_8bit: "SQ8", faiss.ScalarQuantizer.QT_fp16: "fp16"}.get(index.sq.qtype, "SQ")
+        nlist = f", nlist={index.nlist}" if isinstance(index, faiss.IndexIVF) else ""
+        return f"{type(index).__name__}({qtype}{nlist})"
+    if isinstance(index, faiss.IndexIVF):
+        return f"{type(index).__name__}(nlist={index.nlist})"
+    if isinstance(index, faiss.IndexHNSW):
+        return f"{type(index).__name__}(M={index.hnsw.nb_neighbors(1)})"
+    return type(index).__name__
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+INDEX_DIR = "data/faiss_index"
+# Any of these changing on disk means the index was rebuilt or, for segments.json,
+# that auto_update.py published new documents
+INDEX_FILES = (
+    os.path.join(INDEX_DIR, "segments", "segments.json"),
+    os.path.join(INDEX_DIR, "store", "manifest.json"),
+    os.path.join(INDEX_DIR, "rbi_index.faiss"),
+    os.path.join(INDEX_DIR, "metadata.json"),
+    os.path.join(INDEX_DIR, "faiss_index.pkl"),
+)
+
+
+def index_version(paths=INDEX_FILES) -> int:
+    """Latest modification time (ns) of the index files; 0 when none exist."""
+    version = 0
+    for path in paths:
+        try:
+            version = max(version, os.stat(path).st_mtime_ns)
+        except OSError:
+            continue
+    return version
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """
+    Caches LLM answers by (query vector, retrieved chunk ids). A lookup hits
+    when a stored query retrieved exactly the same chunk ids and its vector is
+    within `threshold` cosine similarity of the new one. The whole cache is
+    dropped when index_version() changes; that is checked at most once every
+    `version_check_seconds`, so a rebuild can be served stale answers for
+    that long.
+    """
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95, ttl: float = None, index_files=INDEX_FILES,
+                 version_check_seconds: float = 2.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.index_files = index_files
+        self.version_check_seconds = version_check_seconds
+        self._version_checked_at = time.monotonic()
+        self._entries = OrderedDict()  # tuple(chunk_ids) -> list of (unit_vector, answer, stored_at)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._version = index_version(index_files)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_seconds:
+            return
+        self._version_checked_at = now
+        version = index_version(self.index_files)
+        if version != self._version:
+            self._entries.clear()
+            self._size = 0
+            self._version = version
+            self.invalidations += 1
+
+    def get(self, query_vector, chunk_ids):
+        if self.maxsize <= 0:
+            return None
+        key = tuple(chunk_ids)
+        query = _unit(query_vector)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            entries = self._drop_expired(key, now)
+            for vector, answer, stored_at in entries:
+                if float(vector @ query) >= self.threshold:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def _drop_expired(self, key, now) -> list:
+        """Live entries under key; expired ones are removed from the cache"""
+        entries = self._entries.get(key)
+        if not entries or self.ttl is None:
+            return entries or []
+        live = [entry for entry in entries if now - entry[2] <= self.ttl]
+        if len(live) < len(entries):
+            self._size -= len(entries) - len(live)
+            if live:
+                self._entries[key] = live
+            else:
+                del self._entries[key]
+        return live
+
+    def put(self, query_vector, chunk_ids, answer):
+        if self.maxsize <= 0:
+            return
+        key = tuple(chunk_ids)
+        now = time.time()
+        with self._lock:
+            self._check_version()
+            self._drop_expired(key, now)
+            self._entries.setdefault(key, []).append((_unit(query_vector), answer, now))
+            self._entries.move_to_end(key)
+            self._size += 1
+            while self._size > self.maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self):
+        """Drop every entry now, e.g. from an index reload hook"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
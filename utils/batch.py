@@ -0,0 +1,79 @@
+import itertools
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def normalize_item(item, position: int) -> dict:
+    """Accept either a bare question string or a {"question", "id"?} object."""
+    if isinstance(item, str):
+        return {"id": position, "question": item}
+    if isinstance(item, dict) and item.get("question"):
+        return {"id": item.get("id", position), "question": item["question"]}
+    raise ValueError(f"Item {position} has no question")
+
+
+def read_jsonl(path: str):
+    """Yield one question item per non-empty line of a JSONL file."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _answer_one(generate, item: dict, chunks: list[dict], retrieve_ms: float) -> dict:
+    start = time.perf_counter()
+    result = {"id": item["id"], "question": item["question"]}
+    try:
+        result["answer"] = generate(item["question"], chunks)
+    except Exception as e:
+        result["error"] = str(e)
+    result["sources"] = [chunk["id"] for chunk in chunks]
+    result["timing"] = {
+        "retrieve_ms": round(retrieve_ms, 2),
+        "llm_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+    return result
+
+
+def answer_questions(items, retriever, generate, batch_size: int = 64, concurrency: int = 8, top_k: int = 4):
+    """
+    Answer an iterable of questions, yielding results as they complete.
+
+    Items are pulled lazily batch_size at a time; each batch is embedded with
+    one encode call and searched with one multi-query index.search. At most
+    `concurrency` LLM calls run at once, and no more than one batch plus the
+    in-flight calls is held in memory, so arbitrarily long inputs stream.
+    """
+    positions = itertools.count()
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        while True:
+            batch = []
+            for raw in itertools.islice(items, batch_size):
+                position = next(positions)
+                try:
+                    batch.append(normalize_item(raw, position))
+                except ValueError as e:
+                    yield {"id": position, "error": str(e)}
+            if not batch:
+                break
+
+            start = time.perf_counter()
+            all_chunks = retriever.retrieve_batch([item["question"] for item in batch], top_k=top_k)
+            # Retrieval cost is shared by the batch, so report each item's share
+            retrieve_ms = (time.perf_counter() - start) * 1000 / len(batch)
+
+            for item, chunks in zip(batch, all_chunks):
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(pool.submit(_answer_one, generate, item, chunks, retrieve_ms))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
@@ -0,0 +1,148 @@
+"""
+Resumable bulk embedding of a chunks file into a memory-mapped vector file.
+
+    <work_dir>/
+        vectors.f32       float32 rows, one per chunk, in chunks-file order
+        checkpoint.json   input identity, model, rows done, throughput
+
+Chunks are streamed from the file a window at a time. Each window is
+sorted by length so that batches hold similarly sized texts (less padding).
+Texts already in the content-hash EmbeddingStore are reused; the rest are
+encoded -- across a SentenceTransformer multi-process pool when processes
+> 1 -- and added to it. Vectors are scattered back into file order in the
+memmap. After every window
+the memmap is flushed and the checkpoint advanced, so a crashed or
+interrupted run resumes from the last finished window.
+"""
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from utils.chunk_io import iter_chunks
+from utils.embedding_store import EMBEDDING_STORE_DIR, EmbeddingStore
+from utils.registry import DEFAULT_MODEL_NAME, get_sentence_transformer
+
+EMBED_BATCH_SIZE = int(os.getenv("RBI_BULK_EMBED_BATCH", "64"))
+EMBED_WINDOW = int(os.getenv("RBI_BULK_EMBED_WINDOW", "8192"))
+EMBED_PROCESSES = int(os.getenv("RBI_BULK_EMBED_PROCESSES", str(os.cpu_count() or 1)))
+EMBED_WORK_DIR = "data/faiss_index/embed_job"
+
+VECTORS_FILE = "vectors.f32"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def count_chunks(path: str) -> int:
+    return sum(1 for _ in iter_chunks(path))
+
+
+class BulkEmbeddingJob:
+    def __init__(self, chunks_path: str, work_dir: str = EMBED_WORK_DIR, model_name: str = DEFAULT_MODEL_NAME,
+                 batch_size: int = EMBED_BATCH_SIZE, window: int = EMBED_WINDOW, processes: int = EMBED_PROCESSES,
+                 embedding_store_dir: str = EMBEDDING_STORE_DIR):
+        self.chunks_path = chunks_path
+        self.work_dir = work_dir
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.window = max(window, batch_size)
+        self.processes = max(processes, 1)
+        self.vectors_path = os.path.join(work_dir, VECTORS_FILE)
+        self.checkpoint_path = os.path.join(work_dir, CHECKPOINT_FILE)
+        self.embedding_store_dir = embedding_store_dir
+        self.pool = None
+
+    def _input_identity(self) -> dict:
+        stat = os.stat(self.chunks_path)
+        return {"chunks_path": os.path.abspath(self.chunks_path), "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns, "model": self.model_name}
+
+    def load_checkpoint(self):
+        """The checkpoint if it belongs to the current chunks file and model, else None"""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("input") != self._input_identity() or not os.path.exists(self.vectors_path):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: dict):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _encode(self, model, texts):
+        if self.processes > 1 and self.pool is None:
+            # Started on the first miss: a fully cached rebuild never pays for it
+            self.pool = model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+        pool = self.pool
+        if pool is None:
+            return model.encode(texts, batch_size=self.batch_size, show_progress_bar=False, convert_to_numpy=True)
+        # Texts arrive length-sorted, so each worker's slice is uniformly sized too
+        chunk_size = max(self.batch_size, len(texts) // (self.processes * 4) or 1)
+        if hasattr(model, "encode_multi_process"):
+            return model.encode_multi_process(texts, pool, batch_size=self.batch_size, chunk_size=chunk_size)
+        return model.encode(texts, pool=pool, batch_size=self.batch_size, chunk_size=chunk_size)
+
+    def run(self, resume: bool = True) -> np.ndarray:
+        """Embed every chunk; returns the (read-only) memmap of vectors in chunk order"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        model = get_sentence_transformer(self.model_name)
+        store = EmbeddingStore(self.embedding_store_dir, self.model_name, model.get_sentence_embedding_dimension())
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint is None:
+            total = count_chunks(self.chunks_path)
+            dim = model.get_sentence_embedding_dimension()
+            checkpoint = {"input": self._input_identity(), "total": total, "dim": dim, "done": 0,
+                          "elapsed_seconds": 0.0}
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="w+", shape=(max(total, 1), dim))
+            self._save_checkpoint(checkpoint)
+        else:
+            total, dim = checkpoint["total"], checkpoint["dim"]
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(max(total, 1), dim))
+            print(f"[+] Resuming embedding at chunk {checkpoint['done']}/{total}")
+
+        done = checkpoint["done"]
+        previous_elapsed = checkpoint["elapsed_seconds"]
+        start = time.perf_counter()
+        embedded = 0
+        try:
+            chunks = itertools.islice(iter_chunks(self.chunks_path), done, None)
+            while done < total:
+                texts = [chunk["content"] for chunk in itertools.islice(chunks, self.window)]
+                if not texts:
+                    break
+                order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+                # Misses keep the length order, so their batches stay tight
+                encoded = store.encode([texts[i] for i in order], lambda missing: self._encode(model, missing))
+                vectors[done + np.asarray(order)] = encoded
+                vectors.flush()
+
+                done += len(texts)
+                embedded += len(texts)
+                elapsed = time.perf_counter() - start
+                checkpoint.update({
+                    "done": done,
+                    "elapsed_seconds": round(previous_elapsed + elapsed, 2),
+                    "chunks_per_second": round(embedded / elapsed, 1) if elapsed else 0.0,
+                    "reuse_ratio": store.stats()["reuse_ratio"],
+                })
+                self._save_checkpoint(checkpoint)
+                print(f"[+] Embedded {done}/{total} chunks ({checkpoint['chunks_per_second']} chunks/sec)")
+        finally:
+            if self.pool is not None:
+                model.stop_multi_process_pool(self.pool)
+                self.pool = None
+
+        elapsed = time.perf_counter() - start
+        print(f"[✓] Embedded {embedded} chunks in {elapsed:.1f}s "
+              f"({checkpoint.get('chunks_per_second', 0.0)} chunks/sec); {done}/{total} done")
+        stats = store.stats()
+        print(f"[✓] Embedding store: reused {stats['hits']}, encoded {stats['misses']} "
+              f"(reuse ratio {stats['reuse_ratio']:.1%}, {stats['entries']} entries)")
+        del vectors
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(max(total, 1), dim))[:total]
@@ -0,0 +1,26 @@
+import json
+import os
+
+CHUNKS_JSONL_PATH = "data/chunks.jsonl"
+CHUNKS_JSON_PATH = "data/chunks.json"
+
+
+def default_chunks_path() -> str:
+    """The streaming pipeline's JSONL output if present, else the legacy JSON file."""
+    return CHUNKS_JSONL_PATH if os.path.exists(CHUNKS_JSONL_PATH) else CHUNKS_JSON_PATH
+
+
+def iter_chunks(path: str):
+    """Yield chunk dicts one at a time from a .jsonl file (or a legacy .json list)."""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def load_chunks(path: str) -> list[dict]:
+    return list(iter_chunks(path))
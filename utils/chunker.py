@@ -0,0 +1,188 @@
+"""
+Token-aware chunking on character offsets.
+
+clean() normalises a document in one compiled regex pass (whitespace,
+non-breaking spaces and non-ASCII runs all collapse to a single space).
+The cleaned text is split on single spaces, and each distinct word's
+model token count is looked up in a cache; words not seen before are
+encoded together in one tokenizer batch call. Chunks are greedy runs of
+whole words holding at most max_tokens tokens by those summed counts,
+returned as (start, end) spans into the cleaned text -- not the original
+document -- and sliced out only when needed.
+
+If the model's tokenizer cannot be loaded (no `tokenizers`/`transformers`,
+or no cached tokenizer files offline), a regex approximation of WordPiece
+that over-counts slightly is used instead, and a warning is printed.
+"""
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, repeat
+from operator import add
+from typing import List, NamedTuple
+
+from utils.registry import DEFAULT_MODEL_NAME
+
+# all-MiniLM-L6-v2 truncates at 256 tokens including [CLS] and [SEP]
+MAX_TOKENS = int(os.getenv("RBI_CHUNK_TOKENS", "254"))
+OVERLAP_TOKENS = int(os.getenv("RBI_CHUNK_OVERLAP", "32"))
+
+_CLEAN_RE = re.compile(r'[\s\x80-\U0010FFFF]+')
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+
+
+def clean(text: str) -> str:
+    """
+    One-pass version of utils.preprocess.clean_text. The words are the same,
+    but whitespace and non-ASCII runs collapse together: clean_text turns
+    "a é b" into "a   b", this gives "a b". Single spaces are what the
+    chunker splits on. Neither decodes HTML entities.
+    """
+    return _CLEAN_RE.sub(' ', text).strip()
+
+
+class _Encoding:
+    __slots__ = ("length",)
+
+    def __init__(self, length):
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+
+class RegexTokenizer:
+    """
+    Fallback when the model tokenizer is unavailable. Splits like BERT's
+    pre-tokenizer (words, single punctuation marks) and charges long words
+    one token per 4 characters, which over-estimates WordPiece slightly so
+    chunks still fit the encoder. Only token counts are produced.
+    """
+
+    _PIECE_RE = re.compile(r'\w{1,4}|[^\w\s]')
+
+    def encode_batch(self, texts, add_special_tokens=False):
+        return [_Encoding(len(self._PIECE_RE.findall(text))) for text in texts]
+
+
+def _hub_id(model_name):
+    return model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+
+
+def _load_tokenizer(model_name):
+    try:
+        from tokenizers import Tokenizer
+        try:
+            # The encoder download already put tokenizer.json in the hub cache
+            from huggingface_hub import hf_hub_download
+            tokenizer = Tokenizer.from_file(hf_hub_download(_hub_id(model_name), "tokenizer.json",
+                                                            local_files_only=True))
+        except Exception:
+            tokenizer = Tokenizer.from_pretrained(_hub_id(model_name))
+        # tokenizer.json ships with the model's truncation/padding settings
+        tokenizer.no_truncation()
+        tokenizer.no_padding()
+        return tokenizer
+    except Exception:
+        pass
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(_hub_id(model_name), use_fast=True)
+        if tokenizer.is_fast:
+            return tokenizer._tokenizer
+    except Exception:
+        pass
+    print(f"[!] Tokenizer for {model_name} unavailable, sizing chunks with the regex approximation")
+    return RegexTokenizer()
+
+
+def get_tokenizer(model_name: str = DEFAULT_MODEL_NAME):
+    """Process-wide fast tokenizer for model_name, loaded on first use"""
+    tokenizer = _tokenizers.get(model_name)
+    if tokenizer is None:
+        with _lock:
+            tokenizer = _tokenizers.get(model_name)
+            if tokenizer is None:
+                tokenizer = _tokenizers[model_name] = _load_tokenizer(model_name)
+    return tokenizer
+
+
+def _spans(words, stops, counts, max_tokens, overlap):
+    """Greedy spans over space-separated words; stops[i] is one past word i's trailing space"""
+    spans = []
+    totals = list(accumulate(counts))
+    n = len(words)
+    start = 0
+    while start < n:
+        before = totals[start - 1] if start else 0
+        # A word longer than max_tokens on its own still gets a chunk
+        end = max(bisect_right(totals, before + max_tokens, start), start + 1)
+        spans.append(Span(stops[start] - 1 - len(words[start]), stops[end - 1] - 1, totals[end - 1] - before))
+        if end == n:
+            break
+        # Step back over whole words so at most `overlap` tokens are repeated
+        start = max(bisect_left(totals, totals[end - 1] - overlap, start, end) + 1, start + 1)
+    return spans
+
+
+class TokenChunker:
+    """
+    Cuts cleaned documents into spans of at most max_tokens model tokens.
+
+    Text is split on spaces only, which is also the first thing BERT's
+    pre-tokenizer does, so per-word token counts add up exactly and chunks
+    always break between words. Only words not seen before are sent to the
+    tokenizer, in one encode_batch call per spans_batch; their counts are
+    cached.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, max_tokens: int = MAX_TOKENS,
+                 overlap: int = OVERLAP_TOKENS, cache_size: int = 500_000):
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.cache_size = cache_size
+        self.token_counts = {}
+
+    @property
+    def tokenizer(self):
+        return get_tokenizer(self.model_name)
+
+    def count_words(self, documents):
+        """Make sure every word of documents has its token count in token_counts"""
+        words = set().union(*documents)
+        missing = list(words.difference(self.token_counts))
+        if missing:
+            if len(self.token_counts) + len(missing) > self.cache_size:
+                # Start over, but with every word this batch needs, not only the unseen ones
+                self.token_counts.clear()
+                missing = list(words)
+            encodings = self.tokenizer.encode_batch(missing, add_special_tokens=False)
+            self.token_counts.update(zip(missing, map(len, encodings)))
+
+    def spans_batch(self, texts: List[str]) -> List[List[Span]]:
+        """Spans for each (already cleaned) text, tokenizing unseen words in one batch call"""
+        documents = [text.split(' ') if text else [] for text in texts]
+        self.count_words(documents)
+        lookup = self.token_counts.__getitem__
+        return [_spans(words, list(accumulate(map(add, map(len, words), repeat(1)))),
+                       list(map(lookup, words)), self.max_tokens, self.overlap)
+                for words in documents]
+
+    def spans(self, text: str) -> List[Span]:
+        return self.spans_batch([text])[0]
+
+    def chunk(self, text: str) -> List[str]:
+        """Drop-in for utils.preprocess.chunk_text on cleaned text"""
+        return [text[span.start:span.end] for span in self.spans(text)]
@@ -0,0 +1,213 @@
+"""
+Packs retrieved chunks into the prompt context under a token budget.
+
+    1. Chunks are grouped by document (source_row, else URL).
+    2. Within a document they are put back in text order, and chunks that
+       overlap (the chunkers' overlap windows) are merged into one passage.
+       Only chunks that really follow each other are merged: by start/end
+       offsets, by consecutive chunk_index, or failing both by a run of
+       MIN_OVERLAP_WORDS shared words. Others stay separate passages.
+    3. Passages that repeat an earlier one (the same page scraped under
+       several URLs, boilerplate) are dropped.
+    4. Documents are ordered by their best-ranked chunk and written with
+       their title and URL once, then passages until the budget runs out.
+
+Tokens are counted with the embedding model's tokenizer (see
+utils.chunker), which is close enough to Gemini's for budgeting.
+"""
+import os
+import threading
+from typing import NamedTuple
+
+from utils.chunker import TokenChunker
+
+CONTEXT_TOKENS = int(os.getenv("RBI_CONTEXT_TOKENS", "1500"))
+# Passages sharing at least this fraction of their word 5-grams with an earlier passage are dropped
+DUPLICATE_THRESHOLD = float(os.getenv("RBI_CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+MIN_PASSAGE_TOKENS = 32
+SHINGLE_WORDS = 5
+MAX_OVERLAP_WORDS = 1000
+# Chunks without offsets or indexes are only merged when they share this many words
+MIN_OVERLAP_WORDS = 8
+
+# One word-count cache per request thread, so packing never waits on a lock;
+# the fast tokenizer behind them is shared and safe to call concurrently
+COUNTER_CACHE_WORDS = 50_000
+_local = threading.local()
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int
+    chunks: int
+    documents: int
+    passages: int
+    merged: int
+    duplicates: int
+    truncated: bool
+
+
+def _word_tokens(words: list[str]) -> list[int]:
+    counter = getattr(_local, "counter", None)
+    if counter is None:
+        counter = _local.counter = TokenChunker(cache_size=COUNTER_CACHE_WORDS)
+    counter.count_words([words])
+    return [counter.token_counts[word] for word in words]
+
+
+def count_tokens(text: str) -> int:
+    return sum(_word_tokens(text.split(" "))) if text else 0
+
+
+def _overlap(a: list[str], b: list[str]) -> int:
+    """Number of words at the end of a that b starts with"""
+    if not a or not b:
+        return 0
+    first = b[0]
+    for i in range(max(len(a) - MAX_OVERLAP_WORDS, 0), len(a)):
+        if a[i] == first and a[i:] == b[:len(a) - i]:
+            return len(a) - i
+    return 0
+
+
+def _shingles(words: list[str]) -> set:
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _text_order(chunk: dict, rank: int):
+    if chunk.get("start") is not None:
+        return 0, chunk["start"], rank
+    if chunk.get("chunk_index") is not None:
+        return 0, chunk["chunk_index"], rank
+    return 1, rank, rank
+
+
+def _positioned(last: dict, chunk: dict) -> bool:
+    """Whether both sides carry offsets or chunk indexes to judge adjacency by"""
+    return (last["start"] is not None and chunk.get("start") is not None) or \
+        (last["chunk_index"] is not None and chunk.get("chunk_index") is not None)
+
+
+def _adjacent(last: dict, chunk: dict) -> bool:
+    """
+    Whether chunk can continue the passage ending with last: it starts before
+    that passage ends, or is the next chunk of the document. Unpositioned
+    chunks may still be merged on a long enough word overlap.
+    """
+    if last["start"] is not None and chunk.get("start") is not None:
+        return chunk["start"] < last["end"]
+    if last["chunk_index"] is not None and chunk.get("chunk_index") is not None:
+        return chunk["chunk_index"] <= last["chunk_index"] + 1
+    return True
+
+
+def _extend(last: dict, chunk: dict) -> dict:
+    return {
+        "start": last["start"],
+        "end": max(last["end"], chunk["end"]) if last["end"] is not None and chunk.get("end") is not None else None,
+        "chunk_index": max(last["chunk_index"], chunk["chunk_index"])
+        if last["chunk_index"] is not None and chunk.get("chunk_index") is not None else None,
+    }
+
+
+def _passages(chunks: list[dict]):
+    """
+    ([(document, rank, words, position)], merges): overlapping chunks of one
+    document merged; position is the passage's text order within its document
+    """
+    documents = {}
+    for rank, chunk in enumerate(chunks):
+        key = chunk.get("source_row")
+        if key is None:
+            key = chunk.get("url") or chunk.get("id", rank)
+        document = documents.setdefault(key, {"title": chunk.get("title", ""), "url": chunk.get("url", ""),
+                                              "rank": rank, "chunks": []})
+        document["chunks"].append((rank, chunk))
+
+    passages = []
+    merged = 0
+    for document in documents.values():
+        current = None
+        for rank, chunk in sorted(document["chunks"], key=lambda item: _text_order(item[1], item[0])):
+            words = chunk["content"].split()
+            if current is not None and _adjacent(last, chunk):
+                shared = _overlap(current[2], words)
+                contained = len(words) <= len(current[2]) and " ".join(words) in " ".join(current[2])
+                # Without offsets or indexes only a long shared run shows the chunks overlap
+                if contained or shared >= (1 if _positioned(last, chunk) else MIN_OVERLAP_WORDS):
+                    if not contained:
+                        current[2].extend(words[shared:])
+                        last = _extend(last, chunk)
+                    current[1] = min(current[1], rank)
+                    merged += 1
+                    continue
+            if current is not None:
+                passages.append((*current, len(passages)))
+            current = [document, rank, words]
+            last = {key: chunk.get(key) for key in ("start", "end", "chunk_index")}
+        passages.append((*current, len(passages)))
+    return passages, merged
+
+
+def pack_context(chunks: list[dict], max_tokens: int = CONTEXT_TOKENS) -> PackedContext:
+    """Context text for chunks (best first) within max_tokens; see the module docstring"""
+    passages, merged = _passages(chunks)
+
+    kept = []
+    seen = []
+    duplicates = 0
+    for document, rank, words, position in sorted(passages, key=lambda passage: passage[1]):
+        shingles = _shingles(words)
+        if any(len(shingles & other) >= DUPLICATE_THRESHOLD * len(shingles) for other in seen):
+            duplicates += 1
+            continue
+        seen.append(shingles)
+        kept.append((document, words, position))
+
+    # Documents by best rank; their passages in text order
+    order = []
+    by_document = {}
+    for document, words, position in kept:
+        if id(document) not in by_document:
+            by_document[id(document)] = []
+            order.append(document)
+        by_document[id(document)].append((position, words))
+
+    blocks = []
+    used = 0
+    truncated = False
+    passage_count = 0
+    for number, document in enumerate(order, start=1):
+        header = f"[{number}] {document['title']}".rstrip()
+        if document["url"]:
+            header += f"\nURL: {document['url']}"
+        header_tokens = count_tokens(" ".join(header.split()))
+        if used + header_tokens + MIN_PASSAGE_TOKENS > max_tokens:
+            truncated = True
+            break
+        texts = []
+        block_tokens = header_tokens
+        for _, words in sorted(by_document[id(document)], key=lambda item: item[0]):
+            counts = _word_tokens(words)
+            remaining = max_tokens - used - block_tokens
+            if sum(counts) > remaining:
+                truncated = True
+                if remaining < MIN_PASSAGE_TOKENS:
+                    break
+                total = 0
+                for cut, count in enumerate(counts):
+                    if total + count > remaining:
+                        break
+                    total += count
+                words, counts = words[:cut] + ["…"], counts[:cut] + [1]
+            texts.append(" ".join(words))
+            block_tokens += sum(counts)
+            passage_count += 1
+        if not texts:
+            break
+        blocks.append(header + "\n" + "\n…\n".join(texts))
+        used += block_tokens
+    return PackedContext("\n\n".join(blocks), used, len(chunks), len(blocks), passage_count, merged, duplicates,
+                         truncated)
@@ -0,0 +1,199 @@
+"""
+Persistent content-hash -> embedding cache shared by every index build path.
+
+    <root>/
+        store.json    model, dimension, committed entry count
+        hashes.bin    16-byte md5 digest of each entry's text, in row order
+        vectors.f32   float32 vectors, row-major, count x dim (read via mmap)
+
+Entries are appended: data is written first and store.json's count, the
+commit point, is replaced afterwards, so a crash mid-append only leaves
+trailing bytes that the next open truncates. compact() rewrites the store
+without orphaned entries. The store belongs to one model; opening it for
+another model starts it afresh. There must be a single writer at a time.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from utils.registry import DEFAULT_MODEL_NAME
+
+EMBEDDING_STORE_DIR = os.getenv("RBI_EMBEDDING_STORE", "data/faiss_index/embedding_store")
+STORE_FILE = "store.json"
+HASHES_FILE = "hashes.bin"
+VECTORS_FILE = "vectors.f32"
+DIGEST_SIZE = 16
+
+
+def content_digest(text: str) -> bytes:
+    return hashlib.md5(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    def __init__(self, root: str = EMBEDDING_STORE_DIR, model_name: str = DEFAULT_MODEL_NAME, dim: int = None):
+        self.root = root
+        self.model_name = model_name
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+        info = self._read_info()
+        if info is None or info["model"] != model_name or (dim is not None and info["dim"] not in (None, dim)):
+            if info is not None:
+                print(f"[!] Embedding store at {root} is for {info['model']} ({info['dim']}d); starting afresh")
+            info = {"model": model_name, "dim": dim, "count": 0}
+            self._reset_files()
+            self._write_info(info)
+        self.dim = info["dim"]
+        self.count = info["count"]
+        self._truncate_uncommitted()
+
+        self.rows = {digest: row for row, digest in enumerate(self._read_digests())}
+        self._vectors = None
+
+    def _read_digests(self) -> list[bytes]:
+        # Raw bytes: numpy's S16 dtype would strip digests ending in NUL
+        with open(os.path.join(self.root, HASHES_FILE), "rb") as f:
+            data = f.read(self.count * DIGEST_SIZE)
+        return [data[i:i + DIGEST_SIZE] for i in range(0, len(data), DIGEST_SIZE)]
+
+    def _read_info(self):
+        try:
+            with open(os.path.join(self.root, STORE_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_info(self, info: dict):
+        tmp_path = os.path.join(self.root, f"{STORE_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, STORE_FILE))
+
+    def _reset_files(self):
+        for name in (HASHES_FILE, VECTORS_FILE):
+            open(os.path.join(self.root, name), "wb").close()
+
+    def _truncate_uncommitted(self):
+        for name, row_bytes in ((HASHES_FILE, DIGEST_SIZE), (VECTORS_FILE, 4 * (self.dim or 0))):
+            path = os.path.join(self.root, name)
+            if not os.path.exists(path):
+                open(path, "wb").close()
+            elif os.path.getsize(path) > self.count * row_bytes:
+                os.truncate(path, self.count * row_bytes)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped view of the committed vectors"""
+        if self._vectors is None or len(self._vectors) != self.count:
+            if self.count:
+                self._vectors = np.memmap(os.path.join(self.root, VECTORS_FILE), dtype=np.float32,
+                                          mode="r", shape=(self.count, self.dim))
+            else:
+                self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        return self._vectors
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, text: str):
+        return content_digest(text) in self.rows
+
+    def lookup(self, texts: list[str]):
+        """(digests, rows) for texts; rows[i] is None when text i is not stored"""
+        digests = [content_digest(text) for text in texts]
+        rows = [self.rows.get(digest) for digest in digests]
+        return digests, rows
+
+    def add(self, digests: list[bytes], vectors: np.ndarray):
+        """Append new entries (digests already present are skipped)"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self.lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            new = [i for i, digest in enumerate(digests) if digest not in self.rows]
+            unique = {}
+            for i in new:
+                unique.setdefault(digests[i], i)
+            if not unique:
+                return
+            keep = list(unique.values())
+            with open(os.path.join(self.root, HASHES_FILE), "ab") as f:
+                f.write(b"".join(digests[i] for i in keep))
+            with open(os.path.join(self.root, VECTORS_FILE), "ab") as f:
+                vectors[keep].tofile(f)
+            for offset, i in enumerate(keep):
+                self.rows[digests[i]] = self.count + offset
+            self.count += len(keep)
+            self._write_info({"model": self.model_name, "dim": self.dim, "count": self.count})
+
+    def encode(self, texts: list[str], encode_fn) -> np.ndarray:
+        """
+        Vectors for texts, calling encode_fn(missing_texts) only for texts not
+        stored yet and storing what it returns.
+        """
+        digests, rows = self.lookup(texts)
+        missing = [i for i, row in enumerate(rows) if row is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        encoded = None
+        if missing:
+            encoded = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.add([digests[i] for i in missing], encoded)
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        result = np.empty((len(texts), self.dim), dtype=np.float32)
+        present = [i for i, row in enumerate(rows) if row is not None]
+        if present:
+            result[present] = self.vectors[[rows[i] for i in present]]
+        if missing:
+            result[missing] = encoded
+        return result
+
+    def compact(self, live_digests) -> int:
+        """Drop entries whose digest is not in live_digests; returns how many were evicted"""
+        live_digests = set(live_digests)
+        with self.lock:
+            keep = [row for digest, row in self.rows.items() if digest in live_digests]
+            evicted = self.count - len(keep)
+            if not evicted:
+                return 0
+            keep.sort()
+            digests = self._read_digests()
+            # Build the compacted store beside this one and swap directories
+            tmp_dir = f"{self.root}.tmp-{os.getpid()}"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            with open(os.path.join(tmp_dir, HASHES_FILE), "wb") as f:
+                f.write(b"".join(digests[row] for row in keep))
+            with open(os.path.join(tmp_dir, VECTORS_FILE), "wb") as f:
+                for start in range(0, len(keep), 65536):
+                    np.ascontiguousarray(self.vectors[keep[start:start + 65536]]).tofile(f)
+            with open(os.path.join(tmp_dir, STORE_FILE), "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self.dim, "count": len(keep)}, f, indent=2)
+
+            self._vectors = None
+            old_dir = f"{self.root}.old-{os.getpid()}"
+            os.replace(self.root, old_dir)
+            os.replace(tmp_dir, self.root)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            self.count = len(keep)
+            self.rows = {digests[row]: new_row for new_row, row in enumerate(keep)}
+            return evicted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reuse_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,8 +1,127 @@
-from sentence_transformers import SentenceTransformer
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.registry import DEFAULT_MODEL_NAME, QUERY_ENCODER_MODE, get_sentence_transformer
+
+EMBED_MAX_BATCH = int(os.getenv("RBI_EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("RBI_EMBED_MAX_WAIT_MS", "5"))
+
+# Upper bounds of the histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _bucket(value: int) -> str:
+    for bound in HISTOGRAM_BUCKETS:
+        if value <= bound:
+            return f"<={bound}"
+    return f">{HISTOGRAM_BUCKETS[-1]}"
+
+
+class BatchingEncoder:
+    """
+    Collects concurrent encode() calls into one model.encode() batch. A batch
+    is flushed once it holds max_batch_size texts or max_wait_ms after its
+    first request arrived; results are scattered back to each caller.
+    """
+
+    def __init__(self, model, max_batch_size: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self.batches = 0
+        self.requests = 0
+        self.batch_size_histogram = {_bucket(b): 0 for b in HISTOGRAM_BUCKETS + (HISTOGRAM_BUCKETS[-1] + 1,)}
+        self.queue_depth_histogram = dict(self.batch_size_histogram)
+        self.max_queue_depth = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a preloaded encoder restarts its worker per process
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != pid:
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future.result()
+
+    def _collect(self):
+        requests = [self._queue.get()]
+        size = len(requests[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request[0])
+        return requests, size
+
+    def _run(self):
+        while True:
+            requests, size = self._collect()
+            depth = self._queue.qsize()
+            self.batches += 1
+            self.requests += len(requests)
+            self.batch_size_histogram[_bucket(size)] += 1
+            self.queue_depth_histogram[_bucket(depth)] += 1
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+            texts = [text for request_texts, _ in requests for text in request_texts]
+            try:
+                vectors = self.model.encode(texts, batch_size=max(len(texts), 1), show_progress_bar=False, convert_to_numpy=True)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for request_texts, future in requests:
+                end = start + len(request_texts)
+                future.set_result(vectors[start:end])
+                start = end
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_requests_per_batch": self.requests / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(self.batch_size_histogram),
+            "queue_depth_histogram": dict(self.queue_depth_histogram),
+        }
+
 
 class EmbeddingModel:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, mode: str = QUERY_ENCODER_MODE):
+        self.mode = mode
+        self.model = get_sentence_transformer(model_name, mode)
+        self.batcher = BatchingEncoder(self.model)
 
     def encode(self, texts: list[str]) -> list[list[float]]:
         return self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+
+    def encode_queries(self, texts: list[str]) -> np.ndarray:
+        """Encode a few query strings, micro-batched with other threads' concurrent calls."""
+        return self.batcher.encode(texts)
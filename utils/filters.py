@@ -0,0 +1,227 @@
+"""
+Metadata filters pushed down into the index search.
+
+    <store_dir>/
+        filters.json    section names (code -> name), count
+        sections.u8     section code of each chunk
+        dates.i32       document date of each chunk as YYYYMMDD, 0 if unknown
+        url_order.u32   chunk ids sorted by URL, for prefix ranges
+
+A SearchFilter (sections, URL prefix, date range) is resolved per store into
+a boolean mask over its chunk ids, a packed bitmap for faiss.IDSelectorBitmap
+and the selected ids. Resolutions are cached per store, so a repeated filter
+costs nothing, and FAISS only scores chunks that pass it.
+"""
+import json
+import os
+import re
+import threading
+from bisect import bisect_left
+from datetime import date
+from typing import NamedTuple
+
+import faiss
+import numpy as np
+
+FILTERS_FILE = "filters.json"
+SECTIONS_FILE = "sections.u8"
+DATES_FILE = "dates.i32"
+URL_ORDER_FILE = "url_order.u32"
+SELECTION_CACHE_SIZE = int(os.getenv("RBI_FILTER_CACHE_SIZE", "128"))
+
+# Matched against the URL path, in order; see SECTION_URLS in scraper.rbi_scraper
+SECTION_PATTERNS = [
+    ("press_release", re.compile(r"pressrelease", re.I)),
+    ("notification", re.compile(r"notification", re.I)),
+    ("master_direction", re.compile(r"masdirection|masterdirection", re.I)),
+    ("circular", re.compile(r"circular", re.I)),
+    ("speech", re.compile(r"speech", re.I)),
+    ("publication", re.compile(r"publication", re.I)),
+    ("faq", re.compile(r"faq", re.I)),
+]
+SECTIONS = tuple(name for name, _ in SECTION_PATTERNS) + ("other",)
+
+_MONTHS = {name: i for i, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+     ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+     ("dec", "december")], start=1) for name in names}
+_MONTH = "|".join(sorted(_MONTHS, key=len, reverse=True))
+# "Jan 05, 2024", "January 5, 2024" or "5 January 2024"
+_DATE_RES = [
+    re.compile(rf"\b(?P<month>{_MONTH})\.?\s+(?P<day>\d{{1,2}}),?\s+(?P<year>(?:19|20)\d\d)\b", re.I),
+    re.compile(rf"\b(?P<day>\d{{1,2}})\s+(?P<month>{_MONTH})\.?,?\s+(?P<year>(?:19|20)\d\d)\b", re.I),
+]
+
+
+def section_for_url(url: str) -> str:
+    path = (url or "").split("?", 1)[0]
+    for name, pattern in SECTION_PATTERNS:
+        if pattern.search(path):
+            return name
+    return "other"
+
+
+def document_date(text: str, head: int = 1000):
+    """First date written near the top of a document, as "YYYY-MM-DD", or None"""
+    head_text = (text or "")[:head]
+    found = []
+    for pattern in _DATE_RES:
+        match = pattern.search(head_text)
+        if match:
+            found.append(match)
+    for match in sorted(found, key=lambda m: m.start()):
+        try:
+            return date(int(match["year"]), _MONTHS[match["month"].lower()], int(match["day"])).isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _date_key(value) -> int:
+    """YYYYMMDD integer for an ISO date string (or date), 0 for None"""
+    if not value:
+        return 0
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+class SearchFilter(NamedTuple):
+    sections: tuple = ()
+    url_prefix: str = ""
+    date_from: str = None
+    date_to: str = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Parse {"section"/"sections", "url_prefix", "date_from", "date_to"}; raises ValueError"""
+        if data is None or isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            raise ValueError("filters must be an object")
+        sections = data.get("sections", data.get("section")) or ()
+        if isinstance(sections, str):
+            sections = (sections,)
+        if not isinstance(sections, (list, tuple)) or not all(isinstance(section, str) for section in sections):
+            raise ValueError("sections must be a string or a list of strings")
+        unknown = [section for section in sections if section not in SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown section(s) {unknown}; expected any of {list(SECTIONS)}")
+        url_prefix = data.get("url_prefix") or ""
+        if not isinstance(url_prefix, str):
+            raise ValueError("url_prefix must be a string")
+        for key in ("date_from", "date_to"):
+            if data.get(key):
+                if not isinstance(data[key], str):
+                    raise ValueError(f"{key} must be a YYYY-MM-DD string")
+                date.fromisoformat(data[key][:10])
+        search_filter = cls(tuple(sorted(set(sections))), url_prefix,
+                            data.get("date_from") or None, data.get("date_to") or None)
+        return search_filter if search_filter != cls() else None
+
+
+class Selection(NamedTuple):
+    mask: np.ndarray      # bool per chunk id
+    ids: np.ndarray       # selected chunk ids, ascending
+    selector: object      # faiss.IDSelectorBitmap over the packed mask
+    bitmap: np.ndarray    # keeps the selector's memory alive
+
+
+def write_filter_index(store_dir: str, metadata):
+    """Write the filter columns for metadata (in chunk order) into store_dir"""
+    codes = {name: code for code, name in enumerate(SECTIONS)}
+    sections, dates, urls = [], [], []
+    for record in metadata:
+        url = record.get("url", "") or ""
+        sections.append(codes[record.get("section") or section_for_url(url)])
+        dates.append(_date_key(record.get("date")))
+        urls.append(url)
+    np.asarray(sections, dtype=np.uint8).tofile(os.path.join(store_dir, SECTIONS_FILE))
+    np.asarray(dates, dtype=np.int32).tofile(os.path.join(store_dir, DATES_FILE))
+    np.asarray(sorted(range(len(urls)), key=urls.__getitem__), dtype=np.uint32).tofile(
+        os.path.join(store_dir, URL_ORDER_FILE))
+    with open(os.path.join(store_dir, FILTERS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"sections": list(SECTIONS), "count": len(urls)}, f, indent=2)
+
+
+class _SortedUrls:
+    """URLs in url_order, read from the metadata on access, for bisect"""
+
+    def __init__(self, order, metadata):
+        self.order = order
+        self.metadata = metadata
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.metadata[int(self.order[i])].get("url", "") or ""
+
+
+class FilterIndex:
+    def __init__(self, sections: np.ndarray, dates: np.ndarray, url_order: np.ndarray, names, metadata):
+        self.count = len(sections)
+        self.sections = sections
+        self.dates = dates
+        self.urls = _SortedUrls(url_order, metadata)
+        self.codes = {name: code for code, name in enumerate(names)}
+        self.lock = threading.Lock()
+        self.cache = {}
+
+    @classmethod
+    def open(cls, store_dir: str, metadata):
+        with open(os.path.join(store_dir, FILTERS_FILE), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        count = info["count"]
+
+        def column(name, dtype):
+            # np.memmap refuses empty files
+            if not count:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(os.path.join(store_dir, name), dtype=dtype, mode="r", shape=(count,))
+        return cls(column(SECTIONS_FILE, np.uint8), column(DATES_FILE, np.int32), column(URL_ORDER_FILE, np.uint32),
+                   info["sections"], metadata)
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        """Filter columns built in memory, for indexes written before filters.json existed"""
+        codes = {name: code for code, name in enumerate(SECTIONS)}
+        records = list(metadata)
+        urls = [record.get("url", "") or "" for record in records]
+        sections = np.asarray([codes[record.get("section") or section_for_url(url)]
+                               for record, url in zip(records, urls)], dtype=np.uint8)
+        dates = np.asarray([_date_key(record.get("date")) for record in records], dtype=np.int32)
+        url_order = np.asarray(sorted(range(len(urls)), key=urls.__getitem__), dtype=np.uint32)
+        return cls(sections, dates, url_order, SECTIONS, metadata)
+
+    def _mask(self, search_filter: SearchFilter) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+        if search_filter.sections:
+            codes = [self.codes[name] for name in search_filter.sections if name in self.codes]
+            mask &= np.isin(self.sections, codes)
+        if search_filter.date_from or search_filter.date_to:
+            # Chunks with no known date never pass a date filter
+            mask &= self.dates >= max(_date_key(search_filter.date_from), 1)
+            if search_filter.date_to:
+                mask &= self.dates <= _date_key(search_filter.date_to)
+        if search_filter.url_prefix:
+            prefix = search_filter.url_prefix
+            start = bisect_left(self.urls, prefix)
+            end = bisect_left(self.urls, prefix + "\U0010ffff", lo=start)
+            in_range = np.zeros(self.count, dtype=bool)
+            in_range[np.asarray(self.urls.order[start:end], dtype=np.int64)] = True
+            mask &= in_range
+        return mask
+
+    def select(self, search_filter: SearchFilter) -> Selection:
+        selection = self.cache.get(search_filter)
+        if selection is None:
+            mask = self._mask(search_filter)
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(self.count, faiss.swig_ptr(bitmap))
+            selection = Selection(mask, np.flatnonzero(mask), selector, bitmap)
+            with self.lock:
+                if len(self.cache) >= SELECTION_CACHE_SIZE:
+                    self.cache.pop(next(iter(self.cache)))
+                self.cache[search_filter] = selection
+        return selection
@@ -1,16 +1,25 @@
-import google.generativeai as genai
 import os
+import time
 from dotenv import load_dotenv
 
+from utils.context import pack_context
+from utils.llm_client import LLMClient, get_backend
+from utils.metrics import observe_stage, span
+
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# "stub" swaps Gemini for a deterministic local model (offline load tests)
+LLM_BACKEND = os.getenv("RBI_LLM_BACKEND", "gemini").lower()
+
+# Deadlines, concurrency cap, retries, circuit breaker and hedging: see utils.llm_client
+client = LLMClient(get_backend(LLM_BACKEND))
 
-model = genai.GenerativeModel("gemini-2.0-flash")
+def build_prompt(query: str, retrieved_chunks: list[dict]) -> str:
+    # Overlaps merged, duplicates dropped, titles/URLs once per document, within RBI_CONTEXT_TOKENS
+    return build_context_prompt(query, pack_context(retrieved_chunks).text)
 
-def generate_response(query: str, retrieved_chunks: list[dict]) -> str:
-    context = "\n\n".join([chunk["content"] for chunk in retrieved_chunks])
-    prompt = f"""You are an assistant trained on RBI documents.
+def build_context_prompt(query: str, context: str) -> str:
+    return f"""You are an assistant trained on RBI documents.
 Use the following RBI context to answer the query.
  If there is any relevant link available in the context of query please return it.
 
@@ -22,5 +31,48 @@ Query: {query}
 If the answer is based on a specific document, mention the title and attach the URL if available. 
 """
 
-    response = model.generate_content(prompt)
-    return response.text
+def generate_response(query: str, retrieved_chunks: list[dict], timings: dict = None) -> str:
+    """Raises utils.llm_client.LLMError when the model times out or is unavailable."""
+    with span("prompt", timings):
+        prompt = build_prompt(query, retrieved_chunks)
+    with span("llm", timings):
+        return client.generate(prompt)
+
+def stream_response(query: str, retrieved_chunks: list[dict], timings: dict = None):
+    """Yield the answer text piece by piece as the model generates it."""
+    with span("prompt", timings):
+        prompt = build_prompt(query, retrieved_chunks)
+    start = time.perf_counter()
+    first = True
+    with span("llm", timings):
+        for text in client.stream(prompt):
+            if first:
+                observe_stage("llm_first_token", time.perf_counter() - start, timings)
+                first = False
+            yield text
+
+async def astream_response(query: str, retrieved_chunks: list[dict], timings: dict = None):
+    """Async version of stream_response; awaits the model without holding a thread."""
+    with span("prompt", timings):
+        prompt = build_prompt(query, retrieved_chunks)
+    start = time.perf_counter()
+    first = True
+    with span("llm", timings):
+        async for text in client.astream(prompt):
+            if first:
+                observe_stage("llm_first_token", time.perf_counter() - start, timings)
+                first = False
+            yield text
+
+
+class GeminiWrapper:
+    """Question answering over a ready-made context string, through the shared client"""
+
+    def __init__(self, llm_client: LLMClient = None):
+        self.client = llm_client or client
+
+    def ask(self, prompt: str, timeout: float = None) -> str:
+        return self.client.generate(prompt, timeout=timeout)
+
+    def ask_with_context(self, query: str, context: str, timeout: float = None) -> str:
+        return self.ask(build_context_prompt(query, context), timeout=timeout)
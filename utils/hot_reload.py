@@ -0,0 +1,206 @@
+"""
+Hot index reload for long-running servers.
+
+A ReloadableRetriever owns the current VectorRetriever plus any older ones
+still in use. Requests take a lease (`with handle.lease() as retriever:`),
+which pins the version that was current when they started. A reload builds
+the new retriever in a background thread and swaps the pointer under a
+lock (read-copy-update): new requests see the new index at once, in-flight
+ones finish on the old copy, and the old copy's mmaps are closed when its
+last lease is released.
+
+Reloads are triggered by
+  - the index itself changing on disk: a rewritten store manifest or
+    pickle. Segment directories are not watched, since VectorRetriever
+    already picks up new segments incrementally;
+  - touching RELOAD_TRIGGER_PATH, which reaches every worker process;
+  - calling reload() directly (e.g. the admin endpoint).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.index_store import MANIFEST_FILE, is_index_store
+from utils.segments import is_segmented_store
+
+WATCH_SECONDS = float(os.getenv("RBI_INDEX_WATCH_SECONDS", "5"))
+RELOAD_TRIGGER_PATH = os.getenv("RBI_RELOAD_TRIGGER", "data/faiss_index/RELOAD")
+
+
+def _stat_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def index_stamp(index_path: str):
+    """Identity of the on-disk index that a reload would pick up; None for segments"""
+    if is_segmented_store(index_path):
+        return None
+    if is_index_store(index_path):
+        # write_index_store swaps a new directory in (rename or symlink), so the inode changes
+        return _stat_stamp(os.path.join(index_path, MANIFEST_FILE))
+    return _stat_stamp(index_path)
+
+
+def index_version(retriever, index_path: str):
+    """Human-readable version of the index a retriever serves"""
+    if retriever.segments is not None:
+        return f"segments-generation-{retriever.segments.view.generation}"
+    if retriever.store is not None:
+        return f"store-{int(retriever.store.manifest.get('created_at', 0) * 1000)}"
+    stamp = _stat_stamp(index_path)
+    return f"pickle-{stamp[1] // 1_000_000}" if stamp else "pickle"
+
+
+class _Version:
+    __slots__ = ("retriever", "version", "stamp", "loaded_at", "refs", "retired")
+
+    def __init__(self, retriever, version, stamp):
+        self.retriever = retriever
+        self.version = version
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        self.refs = 0
+        self.retired = False
+
+
+class ReloadableRetriever:
+    def __init__(self, index_path: str, model_name: str, watch_seconds: float = WATCH_SECONDS,
+                 trigger_path: str = RELOAD_TRIGGER_PATH):
+        self.index_path = index_path
+        self.model_name = model_name
+        self.watch_seconds = watch_seconds
+        self.trigger_path = trigger_path
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.draining = []
+        self.reloads = 0
+        self.last_reload_seconds = None
+        self.last_error = None
+        self.watcher_pid = None
+
+        start = time.perf_counter()
+        self.current = self._load()
+        self.initial_load_seconds = time.perf_counter() - start
+        self.trigger_stamp = _stat_stamp(trigger_path)
+
+    def _load(self) -> _Version:
+        from utils.retriever import VectorRetriever
+        stamp = index_stamp(self.index_path)
+        retriever = VectorRetriever(self.index_path, model_name=self.model_name)
+        return _Version(retriever, index_version(retriever, self.index_path), stamp)
+
+    @property
+    def retriever(self):
+        """The current retriever, without a lease (scripts and stats only)"""
+        return self.current.retriever
+
+    @contextmanager
+    def lease(self):
+        """Pin the current retriever for the duration of a request"""
+        self.ensure_watcher()
+        with self.lock:
+            version = self.current
+            version.refs += 1
+        try:
+            yield version.retriever
+        finally:
+            with self.lock:
+                version.refs -= 1
+                close = version.retired and version.refs == 0
+                if close:
+                    self.draining.remove(version)
+            if close:
+                version.retriever.close()
+
+    def reload(self, wait: bool = False) -> bool:
+        """Load the index again in the background and swap it in; False if one is already running"""
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._reload, name="index-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self):
+        try:
+            start = time.perf_counter()
+            try:
+                new = self._load()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[!] Index reload failed, still serving {self.current.version}: {e}")
+                return
+            with self.lock:
+                old = self.current
+                # Query embeddings only depend on the model, so keep the warm cache
+                new.retriever.query_cache = old.retriever.query_cache
+                self.current = new
+                old.retired = True
+                close = old.refs == 0
+                if not close:
+                    self.draining.append(old)
+            if close:
+                old.retriever.close()
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload_seconds = time.perf_counter() - start
+            print(f"[✓] Index reloaded: {old.version} -> {new.version} in {self.last_reload_seconds:.2f}s")
+        finally:
+            self.reload_lock.release()
+
+    def request_reload(self) -> bool:
+        """Admin signal: reload here now, and touch the trigger so every other worker follows"""
+        os.makedirs(os.path.dirname(self.trigger_path) or ".", exist_ok=True)
+        with open(self.trigger_path, "a"):
+            os.utime(self.trigger_path)
+        # This process is reloading already; don't let its own watcher fire again
+        self.trigger_stamp = _stat_stamp(self.trigger_path)
+        return self.reload()
+
+    def ensure_watcher(self):
+        """Start the watch thread once per process (threads do not survive a fork)"""
+        if self.watcher_pid == os.getpid() or not self.watch_seconds:
+            return
+        with self.lock:
+            if self.watcher_pid == os.getpid():
+                return
+            self.watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name="index-watch", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_seconds)
+            trigger_stamp = _stat_stamp(self.trigger_path)
+            triggered = trigger_stamp is not None and trigger_stamp != self.trigger_stamp
+            self.trigger_stamp = trigger_stamp
+            stamp = index_stamp(self.index_path)
+            changed = stamp is not None and stamp != self.current.stamp
+            if triggered or changed:
+                self.reload()
+
+    def status(self) -> dict:
+        current = self.current
+        # Segments advance without a reload, so their version is read live
+        version = current.version if current.retriever.segments is None else index_version(current.retriever, self.index_path)
+        with self.lock:
+            draining = [{"version": version.version, "in_flight": version.refs} for version in self.draining]
+            in_flight = current.refs
+        return {
+            "index_path": self.index_path,
+            "version": version,
+            "vectors": int(current.retriever.index.ntotal),
+            "loaded_at": current.loaded_at,
+            "in_flight": in_flight,
+            "reloads": self.reloads,
+            "reloading": self.reload_lock.locked(),
+            "initial_load_seconds": round(self.initial_load_seconds, 3),
+            "last_reload_seconds": round(self.last_reload_seconds, 3) if self.last_reload_seconds is not None else None,
+            "last_error": self.last_error,
+            "draining": draining,
+        }
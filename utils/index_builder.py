@@ -1,37 +1,128 @@
 import os
 import json
+import threading
 import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+from utils.ann import DEFAULT_INDEX_TYPE, build_index
+from utils.embedding_store import EMBEDDING_STORE_DIR, EmbeddingStore, content_digest
+from utils.index_store import IndexStore, is_index_store
+from utils.registry import DEFAULT_MODEL_NAME, DEFAULT_SEGMENTS_DIR, DEFAULT_STORE_DIR, get_sentence_transformer
+from utils.segments import SegmentWriter, is_segmented_store
+
+MAX_DELTA_SEGMENTS = int(os.getenv("RBI_MAX_DELTA_SEGMENTS", "8"))
+# Deltas are folded into a rebuilt base once they hold this fraction of the base's vectors
+FULL_MERGE_RATIO = float(os.getenv("RBI_FULL_MERGE_RATIO", "0.1"))
+
 
 class IndexUpdater:
-    def __init__(self, index_path="data/faiss_index/rbi_index.faiss", metadata_path="data/faiss_index/metadata.json", model_name="all-MiniLM-L6-v2"):
-        self.index_path = index_path
-        self.metadata_path = metadata_path
-        self.model = SentenceTransformer(model_name)
-
-        # Load or initialize FAISS index
-        if os.path.exists(index_path):
-            self.index = faiss.read_index(index_path)
-        else:
-            self.index = faiss.IndexFlatL2(384)  # 384 for MiniLM
+    """
+    Appends documents to the segmented index read by VectorRetriever.
 
-        # Load metadata
-        if os.path.exists(metadata_path):
-            with open(metadata_path, "r", encoding="utf-8") as f:
-                self.metadata = json.load(f)
-        else:
-            self.metadata = []
+    Each add_documents call skips documents whose text is already indexed,
+    encodes only the rest and publishes them as a delta segment; nothing
+    already on disk is rewritten. When more
+    than max_deltas deltas pile up they are merged in a background thread:
+    into one delta, or, once they are large relative to the base, into a
+    rebuilt base of index_type.
+
+    The first run seeds the segments from base_store (or the legacy
+    index_path/metadata_path pair) if they exist.
+    """
+
+    def __init__(self, segments_dir=DEFAULT_SEGMENTS_DIR, model_name=DEFAULT_MODEL_NAME, index_type=DEFAULT_INDEX_TYPE,
+                 base_store=DEFAULT_STORE_DIR, index_path="data/faiss_index/rbi_index.faiss",
+                 metadata_path="data/faiss_index/metadata.json", max_deltas=MAX_DELTA_SEGMENTS,
+                 embedding_store_dir=EMBEDDING_STORE_DIR):
+        self.segments_dir = segments_dir
+        self.index_type = index_type
+        self.max_deltas = max_deltas
+        self.model = get_sentence_transformer(model_name)
+        # Documents re-scraped with unchanged text are not re-encoded
+        self.embeddings = EmbeddingStore(embedding_store_dir, model_name, self.model.get_sentence_embedding_dimension())
+        self.merge_thread = None
+        self._indexed = None
+
+        seeded = is_segmented_store(segments_dir)
+        self.writer = SegmentWriter(segments_dir)
+        if not seeded:
+            if is_index_store(base_store):
+                self.writer.adopt_store(base_store)
+                print(f"[+] Seeded {segments_dir} from {base_store}")
+            elif os.path.exists(index_path) and os.path.exists(metadata_path):
+                with open(metadata_path, "r", encoding="utf-8") as f:
+                    metadata = json.load(f)
+                self.writer.replace(faiss.read_index(index_path), metadata)
+                print(f"[+] Seeded {segments_dir} from {index_path}")
+
+    def indexed_digests(self) -> set:
+        """Content digests of every document in the published segments (read once, then kept up to date)"""
+        if self._indexed is None:
+            indexed = set()
+            for segment in self.writer.segments:
+                store = IndexStore(os.path.join(self.segments_dir, segment["name"]))
+                try:
+                    indexed.update(content_digest(record.get("content", "")) for record in store.metadata)
+                finally:
+                    store.close()
+            self._indexed = indexed
+        return self._indexed
 
     def add_documents(self, documents: list[dict]):
+        indexed = self.indexed_digests()
+        fresh, seen = [], set()
+        for doc in documents:
+            digest = content_digest(doc["content"])
+            if digest not in indexed and digest not in seen:
+                seen.add(digest)
+                fresh.append(doc)
+        if len(fresh) < len(documents):
+            print(f"[+] Skipped {len(documents) - len(fresh)} documents that are already indexed")
+        documents = fresh
+        if not documents:
+            return
         texts = [doc["content"] for doc in documents]
-        vectors = self.model.encode(texts)
-        self.index.add(np.array(vectors))
+        vectors = self.embeddings.encode(texts, lambda missing: self.model.encode(missing, convert_to_numpy=True))
+        if not self.writer.segments:
+            # Built from the first batch so IVF types can be trained on it
+            manifest = self.writer.replace(build_index(vectors, self.index_type), documents, vectors)
+        else:
+            manifest = self.writer.append(documents, vectors)
+        indexed.update(seen)
+        print(f"[✓] Published {len(documents)} documents; {manifest['count']} vectors "
+              f"in {len(manifest['segments'])} segments (embedding reuse {self.embeddings.stats()['reuse_ratio']:.1%})")
+        self.maybe_merge()
+
+    def maybe_merge(self):
+        """Start a background merge if there are too many delta segments"""
+        if self.merge_thread is not None and self.merge_thread.is_alive():
+            return
+        deltas = [segment for segment in self.writer.segments if segment["kind"] == "delta"]
+        if len(deltas) <= self.max_deltas:
+            return
+        self.merge_thread = threading.Thread(target=self.merge, name="segment-merge")
+        self.merge_thread.start()
+
+    def merge(self):
+        segments = self.writer.segments
+        base_count = sum(segment["count"] for segment in segments if segment["kind"] == "base")
+        delta_count = sum(segment["count"] for segment in segments if segment["kind"] == "delta")
+        try:
+            if not base_count or delta_count >= base_count * FULL_MERGE_RATIO:
+                names = [segment["name"] for segment in segments]
+                manifest = self.writer.merge(names, lambda vectors: build_index(vectors, self.index_type))
+            else:
+                names = [segment["name"] for segment in segments if segment["kind"] == "delta"]
+                manifest = self.writer.merge(names, self._flat_index)
+        except Exception as e:
+            print(f"[!] Segment merge failed: {e}")
+            return
+        print(f"[✓] Merged {len(names)} segments; {len(manifest['segments'])} remain")
 
-        # Extend metadata
-        self.metadata.extend(documents)
+    @staticmethod
+    def _flat_index(vectors):
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        return index
 
-        # Save
-        faiss.write_index(self.index, self.index_path)
-        with open(self.metadata_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, indent=2, ensure_ascii=False)
+    def wait_for_merge(self):
+        if self.merge_thread is not None:
+            self.merge_thread.join()
@@ -0,0 +1,284 @@
+"""
+Versioned on-disk index layout that workers open with mmap instead of unpickling.
+
+    <store_dir>/
+        manifest.json   format version, dimension, vector count, file names
+        index.faiss     the FAISS index (faiss.write_index)
+        vectors.f32     raw float32 vectors, row-major, count x dim
+        metadata.bin    one UTF-8 JSON record per chunk, concatenated
+        metadata.idx    uint64 byte offsets into metadata.bin, count + 1 entries
+        lexical.json    BM25 postings over the chunk contents (see utils.lexical)
+        terms.*, postings.*, impacts.f32
+        filters.json    section/date/URL columns for filtered search (see utils.filters)
+        sections.u8, dates.i32, url_order.u32
+
+Opening a store maps the files read-only, so cold start does not grow with
+the corpus and every worker shares the same pages through the OS cache.
+"""
+import json
+import mmap
+import os
+import shutil
+import time
+
+import faiss
+import numpy as np
+
+from utils.ann import search_parameters
+from utils.filters import FILTERS_FILE, FilterIndex, write_filter_index
+from utils.lexical import LexicalIndex, is_lexical_index, write_lexical_index
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.bin"
+OFFSETS_FILE = "metadata.idx"
+
+
+def is_index_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def write_index_store(store_dir: str, index, metadata: list[dict], vectors=None, lexical: bool = True) -> dict:
+    """
+    Write index, vectors and metadata into store_dir. The store is built in a
+    sibling temp directory, so readers never see a half-written store.
+
+    A new store_dir is that directory renamed into place. Replacing an
+    existing store goes through a symlink: store_dir points at a versioned
+    sibling (store_dir.v<ms>) and is swapped with os.replace, so it always
+    resolves to a complete store. The version it replaced is kept until the
+    next write, for readers still opening it. Only the first replacement of
+    a store written as a plain directory (or a platform without symlinks)
+    falls back to two renames, between which store_dir briefly does not exist.
+    """
+    if len(metadata) != index.ntotal:
+        raise ValueError(f"metadata has {len(metadata)} records but index has {index.ntotal} vectors")
+    parent = os.path.dirname(os.path.abspath(store_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    faiss.write_index(index, os.path.join(tmp_dir, INDEX_FILE))
+    if vectors is None:
+        if isinstance(index, faiss.IndexIVF):
+            # Needed for reconstruct_n; added after the index file is written
+            index.make_direct_map()
+        vectors = index.reconstruct_n(0, index.ntotal)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    vectors.tofile(os.path.join(tmp_dir, VECTORS_FILE))
+
+    offsets = np.zeros(len(metadata) + 1, dtype=np.uint64)
+    with open(os.path.join(tmp_dir, METADATA_FILE), "wb") as f:
+        position = 0
+        for i, record in enumerate(metadata):
+            data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+            f.write(data)
+            position += len(data)
+            offsets[i + 1] = position
+    offsets.tofile(os.path.join(tmp_dir, OFFSETS_FILE))
+    if lexical:
+        write_lexical_index(tmp_dir, (record.get("content", "") for record in metadata))
+    write_filter_index(tmp_dir, metadata)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "dim": int(vectors.shape[1]) if vectors.ndim == 2 else int(index.d),
+        "count": int(index.ntotal),
+        "index_type": type(index).__name__,
+        "created_at": time.time(),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    _swap_into_place(store_dir, tmp_dir)
+    return manifest
+
+
+def _swap_into_place(store_dir: str, tmp_dir: str):
+    store_dir = store_dir.rstrip("/\\")
+    if not os.path.lexists(store_dir):
+        os.replace(tmp_dir, store_dir)
+        return
+    version_dir = f"{store_dir}.v{time.time_ns() // 1_000_000}"
+    previous = os.path.realpath(store_dir) if os.path.islink(store_dir) else None
+    os.replace(tmp_dir, version_dir)
+    link = f"{store_dir}.link-{os.getpid()}"
+    try:
+        if os.path.lexists(link):
+            os.remove(link)
+        # Relative, so the store can be moved or mounted elsewhere as a whole
+        os.symlink(os.path.basename(version_dir), link, target_is_directory=True)
+    except OSError:
+        link = None
+    if link is not None and previous is not None:
+        os.replace(link, store_dir)
+    else:
+        # Plain directory (or no symlinks): two renames, once
+        old_dir = f"{store_dir}.old-{os.getpid()}"
+        os.replace(store_dir, old_dir)
+        if link is not None:
+            os.replace(link, store_dir)
+        else:
+            os.replace(version_dir, store_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    # Versions before the one just replaced have had a full write cycle to be opened
+    keep = {os.path.realpath(store_dir), previous}
+    parent, base = os.path.split(os.path.abspath(store_dir))
+    for name in os.listdir(parent or "."):
+        path = os.path.join(parent, name)
+        if name.startswith(f"{base}.v") and name[len(base) + 2:].isdigit() and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class MetadataStore:
+    """Read-only, offset-indexed view over metadata.bin; records are decoded on access."""
+
+    def __init__(self, store_dir: str, count: int):
+        self.count = count
+        self.offsets = np.memmap(os.path.join(store_dir, OFFSETS_FILE), dtype=np.uint64, mode="r", shape=(count + 1,))
+        self._file = open(os.path.join(store_dir, METADATA_FILE), "rb")
+        size = int(self.offsets[-1])
+        # mmap refuses zero-length files
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return json.loads(self._data[start:end])
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets[-1]) + self.offsets.nbytes
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class MmapFlatIndex:
+    """Exact L2 search straight over the memory-mapped vectors file, without copying it."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+        self.code_size = self.d * vectors.itemsize
+
+    def search(self, x, k, params=None, ids=None, block=65536):
+        """Exact top-k, over only the given (sorted) ids if ids is not None"""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if ids is None:
+            if self.ntotal == 0:
+                return _no_results(len(x), k)
+            return faiss.knn(x, self.vectors, k)
+        if not len(ids):
+            return _no_results(len(x), k)
+        # Gathered a block at a time, so a broad filter never copies the whole file
+        all_distances, all_indices = [], []
+        for start in range(0, len(ids), block):
+            block_ids = ids[start:start + block]
+            distances, indices = faiss.knn(x, np.ascontiguousarray(self.vectors[block_ids]), min(k, len(block_ids)))
+            all_distances.append(distances)
+            all_indices.append(np.where(indices >= 0, block_ids[np.maximum(indices, 0)], -1))
+        distances, indices = np.hstack(all_distances), np.hstack(all_indices)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances, indices = np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+        if distances.shape[1] < k:
+            pad = _no_results(len(x), k - distances.shape[1])
+            distances, indices = np.hstack([distances, pad[0]]), np.hstack([indices, pad[1]])
+        return distances, indices
+
+
+def _no_results(n, k):
+    return np.full((n, k), np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+
+
+def filtered_search(index, selection, x, k, nprobe=None, ef_search=None):
+    """Search index restricted to a filters.Selection"""
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    if not len(selection.ids):
+        return _no_results(len(x), k)
+    if isinstance(index, MmapFlatIndex):
+        return index.search(x, k, ids=selection.ids)
+    distances, indices = index.search(x, k, params=search_parameters(index, nprobe, ef_search, selection.selector))
+    if isinstance(index, faiss.IndexIVF) and (indices < 0).any() and len(selection.ids) > (indices >= 0).sum(axis=1).min():
+        # The probed lists held too few matching chunks; probe them all
+        distances, indices = index.search(x, k, params=search_parameters(index, index.nlist, ef_search, selection.selector))
+    return distances, indices
+
+
+class IndexStore:
+    """An opened store: .index, .metadata, .vectors and .lexical are all backed by mmap."""
+
+    def __init__(self, store_dir: str):
+        # Resolved once, so every file comes from the same version if store_dir is swapped meanwhile
+        store_dir = os.path.realpath(store_dir)
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        version = self.manifest.get("format_version")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported index store format {version} in {store_dir}")
+
+        count, dim = self.manifest["count"], self.manifest["dim"]
+        if count:
+            self.vectors = np.memmap(os.path.join(store_dir, VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.metadata = MetadataStore(store_dir, count)
+        # Stores written before the lexical index existed search dense-only
+        self.lexical = LexicalIndex(store_dir) if is_lexical_index(store_dir) else None
+        self._filters = None
+        self.index = self._open_index()
+
+    def _open_index(self):
+        if self.manifest.get("index_type") == "IndexFlatL2":
+            return MmapFlatIndex(self.vectors)
+        path = os.path.join(self.store_dir, INDEX_FILE)
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError:
+            # Index types without mmap support are read onto the heap
+            return faiss.read_index(path)
+
+    @property
+    def filters(self) -> FilterIndex:
+        if self._filters is None:
+            if os.path.isfile(os.path.join(self.store_dir, FILTERS_FILE)):
+                self._filters = FilterIndex.open(self.store_dir, self.metadata)
+            else:
+                print(f"[!] {self.store_dir} has no filter columns; building them from the metadata")
+                self._filters = FilterIndex.from_metadata(self.metadata)
+        return self._filters
+
+    def filter_masks(self, search_filter) -> list:
+        """Per-segment chunk masks for search_filter, aligned with the lexicons (None: no filter)"""
+        return [None if search_filter is None else self.filters.select(search_filter).mask]
+
+    def search(self, x, k, nprobe=None, ef_search=None, search_filter=None):
+        """(distances, indices); with search_filter only matching chunks are scored"""
+        if search_filter is None:
+            if isinstance(self.index, MmapFlatIndex):
+                return self.index.search(x, k)
+            return self.index.search(x, k, params=search_parameters(self.index, nprobe, ef_search))
+        return filtered_search(self.index, self.filters.select(search_filter), x, k, nprobe, ef_search)
+
+    def close(self):
+        """Release the metadata and lexicon mappings; vectors and index are unmapped when garbage collected"""
+        self.metadata.close()
+        if self.lexical is not None:
+            self.lexical.close()
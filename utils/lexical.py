@@ -0,0 +1,250 @@
+"""
+BM25 inverted index stored beside the vectors of an index store.
+
+    <store_dir>/
+        lexical.json    format version, document/term counts, avgdl, k1, b
+        terms.bin       vocabulary, sorted by UTF-8 bytes, concatenated
+        terms.idx       uint64 byte offsets into terms.bin, terms + 1 entries
+        postings.idx    uint64 offsets into the postings arrays, terms + 1 entries
+        postings.u32    document ids, per term ordered by impact (best first)
+        impacts.f32     BM25 term-frequency part of each posting
+
+Everything is opened with mmap and looked up by binary search, so opening is
+O(1) in vocabulary size. Impacts fold in tf and length normalisation
+against the segment's own average length; idf is applied at query time from
+the document frequencies of every segment searched, so deltas score on the
+same scale as the base. Postings are ordered by impact, so a query can stop
+reading the long lists of common terms once they can no longer change its
+top k (see bm25_search).
+"""
+import json
+import math
+import mmap
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+FORMAT_VERSION = 1
+LEXICAL_FILE = "lexical.json"
+TERMS_FILE = "terms.bin"
+TERM_OFFSETS_FILE = "terms.idx"
+POSTING_OFFSETS_FILE = "postings.idx"
+DOCS_FILE = "postings.u32"
+IMPACTS_FILE = "impacts.f32"
+
+BM25_K1 = float(os.getenv("RBI_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RBI_BM25_B", "0.75"))
+RRF_K = int(os.getenv("RBI_RRF_K", "60"))
+
+# Identifiers such as "RBI/2023-24/45", "DoR.FIN.REC.45/03.10.117" or "section 35A"
+# are kept whole, and their parts are indexed as well
+_TOKEN_RE = re.compile(r"[^\W_]+(?:[/.\-_][^\W_]+)*")
+_PART_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_RE.findall(token))
+    return tokens
+
+
+def is_lexical_index(store_dir: str) -> bool:
+    return os.path.isfile(os.path.join(store_dir, LEXICAL_FILE))
+
+
+def write_lexical_index(store_dir: str, texts, k1: float = BM25_K1, b: float = BM25_B) -> dict:
+    """Build the postings for texts (in document order) into store_dir"""
+    vocabulary = {}
+    term_ids, doc_ids, tfs = array("I"), array("I"), array("I")
+    lengths = array("I")
+    for doc, text in enumerate(texts):
+        counts = Counter(tokenize(text or ""))
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_ids.append(doc)
+            tfs.append(tf)
+
+    lengths = np.frombuffer(lengths, dtype=np.uint32).astype(np.float32)
+    avgdl = float(lengths.mean()) if len(lengths) and lengths.sum() else 1.0
+    term_ids = np.frombuffer(term_ids, dtype=np.uint32)
+    doc_ids = np.frombuffer(doc_ids, dtype=np.uint32)
+    tfs = np.frombuffer(tfs, dtype=np.uint32).astype(np.float32)
+    impacts = tfs * (k1 + 1) / (tfs + k1 * (1 - b + b * lengths[doc_ids] / avgdl))
+
+    terms = sorted(vocabulary, key=lambda term: term.encode("utf-8"))
+    rank = np.empty(len(terms), dtype=np.int64)
+    rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+    posting_terms = rank[term_ids]
+    order = np.lexsort((doc_ids, -impacts, posting_terms))
+
+    encoded = [term.encode("utf-8") for term in terms]
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    term_offsets[1:] = np.cumsum([len(term) for term in encoded])
+    posting_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    posting_offsets[1:] = np.cumsum(np.bincount(posting_terms, minlength=len(terms)))
+
+    with open(os.path.join(store_dir, TERMS_FILE), "wb") as f:
+        f.write(b"".join(encoded))
+    term_offsets.tofile(os.path.join(store_dir, TERM_OFFSETS_FILE))
+    posting_offsets.tofile(os.path.join(store_dir, POSTING_OFFSETS_FILE))
+    doc_ids[order].tofile(os.path.join(store_dir, DOCS_FILE))
+    impacts[order].astype(np.float32).tofile(os.path.join(store_dir, IMPACTS_FILE))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "count": len(lengths),
+        "terms": len(terms),
+        "postings": int(len(order)),
+        "avgdl": avgdl,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(store_dir, LEXICAL_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class _Terms:
+    """Sorted vocabulary as a sequence of bytes, for bisect"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+
+def _memmap(path, dtype, count):
+    # np.memmap refuses empty files
+    if not count:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class LexicalIndex:
+    def __init__(self, store_dir: str):
+        with open(os.path.join(store_dir, LEXICAL_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        version = self.manifest.get("format_version")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index format {version} in {store_dir}")
+        self.count = self.manifest["count"]
+        n_terms, n_postings = self.manifest["terms"], self.manifest["postings"]
+
+        self._file = open(os.path.join(store_dir, TERMS_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.terms = _Terms(self._data, _memmap(os.path.join(store_dir, TERM_OFFSETS_FILE), np.uint64, n_terms + 1))
+        self.posting_offsets = _memmap(os.path.join(store_dir, POSTING_OFFSETS_FILE), np.uint64, n_terms + 1)
+        self.docs = _memmap(os.path.join(store_dir, DOCS_FILE), np.uint32, n_postings)
+        self.impacts = _memmap(os.path.join(store_dir, IMPACTS_FILE), np.float32, n_postings)
+
+    def term_range(self, term: str):
+        """(start, end) of term's postings, or None if the term is not indexed"""
+        key = term.encode("utf-8")
+        i = bisect_left(self.terms, key)
+        if i == len(self.terms) or self.terms[i] != key:
+            return None
+        return int(self.posting_offsets[i]), int(self.posting_offsets[i + 1])
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self.terms.offsets.nbytes + self.posting_offsets.nbytes + \
+            self.docs.nbytes + self.impacts.nbytes
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def _top(ids, scores, k):
+    """The k highest-scoring (ids, scores), best first"""
+    if len(scores) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return ids[top], scores[top]
+
+
+def bm25_search(lexicons, offsets, query: str, k: int, masks=None):
+    """
+    Top-k BM25 over several lexical indexes whose documents start at the
+    given global offsets (None entries are skipped). masks, if given, holds
+    a boolean array per index of the documents allowed (None: all). Returns
+    (scores, ids), best first.
+
+    Terms are read whole, in decreasing order of the most they can add to a
+    score (idf x the first, largest impact of their lists). Reading stops
+    once the k-th score leads the (k+1)-th by more than all unread terms
+    together could add, so no document outside the top k can still enter
+    it. Identifier terms are rare, so queries usually stop before the long
+    lists of common words; ranks within the top k are then exact to within
+    that remaining bound.
+    """
+    masks = masks or [None] * len(lexicons)
+    searched = [(lexicon, offset, mask) for lexicon, offset, mask in zip(lexicons, offsets, masks) if lexicon is not None]
+    total = sum(lexicon.count for lexicon, _, _ in searched)
+    terms = []
+    for term in dict.fromkeys(tokenize(query)):
+        ranges = [(lexicon, offset, mask, lexicon.term_range(term)) for lexicon, offset, mask in searched]
+        ranges = [(lexicon, offset, mask, bounds) for lexicon, offset, mask, bounds in ranges if bounds is not None]
+        df = sum(end - start for _, _, _, (start, end) in ranges)
+        if df:
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            upper = idf * max(float(lexicon.impacts[start]) for lexicon, _, _, (start, _) in ranges)
+            terms.append((upper, idf, ranges))
+    if not terms:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    terms.sort(key=lambda term: term[0], reverse=True)
+
+    size = max(offset + lexicon.count for lexicon, offset, _ in searched)
+    accumulator = np.zeros(size, dtype=np.float32)
+    in_step = np.zeros(size, dtype=bool)
+    top_ids = np.zeros(0, dtype=np.int64)
+    remaining = sum(term[0] for term in terms)
+    for upper, idf, ranges in terms:
+        step = []
+        for lexicon, offset, mask, (start, end) in ranges:
+            docs, impacts = lexicon.docs[start:end], lexicon.impacts[start:end]
+            if mask is not None:
+                # Filtered out documents are never scored; df and idf stay corpus-wide
+                keep = mask[docs]
+                docs, impacts = docs[keep], impacts[keep]
+            docs = docs.astype(np.int64) + offset
+            accumulator[docs] += impacts * idf
+            step.append(docs)
+        step = np.concatenate(step)
+        remaining -= upper
+        # Scores only grow, so the new top k+1 is among the old one and the documents just scored
+        in_step[step] = True
+        candidates = np.concatenate([top_ids[~in_step[top_ids]], step])
+        in_step[step] = False
+        top_ids, top_scores = _top(candidates, accumulator[candidates], k + 1)
+        if len(top_ids) > k and top_scores[k - 1] > top_scores[k] + remaining:
+            break
+    top_ids, top_scores = top_ids[:k], top_scores[:k]
+    return top_scores, top_ids
+
+
+def reciprocal_rank_fusion(rankings, k: int, rrf_k: int = RRF_K) -> list[tuple[int, float]]:
+    """Fuse ranked id lists: score(id) = sum of 1 / (rrf_k + rank); returns the top k (id, score)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            fused[doc] = fused.get(doc, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,436 @@
+"""
+Resilient client in front of the LLM backend (Gemini or the local stub).
+
+Every call has a deadline (RBI_LLM_TIMEOUT) and holds one of
+RBI_LLM_MAX_CONCURRENCY slots for as long as the upstream call runs, even
+after the caller has given up on it, so a slow upstream cannot pile up
+unbounded work. Retryable failures (timeouts, 429/5xx, connection errors)
+are retried with full-jitter exponential backoff within the deadline.
+After RBI_LLM_BREAKER_FAILURES consecutive failures the circuit opens and
+calls fail fast for RBI_LLM_BREAKER_RESET seconds, then one trial call is
+let through. With RBI_LLM_HEDGE_AFTER set, a blocking call that has not
+answered by then is raced against a second one, when a slot is free.
+
+Streams are only retried before their first piece of text; after that a
+failure is passed on to the caller.
+"""
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+LLM_TIMEOUT = float(os.getenv("RBI_LLM_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("RBI_LLM_MAX_CONCURRENCY", "8"))
+LLM_RETRIES = int(os.getenv("RBI_LLM_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("RBI_LLM_BACKOFF", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("RBI_LLM_BACKOFF_MAX", "4"))
+LLM_HEDGE_AFTER = float(os.getenv("RBI_LLM_HEDGE_AFTER")) if os.getenv("RBI_LLM_HEDGE_AFTER") else None
+BREAKER_FAILURES = int(os.getenv("RBI_LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("RBI_LLM_BREAKER_RESET", "30"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"DeadlineExceeded", "ResourceExhausted", "ServiceUnavailable", "InternalServerError",
+                   "TooManyRequests", "GatewayTimeout", "BadGateway", "Aborted"}
+_DONE = object()
+# CircuitBreaker.allow() result for the caller that took the half-open trial
+TRIAL = "trial"
+
+
+class LLMError(Exception):
+    """Base class for failures the client reports instead of the backend's own"""
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """The circuit is open or every slot stayed busy until the deadline"""
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (LLMTimeout, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_NAMES:
+        return True
+    code = getattr(error, "code", None)
+    code = code() if callable(code) else code
+    return getattr(code, "value", code) in RETRYABLE_STATUS
+
+
+class LLMBackend:
+    """What LLMClient needs from a model: whole text, and text streamed blocking or async"""
+
+    name = "backend"
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout: float):
+        raise NotImplementedError
+
+    async def astream(self, prompt: str, timeout: float):
+        raise NotImplementedError
+        yield
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = "gemini-2.0-flash", api_key: str = None):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.getenv("GOOGLE_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, timeout):
+        return self.model.generate_content(prompt, request_options={"timeout": timeout}).text
+
+    def stream(self, prompt, timeout):
+        for chunk in self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout}):
+            if chunk.text:
+                yield chunk.text
+
+    async def astream(self, prompt, timeout):
+        response = await self.model.generate_content_async(prompt, stream=True, request_options={"timeout": timeout})
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend(LLMBackend):
+    """The deterministic offline model from utils.llm_stub, for load tests"""
+
+    name = "stub"
+
+    def __init__(self, model=None):
+        from utils.llm_stub import StubLLM
+        self.model = model or StubLLM()
+
+    def generate(self, prompt, timeout):
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt, timeout):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            yield chunk.text
+
+    async def astream(self, prompt, timeout):
+        async for chunk in await self.model.generate_content_async(prompt, stream=True):
+            yield chunk.text
+
+
+def get_backend(name: str) -> LLMBackend:
+    if name == "stub":
+        return StubBackend()
+    if name == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown LLM backend {name!r}; expected gemini or stub")
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """True while closed, TRIAL for the one call let through when half-open, else False"""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return TRIAL
+            return False
+
+    def release(self):
+        """
+        End a trial call that produced no verdict (no slot, or the caller went
+        away). Only the caller that got TRIAL from allow() may call this.
+        """
+        with self.lock:
+            self.trial_running = False
+
+    def record(self, success: bool):
+        with self.lock:
+            self.trial_running = False
+            if success:
+                self.consecutive = 0
+                self.opened_at = None
+                return
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                # A failed trial re-opens the circuit for another reset period
+                self.opened_at = time.monotonic()
+
+
+class LLMClient:
+    def __init__(self, backend: LLMBackend, timeout: float = LLM_TIMEOUT, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 retries: int = LLM_RETRIES, backoff: float = LLM_BACKOFF, backoff_max: float = LLM_BACKOFF_MAX,
+                 hedge_after: float = LLM_HEDGE_AFTER, breaker: CircuitBreaker = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        # One thread per slot: abandoned calls keep theirs until the backend returns
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self.stats_lock = threading.Lock()
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0,
+                         "rejected": 0, "failures": 0}
+
+    def _count(self, name: str, n: int = 1):
+        with self.stats_lock:
+            self.counters[name] += n
+
+    def _deadline(self, timeout):
+        return time.monotonic() + (self.timeout if timeout is None else timeout)
+
+    def _check_breaker(self) -> dict:
+        """Admit a new call; the returned dict tracks whether it holds the half-open trial"""
+        call = {"trial": False}
+        if not self._admit(call):
+            self._count("rejected")
+            raise LLMUnavailable(f"{self.backend.name} circuit is open after repeated failures")
+        return call
+
+    def _admit(self, call: dict) -> bool:
+        allowed = self.breaker.allow()
+        if allowed is TRIAL:
+            call["trial"] = True
+        return bool(allowed)
+
+    def _record(self, call: dict, success: bool):
+        # A verdict ends any trial, so this call no longer owns one
+        self.breaker.record(success)
+        call["trial"] = False
+
+    def _end_call(self, call: dict):
+        if call["trial"]:
+            call["trial"] = False
+            self.breaker.release()
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        """Sleep before retry number attempt; False if the deadline leaves no room for it"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        self._count("retries")
+        time.sleep(delay)
+        return True
+
+    def _acquire(self, deadline: float):
+        if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self._reject_busy()
+
+    def _reject_busy(self):
+        self._count("rejected")
+        raise LLMUnavailable(f"all {self.max_concurrency} {self.backend.name} slots stayed busy")
+
+    async def _aacquire(self, deadline: float):
+        """
+        _acquire() for coroutines. Polls instead of blocking a thread, so a
+        cancelled wait (e.g. the client disconnected) never takes a slot late.
+        """
+        delay = 0.002
+        while not self.slots.acquire(blocking=False):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._reject_busy()
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    def _submit(self, prompt: str, deadline: float):
+        """Run one backend call in a slot the caller already holds; the slot is freed when it ends"""
+        future = self.executor.submit(self.backend.generate, prompt, max(deadline - time.monotonic(), 0.001))
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def _attempt(self, prompt: str, deadline: float) -> str:
+        self._acquire(deadline)
+        futures = [self._submit(prompt, deadline)]
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after is not None else None
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                self._count("timeouts")
+                raise LLMTimeout(f"{self.backend.name} did not answer within the deadline")
+            wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+            done, _ = wait(futures, timeout=wake - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is not futures[0]:
+                        self._count("hedge_wins")
+                    return future.result()
+                futures.remove(future)
+                if not futures:
+                    raise error
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                # Only hedge with a spare slot; never queue behind other requests for it
+                if self.slots.acquire(blocking=False):
+                    self._count("hedges")
+                    futures.append(self._submit(prompt, deadline))
+
+    def generate(self, prompt: str, timeout: float = None) -> str:
+        """Text for prompt; raises LLMTimeout, LLMUnavailable or the backend's non-retryable error"""
+        self._count("calls")
+        deadline = self._deadline(timeout)
+        call = self._check_breaker()
+        try:
+            return self._generate(prompt, deadline, call)
+        finally:
+            self._end_call(call)
+
+    def _generate(self, prompt: str, deadline: float, call: dict) -> str:
+        attempt = 0
+        while True:
+            try:
+                text = self._attempt(prompt, deadline)
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                self._record(call, not retryable)
+                if not retryable:
+                    raise
+                self._count("failures")
+                if attempt >= self.retries or not self._backoff(attempt, deadline) or not self._admit(call):
+                    raise e if isinstance(e, LLMError) else LLMUnavailable(f"{self.backend.name} failed: {e}") from e
+                attempt += 1
+                continue
+            self._record(call, True)
+            return text
+
+    def stream(self, prompt: str, timeout: float = None):
+        """Yield text pieces; the deadline covers the whole stream"""
+        self._count("calls")
+        deadline = self._deadline(timeout)
+        call = self._check_breaker()
+        try:
+            yield from self._stream(prompt, deadline, call)
+        finally:
+            self._end_call(call)
+
+    def _stream(self, prompt: str, deadline: float, call: dict):
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for text in self._stream_attempt(prompt, deadline):
+                    started = True
+                    yield text
+                self._record(call, True)
+                return
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                self._record(call, not retryable)
+                if not retryable:
+                    raise
+                self._count("failures")
+                if started or attempt >= self.retries or not self._backoff(attempt, deadline) \
+                        or not self._admit(call):
+                    raise e if isinstance(e, LLMError) else LLMUnavailable(f"{self.backend.name} failed: {e}") from e
+                attempt += 1
+
+    def _stream_attempt(self, prompt: str, deadline: float):
+        self._acquire(deadline)
+        pieces = queue.Queue()
+
+        def pump():
+            try:
+                for text in self.backend.stream(prompt, max(deadline - time.monotonic(), 0.001)):
+                    pieces.put(text)
+                pieces.put(_DONE)
+            except Exception as e:
+                pieces.put(e)
+            finally:
+                self.slots.release()
+
+        self.executor.submit(pump)
+        while True:
+            try:
+                item = pieces.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                self._count("timeouts")
+                raise LLMTimeout(f"{self.backend.name} stream stalled past the deadline") from None
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def astream(self, prompt: str, timeout: float = None):
+        """Async version of stream(); waits on the event loop instead of a thread"""
+        self._count("calls")
+        deadline = self._deadline(timeout)
+        call = self._check_breaker()
+        try:
+            async for text in self._astream(prompt, deadline, call):
+                yield text
+        finally:
+            self._end_call(call)
+
+    async def _astream(self, prompt: str, deadline: float, call: dict):
+        attempt = 0
+        while True:
+            started = False
+            try:
+                await self._aacquire(deadline)
+                try:
+                    pieces = self.backend.astream(prompt, max(deadline - time.monotonic(), 0.001)).__aiter__()
+                    while True:
+                        try:
+                            text = await asyncio.wait_for(pieces.__anext__(), max(deadline - time.monotonic(), 0))
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            self._count("timeouts")
+                            raise LLMTimeout(f"{self.backend.name} stream stalled past the deadline") from None
+                        started = True
+                        yield text
+                finally:
+                    self.slots.release()
+                self._record(call, True)
+                return
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                self._record(call, not retryable)
+                if not retryable:
+                    raise
+                self._count("failures")
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+                if started or attempt >= self.retries or time.monotonic() + delay >= deadline \
+                        or not self._admit(call):
+                    raise e if isinstance(e, LLMError) else LLMUnavailable(f"{self.backend.name} failed: {e}") from e
+                self._count("retries")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            counters = dict(self.counters)
+        return {"backend": self.backend.name, "circuit": self.breaker.state, **counters}
@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import os
+import time
+
+# Simulated latency; 0 measures the rest of the pipeline on its own
+STUB_FIRST_TOKEN_MS = float(os.getenv("RBI_STUB_FIRST_TOKEN_MS", "300"))
+STUB_TOKEN_MS = float(os.getenv("RBI_STUB_TOKEN_MS", "15"))
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    """
+    Deterministic, offline stand-in for genai.GenerativeModel used for load
+    tests. It answers from the prompt itself and simulates time-to-first-token
+    and per-token latency, in both blocking and asyncio flavours.
+    """
+
+    def __init__(self, first_token_ms: float = STUB_FIRST_TOKEN_MS, token_ms: float = STUB_TOKEN_MS,
+                 answer_words: int = 60):
+        self.first_token = first_token_ms / 1000
+        self.per_token = token_ms / 1000
+        self.answer_words = answer_words
+
+    def _tokens(self, prompt: str) -> list[str]:
+        query = prompt.rsplit("Query:", 1)[-1].strip().splitlines()[0] if "Query:" in prompt else ""
+        context_words = prompt.split("Context:", 1)[-1].split("Query:", 1)[0].split()
+        digest = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8]
+        words = [f"[stub:{digest}]", "Answer", "to", f"'{query}':"]
+        words += context_words[: max(self.answer_words - len(words), 0)]
+        return [word + " " for word in words]
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        tokens = self._tokens(prompt)
+        if stream:
+            return self._stream(tokens)
+        time.sleep(self.first_token + self.per_token * len(tokens))
+        return StubResponse("".join(tokens))
+
+    def _stream(self, tokens):
+        time.sleep(self.first_token)
+        for token in tokens:
+            time.sleep(self.per_token)
+            yield StubResponse(token)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        tokens = self._tokens(prompt)
+        if stream:
+            return self._astream(tokens)
+        await asyncio.sleep(self.first_token + self.per_token * len(tokens))
+        return StubResponse("".join(tokens))
+
+    async def _astream(self, tokens):
+        await asyncio.sleep(self.first_token)
+        for token in tokens:
+            await asyncio.sleep(self.per_token)
+            yield StubResponse(token)
@@ -0,0 +1,154 @@
+"""
+Per-stage latency histograms, Prometheus text exposition and sampled
+request logs.
+
+    with span("encode", timings):
+        vector = encode(query)
+
+records the stage in rbi_stage_seconds{stage="encode"} and, when a timings
+dict is passed, its milliseconds under "encode_ms". Stages: encode, search
+(ANN), bm25, lookup (fusion and metadata), rerank, prompt, llm and
+llm_first_token. Whole requests go to rbi_request_seconds{route,status}.
+
+Metrics live in the process: with several workers each one serves its own
+/api/metrics, so scrape them per worker or run one worker per port.
+
+Request logs are one JSON object per line on the "rbi.requests" logger.
+RBI_LOG_SAMPLE_RATE of requests are logged; errors and requests slower
+than RBI_SLOW_REQUEST_MS always are.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LOG_SAMPLE_RATE = float(os.getenv("RBI_LOG_SAMPLE_RATE", "0.1"))
+SLOW_REQUEST_MS = float(os.getenv("RBI_SLOW_REQUEST_MS", "5000"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+_lock = threading.Lock()
+
+request_log = logging.getLogger("rbi.requests")
+if not request_log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_log.addHandler(_handler)
+    request_log.setLevel(logging.INFO)
+    request_log.propagate = False
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        with _lock:
+            _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        slot = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self.series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("rbi_stage_seconds", "Time spent in one pipeline stage.", labels=("stage",))
+REQUEST_SECONDS = Histogram("rbi_request_seconds", "Time to respond to an API request.", labels=("route", "status"))
+
+
+def register_collector(collect):
+    """
+    collect() returns [(name, type, help, [(labels dict, value)])], read at
+    scrape time; for counters and gauges kept elsewhere (caches, LLM client)
+    """
+    with _lock:
+        _collectors.append(collect)
+
+
+def observe_stage(stage: str, seconds: float, timings: dict = None):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if timings is not None:
+        timings[f"{stage}_ms"] = round(seconds * 1000, 3)
+
+
+@contextmanager
+def span(stage: str, timings: dict = None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, timings)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format"""
+    with _lock:
+        metrics, collectors = list(_metrics), list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collect in collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"[!] Metrics collector failed: {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def log_request(route: str, status: int, seconds: float, **fields):
+    """Record the request in rbi_request_seconds and, if sampled, log it as one JSON line"""
+    REQUEST_SECONDS.observe(seconds, route=route, status=status)
+    ms = seconds * 1000
+    if status < 400 and ms < SLOW_REQUEST_MS and random.random() >= LOG_SAMPLE_RATE:
+        return
+    record = {"ts": round(time.time(), 3), "route": route, "status": status, "ms": round(ms, 3), **fields}
+    request_log.info(json.dumps(record, ensure_ascii=False, default=str))
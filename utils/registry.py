@@ -0,0 +1,228 @@
+import gc
+import os
+import sys
+import threading
+import time
+
+DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+DEFAULT_PKL_PATH = "data/faiss_index/faiss_index.pkl"
+DEFAULT_STORE_DIR = "data/faiss_index/store"
+DEFAULT_SEGMENTS_DIR = "data/faiss_index/segments"
+# Segments (which take incremental updates) are preferred, then the single
+# mmap store; the pickle is only read when neither exists
+if os.path.isdir(DEFAULT_SEGMENTS_DIR):
+    DEFAULT_INDEX_PATH = DEFAULT_SEGMENTS_DIR
+elif os.path.isdir(DEFAULT_STORE_DIR):
+    DEFAULT_INDEX_PATH = DEFAULT_STORE_DIR
+else:
+    DEFAULT_INDEX_PATH = DEFAULT_PKL_PATH
+
+# How the query-time encoder runs: fp32 (as trained), qint8 (dynamically
+# quantized Linear layers) or onnx (ONNX Runtime, RBI_ONNX_FILE picks e.g. a
+# quantized export). Index builds always encode documents in fp32.
+ENCODER_MODES = ("fp32", "qint8", "onnx")
+QUERY_ENCODER_MODE = os.getenv("RBI_QUERY_ENCODER", "fp32")
+ONNX_FILE = os.getenv("RBI_ONNX_FILE")
+
+# One lock guards both tables; it is re-entrant because building a retriever
+# asks the registry for its embedding model while the lock is already held.
+_lock = threading.RLock()
+_models = {}
+_embedders = {}
+_index_handles = {}
+_rerankers = {}
+_query_caches = {}
+# model name -> (monotonic time, message) of the last failed load
+_reranker_failures = {}
+
+
+def _model_key(model_name: str, mode: str) -> str:
+    return model_name if mode == "fp32" else f"{model_name}@{mode}"
+
+
+def _load_sentence_transformer(model_name: str, mode: str):
+    from sentence_transformers import SentenceTransformer
+    if mode == "fp32":
+        return SentenceTransformer(model_name)
+    if mode == "qint8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        # int8 weights, activations quantized on the fly; CPU only
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if mode == "onnx":
+        # Needs sentence-transformers>=3.2 with optimum[onnxruntime]
+        model_kwargs = {"file_name": ONNX_FILE} if ONNX_FILE else None
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+    raise ValueError(f"Unknown encoder mode {mode!r}; expected one of {ENCODER_MODES}")
+
+
+def get_sentence_transformer(model_name: str = DEFAULT_MODEL_NAME, mode: str = "fp32"):
+    """Return the process-wide SentenceTransformer for (model_name, mode), loading it on first use."""
+    key = _model_key(model_name, mode)
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = _load_sentence_transformer(model_name, mode)
+                _models[key] = model
+    return model
+
+
+def get_embedding_model(model_name: str = DEFAULT_MODEL_NAME, mode: str = QUERY_ENCODER_MODE):
+    """Return the process-wide EmbeddingModel (and its micro-batcher) for (model_name, mode)."""
+    key = _model_key(model_name, mode)
+    embedder = _embedders.get(key)
+    if embedder is None:
+        with _lock:
+            embedder = _embedders.get(key)
+            if embedder is None:
+                from utils.embeddings import EmbeddingModel
+                embedder = EmbeddingModel(model_name, mode)
+                _embedders[key] = embedder
+    return embedder
+
+
+def get_query_cache(model_name: str = DEFAULT_MODEL_NAME, mode: str = QUERY_ENCODER_MODE):
+    """
+    Return the process-wide query-embedding LRUCache for (model_name, mode).
+    Query vectors only depend on the encoder, so every retriever (including
+    the ones a hot reload builds) shares it and it is saved once at exit.
+    """
+    key = _model_key(model_name, mode)
+    cache = _query_caches.get(key)
+    if cache is None:
+        with _lock:
+            cache = _query_caches.get(key)
+            if cache is None:
+                from utils.cache import LRUCache
+                from utils.retriever import QUERY_CACHE_PATH, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+                cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_PATH)
+                _query_caches[key] = cache
+    return cache
+
+
+def get_reranker(model_name: str = None):
+    """Return the process-wide cross-encoder Reranker, loading it on first use."""
+    from utils.rerank import RERANK_MODEL_NAME, RERANK_RETRY_SECONDS, Reranker, RerankerUnavailable
+    model_name = model_name or RERANK_MODEL_NAME
+    reranker = _rerankers.get(model_name)
+    if reranker is None:
+        with _lock:
+            reranker = _rerankers.get(model_name)
+            if reranker is None:
+                # A failed load is not retried on every request (hub retries, no budget check yet)
+                failed = _reranker_failures.get(model_name)
+                if failed is not None and time.monotonic() - failed[0] < RERANK_RETRY_SECONDS:
+                    raise RerankerUnavailable(failed[1])
+                try:
+                    reranker = Reranker(model_name)
+                except Exception as e:
+                    _reranker_failures[model_name] = (time.monotonic(), f"{model_name}: {e}")
+                    print(f"[!] Could not load reranker {model_name}, retrying in {RERANK_RETRY_SECONDS:.0f}s: {e}")
+                    raise RerankerUnavailable(f"{model_name}: {e}") from e
+                _reranker_failures.pop(model_name, None)
+                _rerankers[model_name] = reranker
+    return reranker
+
+
+def get_index_handle(index_path: str = DEFAULT_INDEX_PATH, model_name: str = DEFAULT_MODEL_NAME):
+    """Return the process-wide hot-reloadable handle for index_path, loading it on first use."""
+    key = (index_path, model_name)
+    handle = _index_handles.get(key)
+    if handle is None:
+        with _lock:
+            handle = _index_handles.get(key)
+            if handle is None:
+                from utils.hot_reload import ReloadableRetriever
+                handle = ReloadableRetriever(index_path, model_name)
+                _index_handles[key] = handle
+    return handle
+
+
+def get_retriever(index_path: str = DEFAULT_INDEX_PATH, model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Return the current VectorRetriever for index_path. Request handlers should
+    use lease_retriever() instead, so a hot reload cannot close it mid-request.
+    """
+    return get_index_handle(index_path, model_name).retriever
+
+
+def lease_retriever(index_path: str = DEFAULT_INDEX_PATH, model_name: str = DEFAULT_MODEL_NAME):
+    """Context manager pinning the current VectorRetriever for one request."""
+    return get_index_handle(index_path, model_name).lease()
+
+
+def preload(index_path: str = DEFAULT_INDEX_PATH, model_name: str = DEFAULT_MODEL_NAME):
+    """
+    Load the retriever in the current (master) process before workers fork.
+    Freezing the GC afterwards keeps the collector from touching these objects,
+    so their pages stay shared copy-on-write between forked workers.
+    """
+    retriever = get_retriever(index_path, model_name)
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    return retriever
+
+
+def model_nbytes(model) -> int:
+    """Bytes held by a torch model's parameters and buffers (including dynamically quantized weights)."""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    # quantize_dynamic moves Linear weights into packed params, outside parameters()
+    for module in model.modules() if hasattr(model, "modules") else ():
+        packed = getattr(module, "_packed_params", None)
+        if packed is not None and hasattr(module, "weight"):
+            weight = module.weight()
+            total += weight.numel() * weight.element_size()
+            bias = module.bias()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return total
+
+
+def index_nbytes(index) -> int:
+    """Approximate bytes held by a FAISS index's stored codes."""
+    if hasattr(index, "nbytes"):
+        # SegmentView: sum over its segments
+        return int(index.nbytes)
+    code_size = getattr(index, "code_size", None)
+    if code_size:
+        return int(index.ntotal) * int(code_size)
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def metadata_nbytes(metadata) -> int:
+    """Shallow estimate of the bytes held by the chunk metadata list."""
+    if hasattr(metadata, "nbytes"):
+        # Memory-mapped MetadataStore: size of the mapped files
+        return int(metadata.nbytes)
+    total = sys.getsizeof(metadata)
+    for item in metadata:
+        total += sys.getsizeof(item)
+        for value in item.values():
+            total += sys.getsizeof(value)
+    return total
+
+
+def memory_report() -> dict:
+    """Bytes used by every model and index loaded in this process."""
+    with _lock:
+        models = dict(_models)
+        models.update({f"rerank:{name}": reranker.model.model for name, reranker in _rerankers.items()})
+        retrievers = {key: handle.retriever for key, handle in _index_handles.items()}
+    return {
+        "models": {name: model_nbytes(model) for name, model in models.items()},
+        "indexes": {
+            path: {
+                "index_bytes": index_nbytes(retriever.index),
+                "metadata_bytes": metadata_nbytes(retriever.metadata),
+                "vectors": int(retriever.index.ntotal),
+                "memory_mapped": retriever.store is not None or retriever.segments is not None,
+            }
+            for (path, _), retriever in retrievers.items()
+        },
+    }
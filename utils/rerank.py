@@ -0,0 +1,100 @@
+"""
+Optional cross-encoder rerank of the retrieved candidates.
+
+The retriever over-fetches RERANK_CANDIDATES chunks and the cross-encoder
+scores (query, chunk) pairs in batches. The per-request budget is checked
+up front and before every batch against the measured cost per pair. When
+the rest cannot finish in time, the request falls back to the dense (or
+fused) order, so reranking adds little more than RERANK_BUDGET_MS.
+"""
+import os
+import threading
+import time
+
+RERANK_ENABLED = os.getenv("RBI_RERANK", "0") == "1"
+RERANK_MODEL_NAME = os.getenv("RBI_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RBI_RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RBI_RERANK_BUDGET_MS", "150"))
+RERANK_BATCH_SIZE = int(os.getenv("RBI_RERANK_BATCH", "8"))
+RERANK_MAX_LENGTH = int(os.getenv("RBI_RERANK_MAX_LENGTH", "256"))
+# Chunks scoring below this are dropped (the best one is always kept); unset keeps top_k
+RERANK_MIN_SCORE = float(os.getenv("RBI_RERANK_MIN_SCORE")) if os.getenv("RBI_RERANK_MIN_SCORE") else None
+# After a failed model load, requests skip reranking this long before loading is tried again
+RERANK_RETRY_SECONDS = float(os.getenv("RBI_RERANK_RETRY_SECONDS", "600"))
+
+
+class RerankerUnavailable(RuntimeError):
+    """The cross-encoder failed to load recently; already logged by utils.registry"""
+
+
+class Reranker:
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        # Seconds per pair, smoothed over recent batches; None until the first batch
+        self.pair_seconds = None
+        self.requests = 0
+        self.fallbacks = 0
+        self._warm_up()
+
+    def _warm_up(self):
+        """One full batch at load, so the first request already has a cost estimate"""
+        pairs = [("warm up query", "warm up passage " * 32)] * self.batch_size
+        start = time.perf_counter()
+        self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        self._observe(time.perf_counter() - start, len(pairs))
+
+    def _observe(self, seconds: float, pairs: int):
+        per_pair = seconds / pairs
+        with self.lock:
+            self.pair_seconds = per_pair if self.pair_seconds is None else 0.5 * self.pair_seconds + 0.5 * per_pair
+
+    def rerank(self, query: str, chunks: list[dict], top_k: int, budget_ms: float = RERANK_BUDGET_MS,
+               min_score: float = RERANK_MIN_SCORE):
+        """
+        (chunks, reranked): the best top_k chunks by cross-encoder score, or
+        the first top_k in their incoming order if the budget ran out.
+        """
+        self.requests += 1
+        if len(chunks) <= 1:
+            return chunks[:top_k], False
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000
+        if self.pair_seconds is not None and self.pair_seconds * len(chunks) > budget_ms / 1000:
+            # Would not finish in time: spend no CPU on it. The estimate decays so
+            # that reranking is tried again once the machine is less loaded.
+            with self.lock:
+                self.pair_seconds *= 0.9
+            self.fallbacks += 1
+            return chunks[:top_k], False
+        # Longest first, as in the bulk embedder: batches of similar length pad less
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]["content"]), reverse=True)
+        scores = [None] * len(chunks)
+        for batch_start in range(0, len(order), self.batch_size):
+            batch = order[batch_start:batch_start + self.batch_size]
+            now = time.perf_counter()
+            if self.pair_seconds is not None and now + self.pair_seconds * len(batch) > deadline:
+                self.fallbacks += 1
+                return chunks[:top_k], False
+            pairs = [(query, chunks[i]["content"]) for i in batch]
+            batch_scores = self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            self._observe(time.perf_counter() - now, len(pairs))
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+
+        ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)[:top_k]
+        if min_score is not None:
+            ranked = ranked[:1] + [i for i in ranked[1:] if scores[i] >= min_score]
+        return [dict(chunks[i], rerank_score=scores[i]) for i in ranked], True
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+            "ms_per_pair": round(self.pair_seconds * 1000, 3) if self.pair_seconds is not None else None,
+        }
@@ -1,28 +1,240 @@
+import os
 import pickle
-from sentence_transformers import SentenceTransformer
+from contextlib import contextmanager
+import numpy as np
+from utils.ann import search_parameters
+from utils.cache import normalize_query
+from utils.filters import FilterIndex, SearchFilter
+from utils.index_store import IndexStore, filtered_search, is_index_store
+from utils.lexical import bm25_search, reciprocal_rank_fusion
+from utils.metrics import span
+from utils.registry import DEFAULT_INDEX_PATH, DEFAULT_MODEL_NAME, get_embedding_model, get_query_cache, get_reranker
+from utils.rerank import RERANK_CANDIDATES, RERANK_ENABLED, RerankerUnavailable
+from utils.segments import SegmentedIndex, is_segmented_store
+
+QUERY_CACHE_SIZE = int(os.getenv("RBI_QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("RBI_QUERY_CACHE_TTL", "86400"))
+QUERY_CACHE_PATH = os.getenv("RBI_QUERY_CACHE_PATH")  # unset: memory only
+# Fuse dense results with BM25 over the stores' lexical indexes
+HYBRID_SEARCH = os.getenv("RBI_HYBRID_SEARCH", "1") != "0"
+# Candidates taken from each of the dense and BM25 lists before fusion
+HYBRID_CANDIDATES = int(os.getenv("RBI_HYBRID_CANDIDATES", "20"))
+
+# Chunk metadata passed through to results, for the context packer and citations
+RESULT_FIELDS = ("title", "url", "source_row", "chunk_index", "start", "end", "section", "date")
+
+
+class _PickledIndex:
+    """Legacy in-memory index with the search interface of IndexStore / SegmentView"""
+
+    def __init__(self, index, metadata):
+        self.index = index
+        self.metadata = metadata
+        self._filters = None
+
+    @property
+    def filters(self) -> FilterIndex:
+        if self._filters is None:
+            self._filters = FilterIndex.from_metadata(self.metadata)
+        return self._filters
+
+    def filter_masks(self, search_filter) -> list:
+        return []
+
+    def search(self, x, k, nprobe=None, ef_search=None, search_filter=None):
+        if search_filter is not None:
+            return filtered_search(self.index, self.filters.select(search_filter), x, k, nprobe, ef_search)
+        # nprobe/efSearch only apply to IVF/HNSW indexes
+        return self.index.search(x, k, params=search_parameters(self.index, nprobe, ef_search))
+
 
 class VectorRetriever:
-    def __init__(self, pkl_path="data/faiss_index/faiss_index.pkl"):
-        with open(pkl_path, "rb") as f:
-            data = pickle.load(f)
-        
-        self.index = data["index"]
-        self.metadata = data["metadata"]
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-
-    def retrieve(self, query, top_k=4):
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, model_name=DEFAULT_MODEL_NAME):
+        self.store = None
+        self.segments = None
+        if is_segmented_store(index_path):
+            # Base + delta segments; new deltas are picked up on the fly
+            self.segments = SegmentedIndex(index_path)
+        elif is_index_store(index_path):
+            # Memory-mapped store: opening is O(1) in corpus size
+            self.store = IndexStore(index_path)
+            self._index = self.store.index
+            self._metadata = self.store.metadata
+        else:
+            # Legacy pickled {"index", "metadata"} blob
+            with open(index_path, "rb") as f:
+                data = pickle.load(f)
+            self._index = data["index"]
+            self._metadata = data["metadata"]
+            self._pickled = _PickledIndex(self._index, self._metadata)
+        # Shared with every other retriever/embedder in this process
+        self.embedder = get_embedding_model(model_name)
+        self.model = self.embedder.model
+        # Query embeddings only depend on the model, so they survive index rebuilds
+        self.query_cache = get_query_cache(model_name)
+
+    @property
+    def index(self):
+        return self.segments.current() if self.segments is not None else self._index
+
+    @property
+    def metadata(self):
+        return self.segments.current().metadata if self.segments is not None else self._metadata
+
+    @contextmanager
+    def _snapshot(self):
+        """
+        (searcher, metadata, lexicons, offsets) of one consistent version of
+        the index; segments merged away meanwhile stay open until the block exits
+        """
+        if self.segments is not None:
+            with self.segments.lease() as view:
+                yield view, view.metadata, view.lexicons, view.metadata.offsets
+        elif self.store is not None:
+            yield self.store, self._metadata, [self.store.lexical], [0]
+        else:
+            yield self._pickled, self._metadata, [], [0]
+
+    def search(self, query_matrix, top_k, nprobe=None, ef_search=None, filters=None):
+        """
+        (distances, indices, metadata) from one consistent snapshot of the index.
+        Read the metadata promptly: after a merge its old segments are closed.
+        """
+        with self._snapshot() as (searcher, metadata, _, _):
+            distances, indices = searcher.search(query_matrix, top_k, nprobe, ef_search,
+                                                 SearchFilter.from_dict(filters))
+        return distances, indices, metadata
+
+    def _retrieve(self, queries, query_matrix, top_k, nprobe, ef_search, hybrid, filters, timings=None):
+        with self._snapshot() as (searcher, metadata, lexicons, offsets):
+            search_filter = SearchFilter.from_dict(filters)
+            hybrid = HYBRID_SEARCH if hybrid is None else hybrid
+            if not hybrid or all(lexicon is None for lexicon in lexicons):
+                with span("search", timings):
+                    distances, indices = searcher.search(query_matrix, top_k, nprobe, ef_search, search_filter)
+                with span("lookup", timings):
+                    return [self._results(distances[i], indices[i], metadata) for i in range(len(queries))]
+
+            candidates = max(top_k, HYBRID_CANDIDATES)
+            with span("search", timings):
+                distances, indices = searcher.search(query_matrix, candidates, nprobe, ef_search, search_filter)
+            masks = searcher.filter_masks(search_filter)
+            results = []
+            for i, query in enumerate(queries):
+                with span("bm25", timings):
+                    bm25_scores, bm25_ids = bm25_search(lexicons, offsets, query, candidates, masks)
+                with span("lookup", timings):
+                    dense = {int(idx): float(distance) for idx, distance in zip(indices[i], distances[i]) if idx >= 0}
+                    bm25 = dict(zip(bm25_ids.tolist(), bm25_scores.tolist()))
+                    fused = reciprocal_rank_fusion([list(dense), list(bm25)], top_k)
+                    results.append(self._fused_results(fused, dense, bm25, metadata))
+            return results
+
+    def close(self):
+        """Release memory-mapped files; only call once no request is using this retriever"""
+        if self.store is not None:
+            self.store.close()
+        if self.segments is not None:
+            self.segments.close()
+
+    def encode_query(self, query):
+        """Embed a single query, skipping the transformer for repeated questions."""
+        # MiniLM is uncased, so the normalised key embeds to the same vector
+        key = normalize_query(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            # Micro-batched with concurrent requests from other threads
+            vector = self.embedder.encode_queries([key])
+            self.query_cache.put(key, vector)
+        return vector
+
+    def retrieve(self, query, top_k=4, nprobe=None, ef_search=None, hybrid=None, filters=None, rerank=None,
+                 timings=None, return_vector=False):
+        """
+        Top-k chunks for query. filters (a SearchFilter or a dict with section(s),
+        url_prefix, date_from, date_to) is applied inside the search, so up to
+        top_k matching chunks come back without over-fetching. With rerank
+        (default RBI_RERANK) RERANK_CANDIDATES are fetched and reordered by the
+        cross-encoder. A timings dict, if passed, receives per-stage milliseconds
+        (encode, search, bm25, lookup, rerank; see utils.metrics). With
+        return_vector, (chunks, query_vector) is returned, so callers that need
+        the vector do not look it up (and count a cache hit) again.
+        """
+        rerank = RERANK_ENABLED if rerank is None else rerank
         # Encode the query to vector
-        query_vector = self.model.encode([query])
-        
-        # Search the index
-        distances, indices = self.index.search(query_vector, top_k)
+        with span("encode", timings):
+            query_vector = self.encode_query(query)
+
+        # Search the index (and the BM25 postings, unless hybrid is off)
+        fetch = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+        chunks = self._retrieve([query], query_vector, fetch, nprobe, ef_search, hybrid, filters, timings)[0]
+        if rerank:
+            chunks = self._rerank(query, chunks, top_k, timings)
+        return (chunks, query_vector) if return_vector else chunks
+
+    def _rerank(self, query, chunks, top_k, timings):
+        with span("rerank", timings):
+            try:
+                chunks, reranked = get_reranker().rerank(query, chunks, top_k)
+            except RerankerUnavailable:
+                chunks, reranked = chunks[:top_k], False
+            except Exception as e:
+                # A missing or broken cross-encoder must not fail the request
+                print(f"[!] Rerank failed, keeping retrieval order: {e}")
+                chunks, reranked = chunks[:top_k], False
+        if timings is not None:
+            timings["reranked"] = reranked
+        return chunks
+
+    def retrieve_batch(self, queries, top_k=4, nprobe=None, ef_search=None, hybrid=None, filters=None, rerank=None):
+        """Retrieve for many queries with one encode call and one multi-query search."""
+        rerank = RERANK_ENABLED if rerank is None else rerank
+        if not queries:
+            return []
+        keys = [normalize_query(query) for query in queries]
+        vectors = [self.query_cache.get(key) for key in keys]
+        missing = sorted({key for key, vector in zip(keys, vectors) if vector is None})
+        if missing:
+            with span("encode"):
+                encoded = dict(zip(missing, self.model.encode(missing, show_progress_bar=False, convert_to_numpy=True)))
+            for key, vector in encoded.items():
+                self.query_cache.put(key, vector[None, :])
+            vectors = [vector if vector is not None else encoded[key][None, :] for key, vector in zip(keys, vectors)]
+        query_matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+
+        if not rerank:
+            return self._retrieve(queries, query_matrix, top_k, nprobe, ef_search, hybrid, filters)
+        fetched = self._retrieve(queries, query_matrix, max(top_k, RERANK_CANDIDATES), nprobe, ef_search, hybrid, filters)
+        # Each query gets its own latency budget
+        return [self._rerank(query, chunks, top_k, None) for query, chunks in zip(queries, fetched)]
+
+    def _results(self, distances, indices, metadata):
+        results = []
+        for i, idx in enumerate(indices):
+            if 0 <= idx < len(metadata):
+                chunk = metadata[idx]
+                results.append({
+                    "id": chunk.get("id", int(idx)),
+                    "content": chunk["content"],
+                    "score": float(distances[i]),
+                    "source": chunk.get("source", ""),
+                    **{field: chunk[field] for field in RESULT_FIELDS if field in chunk}
+                })
+        return results
 
+    def _fused_results(self, fused, dense, bm25, metadata):
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
+        for idx, rrf_score in fused:
+            if 0 <= idx < len(metadata):
+                chunk = metadata[idx]
                 results.append({
-                    "content": self.metadata[idx]["content"],
-                    "score": float(distances[0][i]),
-                    "source": self.metadata[idx].get("source", "")
+                    "id": chunk.get("id", int(idx)),
+                    "content": chunk["content"],
+                    # L2 distance as in dense-only results; None if only BM25 found it
+                    "score": dense.get(idx),
+                    "rrf_score": rrf_score,
+                    "bm25_score": bm25.get(idx),
+                    "source": chunk.get("source", ""),
+                    **{field: chunk[field] for field in RESULT_FIELDS if field in chunk}
                 })
         return results
@@ -0,0 +1,338 @@
+"""
+Segmented index: one base segment plus small append-only delta segments.
+
+    <root>/
+        segments.json   generation, live segments in order, retired segments
+        seg-000001/     an index store (see utils.index_store), never modified
+        seg-000004/     ...
+
+New documents are written as a new delta segment and published by
+replacing segments.json with os.replace, so readers see either the old or
+the new list, never a partial one. Merging writes a fresh segment and swaps
+it in the same way. Segments that drop out of the manifest are kept on disk
+for RETIRE_SECONDS so readers that still have them open (or are opening
+them) are not cut off, then deleted by a later commit.
+
+There must be a single writer (SegmentWriter / IndexUpdater) per root;
+any number of processes can read it through SegmentedIndex.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from utils.index_store import IndexStore, write_index_store
+
+SEGMENTS_FORMAT_VERSION = 1
+SEGMENTS_FILE = "segments.json"
+RETIRE_SECONDS = float(os.getenv("RBI_SEGMENT_RETIRE_SECONDS", "300"))
+POLL_SECONDS = float(os.getenv("RBI_SEGMENT_POLL_SECONDS", "2"))
+
+
+def is_segmented_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SEGMENTS_FILE))
+
+
+def read_segments_manifest(root: str) -> dict:
+    with open(os.path.join(root, SEGMENTS_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    version = manifest.get("format_version")
+    if version != SEGMENTS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported segments format {version} in {root}")
+    return manifest
+
+
+class SegmentWriter:
+    """Publishes segments under root; every change is one atomic manifest swap."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        if is_segmented_store(root):
+            self.manifest = read_segments_manifest(root)
+        else:
+            self.manifest = {"format_version": SEGMENTS_FORMAT_VERSION, "generation": 0,
+                             "dim": None, "segments": [], "retired": {}}
+
+    @property
+    def segments(self) -> list[dict]:
+        return list(self.manifest["segments"])
+
+    def _new_segment(self, index, metadata, vectors, kind: str) -> dict:
+        with self.lock:
+            self.manifest["generation"] += 1
+            name = f"seg-{self.manifest['generation']:06d}"
+        store = write_index_store(os.path.join(self.root, name), index, metadata, vectors)
+        return {"name": name, "kind": kind, "count": store["count"], "index_type": store["index_type"]}
+
+    def _commit(self, segments: list[dict], retired=()):
+        with self.lock:
+            now = time.time()
+            manifest = dict(self.manifest)
+            manifest["generation"] += 1
+            manifest["segments"] = segments
+            manifest["count"] = sum(segment["count"] for segment in segments)
+            manifest["updated_at"] = now
+            manifest["retired"] = dict(self.manifest.get("retired", {}))
+            for segment in retired:
+                manifest["retired"][segment["name"]] = now
+            if segments and manifest.get("dim") is None:
+                manifest["dim"] = IndexStore(os.path.join(self.root, segments[0]["name"])).manifest["dim"]
+
+            tmp_path = os.path.join(self.root, f"{SEGMENTS_FILE}.tmp-{os.getpid()}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.root, SEGMENTS_FILE))
+            self.manifest = manifest
+            self._purge_retired(now)
+            return manifest
+
+    def _purge_retired(self, now):
+        expired = [name for name, retired_at in self.manifest["retired"].items()
+                   if now - retired_at >= RETIRE_SECONDS]
+        for name in expired:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            del self.manifest["retired"][name]
+
+    def replace(self, index, metadata: list[dict], vectors=None) -> dict:
+        """Publish a full rebuild as the only (base) segment"""
+        segment = self._new_segment(index, metadata, vectors, "base")
+        with self.lock:
+            old = self.segments
+            return self._commit([segment], retired=old)
+
+    def append(self, metadata: list[dict], vectors) -> dict:
+        """Publish vectors/metadata as a new exact-search delta segment"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+        segment = self._new_segment(index, metadata, vectors, "delta")
+        with self.lock:
+            return self._commit(self.segments + [segment])
+
+    def adopt_store(self, store_dir: str) -> dict:
+        """Use an existing index store as the base segment (hard-linked where possible)"""
+        with self.lock:
+            self.manifest["generation"] += 1
+            name = f"seg-{self.manifest['generation']:06d}"
+        try:
+            shutil.copytree(store_dir, os.path.join(self.root, name), copy_function=os.link)
+        except OSError:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            shutil.copytree(store_dir, os.path.join(self.root, name))
+        store = IndexStore(os.path.join(self.root, name))
+        segment = {"name": name, "kind": "base", "count": store.manifest["count"],
+                   "index_type": store.manifest["index_type"]}
+        with self.lock:
+            return self._commit(self.segments + [segment])
+
+    def merge(self, names, build):
+        """
+        Merge the named segments (a contiguous run) into one built by
+        build(vectors); the merged segment takes their place in the list.
+        Runs without the lock, so appends can be published meanwhile.
+        """
+        names = list(names)
+        stores = [IndexStore(os.path.join(self.root, name)) for name in names]
+        vectors = np.concatenate([np.asarray(store.vectors) for store in stores])
+        metadata = [record for store in stores for record in store.metadata]
+        kind = "base" if any(segment["kind"] == "base" for segment in self.segments if segment["name"] in names) else "delta"
+        merged = self._new_segment(build(vectors), metadata, vectors, kind)
+        with self.lock:
+            current = self.segments
+            position = [segment["name"] for segment in current].index(names[0])
+            replaced = current[position:position + len(names)]
+            if [segment["name"] for segment in replaced] != names:
+                raise RuntimeError("segments changed during merge")
+            return self._commit(current[:position] + [merged] + current[position + len(names):], retired=replaced)
+
+
+class SegmentMetadata:
+    """Metadata of a SegmentView, addressed by global (concatenated) id."""
+
+    def __init__(self, stores, offsets):
+        self.stores = stores
+        self.offsets = offsets  # global id of each segment's first record, plus the total
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        segment = bisect_right(self.offsets, idx) - 1
+        return self.stores[segment].metadata[idx - self.offsets[segment]]
+
+    def __iter__(self):
+        for store in self.stores:
+            yield from store.metadata
+
+    @property
+    def nbytes(self) -> int:
+        return sum(store.metadata.nbytes for store in self.stores)
+
+
+class SegmentView:
+    """Immutable snapshot of the live segments; searched as one index."""
+
+    def __init__(self, generation, names, stores):
+        self.generation = generation
+        self.names = names
+        self.stores = stores
+        offsets = [0]
+        for store in stores:
+            offsets.append(offsets[-1] + store.manifest["count"])
+        self.metadata = SegmentMetadata(stores, offsets)
+        self.ntotal = offsets[-1]
+        self.d = stores[0].manifest["dim"] if stores else 0
+
+    @property
+    def nbytes(self) -> int:
+        from utils.registry import index_nbytes
+        return sum(index_nbytes(store.index) for store in self.stores)
+
+    @property
+    def lexicons(self) -> list:
+        """Each segment's LexicalIndex (None for segments without one), aligned with metadata.offsets"""
+        return [store.lexical for store in self.stores]
+
+    def filter_masks(self, search_filter) -> list:
+        """Per-segment chunk masks for search_filter, aligned with lexicons (None entries: no filter)"""
+        if search_filter is None:
+            return [None] * len(self.stores)
+        return [store.filters.select(search_filter).mask for store in self.stores]
+
+    def search(self, x, k, nprobe=None, ef_search=None, search_filter=None):
+        """Search every segment and merge the per-segment top-k by distance"""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if len(self.stores) == 1:
+            return self.stores[0].search(x, k, nprobe, ef_search, search_filter)
+        all_distances, all_indices = [], []
+        for store, offset in zip(self.stores, self.metadata.offsets):
+            distances, indices = store.search(x, k, nprobe, ef_search, search_filter)
+            all_distances.append(distances)
+            all_indices.append(np.where(indices >= 0, indices + offset, -1))
+        if not all_distances:
+            return (np.full((len(x), k), np.inf, dtype=np.float32),
+                    np.full((len(x), k), -1, dtype=np.int64))
+        distances = np.hstack(all_distances)
+        indices = np.hstack(all_indices)
+        distances = np.where(indices >= 0, distances, np.inf)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+class SegmentedIndex:
+    """
+    Reader side: keeps a SegmentView of the live segments and, at most every
+    poll_seconds, checks whether segments.json was replaced. Segments that
+    are still live are reused, so picking up a delta only opens the delta.
+    Stores that drop out (merged away) are closed once no lease() still
+    holds a view containing them.
+    """
+
+    def __init__(self, root: str, poll_seconds: float = POLL_SECONDS):
+        self.root = root
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()
+        self.checked_at = 0.0
+        self.manifest_stamp = None
+        self.view = SegmentView(0, [], [])
+        # Guards view swaps, lease counts and closing of dropped stores
+        self.lease_lock = threading.Lock()
+        self.leases = Counter()  # leased SegmentView -> active leases
+        self.dropped = []  # stores no longer in self.view, not closed yet
+        self.refresh(force=True)
+
+    def _manifest_stamp(self):
+        # os.replace gives the manifest a new inode, even within one mtime tick
+        try:
+            stat = os.stat(os.path.join(self.root, SEGMENTS_FILE))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def refresh(self, force: bool = False) -> bool:
+        """Swap in a new view if the manifest changed; returns True when it did"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < self.poll_seconds:
+            return False
+        if not self.lock.acquire(blocking=force):
+            return False  # another thread is already refreshing
+        try:
+            self.checked_at = now
+            stamp = self._manifest_stamp()
+            if not force and stamp == self.manifest_stamp:
+                return False
+            manifest = read_segments_manifest(self.root)
+            opened = dict(zip(self.view.names, self.view.stores))
+            names = [segment["name"] for segment in manifest["segments"]]
+            stores = [opened.get(name) or IndexStore(os.path.join(self.root, name)) for name in names]
+            view = SegmentView(manifest["generation"], names, stores)
+            with self.lease_lock:
+                live = {id(store) for store in stores}
+                self.dropped.extend(store for store in self.view.stores if id(store) not in live)
+                self.view = view
+                self._close_dropped()
+            self.manifest_stamp = stamp
+            return True
+        except (OSError, ValueError) as e:
+            if force:
+                raise
+            # Caught mid-publish; keep serving the current view and retry on the next poll
+            print(f"[!] Could not refresh segments in {self.root}: {e}")
+            return False
+        finally:
+            self.lock.release()
+
+    def current(self) -> SegmentView:
+        self.refresh()
+        return self.view
+
+    @contextmanager
+    def lease(self):
+        """Pin the current view so none of its stores is closed until the block exits"""
+        self.refresh()
+        with self.lease_lock:
+            view = self.view
+            self.leases[view] += 1
+        try:
+            yield view
+        finally:
+            with self.lease_lock:
+                self.leases[view] -= 1
+                if not self.leases[view]:
+                    del self.leases[view]
+                self._close_dropped()
+
+    def _close_dropped(self):
+        # Called with lease_lock held
+        if not self.dropped:
+            return
+        in_use = {id(store) for view in self.leases for store in view.stores}
+        keep = []
+        for store in self.dropped:
+            if id(store) in in_use:
+                keep.append(store)
+            else:
+                store.close()
+        self.dropped = keep
+
+    def close(self):
+        """Close every store, live or dropped; only once no request is using this index"""
+        with self.lease_lock:
+            for store in self.view.stores + self.dropped:
+                store.close()
+            self.dropped = []